@@ -8,6 +8,9 @@ def parse_cli_arguments():
     parser.add_argument('-m', '--model', type=str, help='The spaCy language model to use for NLP.', default="en_core_web_md")
     parser.add_argument('-i', '--input_path', type=str, help='The path to the input folder.', default="in")
     parser.add_argument('-o', '--output_path', type=str, help='The path to the output folder.', default="out")
+    parser.add_argument('-b', '--batch_size', type=int, help='The number of texts processed by the spaCy model at a time.', default=50)
+    parser.add_argument('-n', '--n_process', type=int, help='The number of processes running the spaCy model. -1 uses all available cores.', default=1)
+    parser.add_argument('--metrics', type=str, nargs='+', choices=["pos_frequencies", "named_entities"], help='The metrics to compute. Only the spaCy components they depend on are run.', default=["pos_frequencies", "named_entities"])
 
     # Parse the arguments
     args = parser.parse_args()
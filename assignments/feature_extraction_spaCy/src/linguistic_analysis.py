@@ -1,46 +1,77 @@
 from pathlib import Path
-from typing import Dict, Union
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 import spacy
+from spacy.attrs import IS_PUNCT, POS
 from spacy.language import Language
+from spacy.parts_of_speech import IDS
 from spacy.tokens import Doc
 from tqdm import tqdm
 
 from cli_utilities import parse_cli_arguments
 from data_processing_utilities import export_df_as_csv, load_text_file
+from pipeline_planner import METRIC_REQUIREMENTS, plan_pipeline_components
 from utilities import get_logger
 
 
 logger = get_logger(__name__)
 
 
-def calculate_relative_frequency(
-    document: Doc,
-    count: int,
-    per_how_many_words: int = 10000,
-    remove_punctuation: bool = True,
-) -> float:
+# The universal POS tags, without the empty tag of untagged tokens
+UNIVERSAL_POS_TAGS = [tag for tag in IDS if tag]
+UNIVERSAL_POS_IDS = np.array([IDS[tag] for tag in UNIVERSAL_POS_TAGS])
+
+
+def count_pos_tags(
+    document: Doc, per_how_many_words: int = 10000, remove_punctuation: bool = False
+) -> Tuple[Dict[str, int], Dict[str, float]]:
     """
-    Calculates the relative frequency of a certain type of token (pos) in document loaded through a spaCy model, per a certain number of words.
+    Counts the tokens of every universal POS tag in a document, and calculates their relative frequencies, in a single pass.
+
+    The POS tags and punctuation flags of all tokens are read at once with Doc.to_array, and the tags are counted with np.bincount.
 
     Parameters:
-        document (List) (tokens processed by spaCy model): The document (doc) class to analyze, represented as a list of tokens.
-        count (int): The number of occurrences of the token type in the document.
-        per_how_many_words (int, optional): The number of words per which the relative frequency is calculated.
-        remove_punctuation (bool, optional): Whether to remove punctuation tokens from the document before calculating the relative frequency.
+        document (Doc): The document to analyze, represented as a spaCy Doc object.
+        per_how_many_words (int, optional): The number of words per which the relative frequencies are calculated. Defaults to 10000.
+        remove_punctuation (bool, optional): Whether to leave punctuation tokens out of the number of words the counts are relative to. Defaults to False.
 
     Returns:
-        float: The relative frequency of the token in the document, rounded to two decimal places.
+        Tuple[Dict[str, int], Dict[str, float]]: The count and the relative frequency, rounded to two decimal places, of each universal POS tag. The relative frequencies are 0.0 if the document has no words.
     """
-    total_tokens = len(document)
+    token_attributes = document.to_array([POS, IS_PUNCT])
+    pos_counts = np.bincount(
+        token_attributes[:, 0].astype(np.intp), minlength=UNIVERSAL_POS_IDS.max() + 1
+    )[UNIVERSAL_POS_IDS]
+
+    total_words = len(document)
     if remove_punctuation:
-        non_punct_tokens = sum(1 for token in document if not token.is_punct)
-        relative_frequency = non_punct_tokens / total_tokens * per_how_many_words
-    else:
-        relative_frequency = count / total_tokens * per_how_many_words
+        total_words -= int(token_attributes[:, 1].sum())
+    relative_frequencies = (
+        np.round(pos_counts / total_words * per_how_many_words, 2)
+        if total_words
+        else np.zeros(len(UNIVERSAL_POS_TAGS))
+    )
+
+    return (
+        dict(zip(UNIVERSAL_POS_TAGS, pos_counts.tolist())),
+        dict(zip(UNIVERSAL_POS_TAGS, relative_frequencies.tolist())),
+    )
+
+
+def iterate_text_files(directory: Path) -> Iterator[Tuple[str, str]]:
+    """
+    Loads the text files in a directory one at a time, so a corpus is never held in memory at once.
 
-    return round(relative_frequency, 2)
+    Parameters:
+        directory (Path): The directory containing the text files.
+
+    Yields:
+        Tuple[str, str]: The text of each file and its filename, in the (text, context) order expected by nlp.pipe with as_tuples=True.
+    """
+    for file in directory.iterdir():
+        yield load_text_file(file), file.name
 
 
 def extract_linguistic_information_pipeline(
@@ -48,18 +79,24 @@ def extract_linguistic_information_pipeline(
     output_path: Path,
     model: Union[Language, str],
     remove_punctuation: bool = False,
+    batch_size: int = 50,
+    n_process: int = 1,
+    metrics: Optional[List[str]] = None,
 ) -> str:
     """
     Processes all text files in the given input folder and its subfolders, and writes the results to CSV files in the designated output folder.
 
-    This function iterates over all subfolders in the input folder. For each text file in each subfolder, it opens the file,
-    processes the text using the given spaCy model, and calculates various statistics about the text.
+    This function iterates over all subfolders in the input folder. The text files in each subfolder are streamed through the spaCy model with nlp.pipe,
+    in batches and optionally in several processes, and various statistics are calculated about each text. Each document is matched to its filename through as_tuples.
 
     Parameters:
         input_path (str): The path to the input folder.
         output_path (str): The path to the output folder.
-        model (spacy.lang): The spaCy language model to use for NLP.
+        model (Union[Language, str]): The spaCy language model to use for NLP, or the name of one to load.
         remove_punctuation (bool, optional): Whether to remove punctuation tokens from the documents before calculating the relative frequency.
+        batch_size (int, optional): The number of texts processed by the model at a time. Defaults to 50.
+        n_process (int, optional): The number of processes running the model. -1 uses all available cores. Defaults to 1.
+        metrics (Optional[List[str]], optional): The metrics to compute, "pos_frequencies" and/or "named_entities". Components of the model no metric depends on are disabled while processing. Defaults to None, computing all metrics.
 
     Returns:
         str: Message indicating successful completion of the operation.
@@ -68,42 +105,75 @@ def extract_linguistic_information_pipeline(
     if not any(input_path.iterdir()):
         return logger.error("No subfolders found in the input folder.")
 
+    if isinstance(model, str):
+        model = spacy.load(model)
+
+    # Only run the components the requested metrics depend on
+    metrics = metrics or list(METRIC_REQUIREMENTS)
+    _, excluded_components = plan_pipeline_components(model, metrics)
+    with model.select_pipes(disable=excluded_components):
+        return _process_subfolders(
+            input_path, output_path, model, metrics, remove_punctuation, batch_size, n_process
+        )
+
+
+def _process_subfolders(
+    input_path: Path,
+    output_path: Path,
+    model: Language,
+    metrics: List[str],
+    remove_punctuation: bool,
+    batch_size: int,
+    n_process: int,
+) -> str:
+    """
+    Processes the text files of each subfolder with the components of the model that are enabled, and writes the requested metrics of each subfolder to a CSV file.
+
+    Parameters:
+        input_path (Path): The path to the input folder.
+        output_path (Path): The path to the output folder.
+        model (Language): The spaCy language model, with the components no metric depends on disabled.
+        metrics (List[str]): The metrics to compute, "pos_frequencies" and/or "named_entities".
+        remove_punctuation (bool): Whether to leave punctuation tokens out of the number of words the POS frequencies are relative to.
+        batch_size (int): The number of texts processed by the model at a time.
+        n_process (int): The number of processes running the model.
+
+    Returns:
+        str: Message indicating successful completion of the operation.
+    """
     for sub_directory in tqdm(input_path.iterdir(), desc="Processing subfolders"):
         if sub_directory.is_dir():
-            dataframes_to_concatenate = (
-                []
-            )  # create list for storing dataframes, append each, then concatenate all at once
-            for file in tqdm(
-                sub_directory.iterdir(),
+            rows = []  # create list for storing one dict per file, then build the DataFrame at once
+            documents = model.pipe(
+                iterate_text_files(sub_directory),
+                as_tuples=True,
+                batch_size=batch_size,
+                n_process=n_process,
+            )
+            for doc, filename in tqdm(
+                documents,
+                total=sum(1 for _ in sub_directory.iterdir()),
                 desc=f"Processing files in directory {sub_directory.name}",
             ):
-                text = load_text_file(file)
-                doc = model(text)
-
-                values_dict = calculate_token_type_occurrences(
-                    doc, remove_punctuation
-                ) | calculate_named_entity_occurrences(doc)
-
-                create_df_row = pd.DataFrame(
-                    {
-                        "Filename": [file.name],
-                        "RelFreq NOUN": [values_dict["noun_count"]],
-                        "RelFreq VERB": [values_dict["verb_count"]],
-                        "RelFreq ADJ": [values_dict["adj_count"]],
-                        "RelFreq ADV": [values_dict["adv_count"]],
-                        "No. Unique PER": [values_dict["PERSON"]],
-                        "No. Unique LOC": [values_dict["LOC"]],
-                        "No. Unique ORG": [values_dict["ORG"]],
+                row = {"Filename": filename}
+                if "pos_frequencies" in metrics:
+                    pos_frequencies = calculate_token_type_occurrences(doc, remove_punctuation)
+                    row |= {
+                        "RelFreq NOUN": pos_frequencies["noun_count"],
+                        "RelFreq VERB": pos_frequencies["verb_count"],
+                        "RelFreq ADJ": pos_frequencies["adj_count"],
+                        "RelFreq ADV": pos_frequencies["adv_count"],
+                    }
+                if "named_entities" in metrics:
+                    entity_counts = calculate_named_entity_occurrences(doc)
+                    row |= {
+                        "No. Unique PER": entity_counts["PERSON"],
+                        "No. Unique LOC": entity_counts["LOC"],
+                        "No. Unique ORG": entity_counts["ORG"],
                     }
-                )
-                
-                dataframes_to_concatenate.append(
-                    create_df_row
-                )  # append the DataFrame to a list
-
-            df = pd.concat(
-                dataframes_to_concatenate, ignore_index=True
-            )  # concatenate all the DataFrames at once
+                rows.append(row)
+
+            df = pd.DataFrame(rows)
             df = df.sort_values("Filename")  # sort the DataFrame by filename
 
             export_df_as_csv(
@@ -157,38 +227,21 @@ def calculate_token_type_occurrences(
     document: Doc, remove_punctuation: bool = False
 ) -> Dict[str, float]:
     """
-    Counts the occurrences of certain types of tokens in a spacy document object.
+    Calculates the relative frequencies of certain types of tokens in a spacy document object, per 10000 words.
 
     Parameters:
         document (spacy.doc): The document to analyze, represented as a spaCy Doc object.
+        remove_punctuation (bool, optional): Whether to leave punctuation tokens out of the number of words the frequencies are relative to. Defaults to False.
 
     Returns:
-        dict: A dictionary where the keys are token types ('noun', 'verb', 'adj', 'adv') and the values are the counts of tokens of each type.
+        dict: A dictionary where the keys are token types ('noun_count', 'verb_count', 'adj_count', 'adv_count') and the values are the relative frequencies of tokens of each type.
     """
-    NOUN, VERB, ADJ, ADV = "noun_count", "verb_count", "adj_count", "adv_count"
-    pos_counts = {NOUN: 0, VERB: 0, ADJ: 0, ADV: 0}
-
-    for token in document:
-        try:
-            match token.pos_:
-                case "NOUN":
-                    pos_counts[NOUN] += 1
-                case "VERB":
-                    pos_counts[VERB] += 1
-                case "ADJ":
-                    pos_counts[ADJ] += 1
-                case "ADV":
-                    pos_counts[ADV] += 1
-                case _:
-                    continue
-        except TypeError:
-            logger.error("[TypeError] Value is of wrong type")
-        except KeyError:
-            logger.error("[KeyError] Key does not exist :(")
-
+    _, relative_frequencies = count_pos_tags(document, 10000, remove_punctuation)
     return {
-        key: calculate_relative_frequency(document, value, 10000, remove_punctuation)
-        for key, value in pos_counts.items()
+        "noun_count": relative_frequencies["NOUN"],
+        "verb_count": relative_frequencies["VERB"],
+        "adj_count": relative_frequencies["ADJ"],
+        "adv_count": relative_frequencies["ADV"],
     }
 
 
@@ -210,7 +263,12 @@ def main():
 
     # Extract linguistic information from the text files
     extract_linguistic_information_pipeline(
-        input_path=input_folder_path, output_path=output_folder_path, model=nlp
+        input_path=input_folder_path,
+        output_path=output_folder_path,
+        model=nlp,
+        batch_size=cli_args.batch_size,
+        n_process=cli_args.n_process,
+        metrics=cli_args.metrics,
     )
 
 
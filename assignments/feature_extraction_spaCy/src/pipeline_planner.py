@@ -0,0 +1,170 @@
+from pathlib import Path
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+
+import pandas as pd
+import spacy
+from spacy.language import Language
+
+from cli_utilities import parse_cli_arguments
+from data_processing_utilities import export_df_as_csv, load_text_file
+from utilities import get_logger
+
+logger = get_logger(__name__)
+
+# The token and doc attributes each metric of linguistic_analysis.py reads. is_punct is a lexical attribute, set by the tokenizer.
+METRIC_REQUIREMENTS: Dict[str, List[str]] = {
+    "pos_frequencies": ["token.pos"],
+    "named_entities": ["doc.ents"],
+}
+
+# Attributes spaCy's factory metadata does not declare: in the English pipelines, the attribute ruler maps fine-grained tags to POS tags
+ASSIGNS_OVERRIDES: Dict[str, List[str]] = {"attribute_ruler": ["token.pos"]}
+REQUIRES_OVERRIDES: Dict[str, List[str]] = {"attribute_ruler": ["token.tag"]}
+
+
+def _get_component_attributes(nlp: Language, name: str) -> Tuple[Set[str], Set[str]]:
+    # The attributes a component assigns and the ones it requires, from its factory metadata and the overrides
+    meta = nlp.get_pipe_meta(name)
+    factory = nlp.get_pipe_config(name).get("factory", name)
+    assigns = set(meta.assigns) | set(ASSIGNS_OVERRIDES.get(factory, []))
+    requires = set(meta.requires) | set(REQUIRES_OVERRIDES.get(factory, []))
+    return assigns, requires
+
+
+def plan_pipeline_components(nlp: Language, metrics: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """
+    Determines which components of a spaCy pipeline the requested metrics depend on.
+
+    A component is needed if it assigns an attribute a metric reads, or an attribute a needed component requires. A shared tok2vec component is needed if a needed component listens to it.
+
+    Parameters:
+        nlp (Language): The loaded spaCy pipeline.
+        metrics (Iterable[str]): The metrics to compute, keys of METRIC_REQUIREMENTS.
+
+    Returns:
+        Tuple[List[str], List[str]]: The needed and the excluded enabled components, in pipeline order.
+
+    Raises:
+        ValueError: If a metric is unknown, or no component assigns an attribute a metric reads.
+    """
+    unknown_metrics = set(metrics) - set(METRIC_REQUIREMENTS)
+    if unknown_metrics:
+        raise ValueError(f"Unknown metrics: {sorted(unknown_metrics)}. Choose from {list(METRIC_REQUIREMENTS)}.")
+
+    # Disabled components do not run, so only the enabled ones are planned
+    attributes = {name: _get_component_attributes(nlp, name) for name in nlp.pipe_names}
+    needed_attributes = {attribute for metric in metrics for attribute in METRIC_REQUIREMENTS[metric]}
+    needed = set()
+    while True:
+        new_components = {
+            name
+            for name, (assigns, _) in attributes.items()
+            if name not in needed and assigns & needed_attributes
+        }
+        # Listeners do not declare their tok2vec component, which instead knows which components listen to it
+        new_components |= {
+            name
+            for name in nlp.pipe_names
+            if name not in needed
+            and set(getattr(nlp.get_pipe(name), "listening_components", [])) & (needed | new_components)
+        }
+        if not new_components:
+            break
+        needed |= new_components
+        for name in new_components:
+            needed_attributes |= attributes[name][1]
+
+    missing_attributes = {
+        attribute
+        for metric in metrics
+        for attribute in METRIC_REQUIREMENTS[metric]
+        if not any(attribute in attributes[name][0] for name in needed)
+    }
+    if missing_attributes:
+        raise ValueError(f"No component of the pipeline assigns {sorted(missing_attributes)}.")
+
+    needed_components = [name for name in nlp.pipe_names if name in needed]
+    excluded_components = [name for name in nlp.pipe_names if name not in needed]
+    logger.info(
+        f"Metrics {sorted(metrics)} need {needed_components}. Excluding {excluded_components or 'nothing'}."
+    )
+    return needed_components, excluded_components
+
+
+def benchmark_metric_sets(
+    nlp: Language,
+    texts: List[str],
+    metric_sets: Dict[str, List[str]],
+    batch_size: int = 50,
+    n_process: int = 1,
+) -> pd.DataFrame:
+    """
+    Times the pipeline on the same texts with all components enabled and with only the components each metric set needs.
+
+    Parameters:
+        nlp (Language): The loaded spaCy pipeline. Its enabled components are restored afterwards.
+        texts (List[str]): The texts to process.
+        metric_sets (Dict[str, List[str]]): The metric sets to benchmark, keyed by a descriptive name.
+        batch_size (int, optional): The number of texts processed at a time. Defaults to 50.
+        n_process (int, optional): The number of processes running the pipeline. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: One row per metric set, the first being the full pipeline, with the enabled and excluded components, the throughput and the speedup relative to the full pipeline.
+    """
+    runs = [("full_pipeline", None)] + list(metric_sets.items())
+    results = []
+    for metric_set_name, metrics in runs:
+        excluded_components = [] if metrics is None else plan_pipeline_components(nlp, metrics)[1]
+        with nlp.select_pipes(disable=excluded_components):
+            start_time = time.perf_counter()
+            for _ in nlp.pipe(texts, batch_size=batch_size, n_process=n_process):
+                pass
+            seconds = time.perf_counter() - start_time
+            enabled_components = list(nlp.pipe_names)
+
+        results.append(
+            {
+                "metric_set": metric_set_name,
+                "enabled_components": " ".join(enabled_components),
+                "excluded_components": " ".join(excluded_components),
+                "seconds": round(seconds, 3),
+                "docs_per_second": round(len(texts) / seconds, 1),
+                "speedup": round(results[0]["seconds"] / seconds, 2) if results else 1.0,
+            }
+        )
+        logger.info(
+            f"{metric_set_name}: {results[-1]['docs_per_second']} docs/s, {results[-1]['speedup']}x the full pipeline."
+        )
+    return pd.DataFrame(results)
+
+
+def main():
+    # Get the command-line arguments
+    cli_args = parse_cli_arguments()
+
+    input_folder_path = Path(__file__).parent / ".." / cli_args.input_path
+    output_folder_path = Path(__file__).parent / ".." / cli_args.output_path
+
+    # A sample of the corpus, the same texts for every metric set
+    files = sorted(input_folder_path.glob("*/*"))[:500]
+    texts = [load_text_file(file) for file in files]
+
+    # Each requested metric on its own, and all of them together
+    metric_sets = {metric: [metric] for metric in cli_args.metrics}
+    if len(cli_args.metrics) > 1:
+        metric_sets["all_requested_metrics"] = list(cli_args.metrics)
+
+    nlp = spacy.load(cli_args.model)
+    results = benchmark_metric_sets(
+        nlp,
+        texts,
+        metric_sets=metric_sets,
+        batch_size=cli_args.batch_size,
+        n_process=cli_args.n_process,
+    )
+    export_df_as_csv(results, output_folder_path, "pipeline_planner_benchmark.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from cli_utilities import parse_batch_scoring_arguments
+from model_bundle import load_model
+from utilities import get_logger
+
+logger = get_logger(__name__)
+
+# Set once per worker process by _initialize_worker, so the model is not sent with every chunk
+_worker_model = {}
+
+
+def _initialize_worker(model_dir: Path, model_stem: str) -> None:
+    # A model bundle is memory-mapped, so all workers share a single copy of the weights
+    _worker_model["vectorizer"], _worker_model["classifier"] = load_model(
+        model_dir, model_stem
+    )
+
+
+def _score_texts(texts: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Vectorizes and predicts a chunk of texts with the model loaded in the worker process.
+    """
+    vectorizer, classifier = _worker_model["vectorizer"], _worker_model["classifier"]
+    features = vectorizer.transform(texts)
+    scores = {"prediction": classifier.predict(features)}
+    if hasattr(classifier, "predict_proba"):
+        probabilities = classifier.predict_proba(features)
+        for class_index, label in enumerate(classifier.classes_):
+            scores[f"probability_{label}"] = probabilities[:, class_index]
+    return scores
+
+
+def iterate_article_chunks(
+    input_path: Path, columns: List[str], chunk_size: int = 10000
+) -> Iterator[pd.DataFrame]:
+    """
+    Lazily reads a CSV or Parquet file of articles in chunks.
+
+    Parameters:
+        input_path (Path): The CSV or Parquet file to read.
+        columns (List[str]): The columns to read.
+        chunk_size (int, optional): The number of rows per chunk. Defaults to 10000.
+
+    Yields:
+        pd.DataFrame: The next chunk of articles.
+    """
+    if input_path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(input_path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    else:
+        with pd.read_csv(input_path, chunksize=chunk_size, usecols=columns) as reader:
+            for chunk in reader:
+                yield chunk
+
+
+class PredictionWriter:
+    """
+    Appends chunks of predictions to a CSV or Parquet file, so the output never has to be held in memory.
+    """
+
+    def __init__(self, output_path: Path):
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.output_path = output_path
+        self.parquet_writer = None
+        self.num_rows_written = 0
+
+    def write(self, predictions: pd.DataFrame) -> None:
+        if self.output_path.suffix == ".parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(predictions, preserve_index=False)
+            if self.parquet_writer is None:
+                self.parquet_writer = pq.ParquetWriter(self.output_path, table.schema)
+            self.parquet_writer.write_table(table)
+        else:
+            predictions.to_csv(
+                self.output_path,
+                mode="w" if self.num_rows_written == 0 else "a",
+                header=self.num_rows_written == 0,
+                index=False,
+            )
+        self.num_rows_written += len(predictions)
+
+    def close(self) -> None:
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+
+
+def score_articles_in_batches(
+    input_path: Path,
+    output_path: Path,
+    model_dir: Path,
+    model_stem: str,
+    text_col: str = "text",
+    id_col: Optional[str] = None,
+    chunk_size: int = 10000,
+    n_workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Scores a file of unlabeled articles with a saved model, streaming predictions and class probabilities to an output file.
+
+    Chunks are vectorized and predicted in a process pool. At most two chunks per worker are in flight at a time, so memory stays bounded regardless of the size of the input file. Predictions are written in input order.
+
+    Parameters:
+        input_path (Path): The CSV or Parquet file of articles to score.
+        output_path (Path): The CSV or Parquet file to write predictions to.
+        model_dir (Path): The directory containing the saved vectorizer and classifier.
+        model_stem (str): The stem of the saved model file names.
+        text_col (str, optional): The name of the column containing the article text. Defaults to "text".
+        id_col (Optional[str], optional): An optional column copied to the output, to identify each article. Defaults to None.
+        chunk_size (int, optional): The number of articles read and scored at a time. Defaults to 10000.
+        n_workers (Optional[int], optional): The number of worker processes. Defaults to None, using all cores.
+
+    Returns:
+        Dict[str, Any]: The number of articles scored, the elapsed time and the throughput.
+    """
+    n_workers = n_workers or os.cpu_count()
+    columns = [text_col] if id_col is None else [id_col, text_col]
+    writer = PredictionWriter(output_path)
+    in_flight = deque()
+    start_time = time.perf_counter()
+
+    def write_oldest_chunk() -> None:
+        ids, future = in_flight.popleft()
+        predictions = pd.DataFrame(future.result())
+        if id_col is not None:
+            predictions.insert(0, id_col, ids)
+        writer.write(predictions)
+        elapsed = time.perf_counter() - start_time
+        logger.info(
+            f"Scored {writer.num_rows_written} articles ({writer.num_rows_written / elapsed:.0f} articles/s)."
+        )
+
+    logger.info(f"Scoring {input_path.name} with {model_stem} on {n_workers} processes...")
+    try:
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_initialize_worker,
+            initargs=(model_dir, model_stem),
+        ) as executor:
+            for chunk in iterate_article_chunks(input_path, columns, chunk_size):
+                if len(in_flight) >= 2 * n_workers:
+                    write_oldest_chunk()
+                texts = chunk[text_col].fillna("").astype(str).tolist()
+                ids = chunk[id_col].to_numpy() if id_col is not None else None
+                in_flight.append((ids, executor.submit(_score_texts, texts)))
+
+            while in_flight:
+                write_oldest_chunk()
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start_time
+    summary = {
+        "num_articles": writer.num_rows_written,
+        "elapsed_seconds": round(elapsed, 3),
+        "articles_per_second": round(writer.num_rows_written / elapsed, 1),
+    }
+    logger.info(f"Batch scoring complete: {summary}")
+    return summary
+
+
+def main():
+    # Get the command-line arguments
+    cli_args = parse_batch_scoring_arguments()
+
+    score_articles_in_batches(
+        input_path=Path(cli_args.input_path),
+        output_path=Path(cli_args.output_path),
+        model_dir=Path(__file__).parent / ".." / cli_args.model_dir,
+        model_stem=cli_args.model_stem,
+        text_col=cli_args.text_col,
+        id_col=cli_args.id_col,
+        chunk_size=cli_args.chunk_size,
+        n_workers=cli_args.n_workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+
+try:
+    import resource
+except ImportError:  # resource is only available on Unix
+    resource = None
+
+from data_processing_utilities import (
+    export_df_as_csv,
+    load_and_split_training_data,
+    load_labeled_data_as_df,
+)
+from logistic_regression import train_logistic_regression_classifier_model
+from neural_network import PARAMETER_SPACE, train_neural_network_classifier_model
+from token_cache import (
+    TokenCache,
+    fit_vectorizer_from_token_cache,
+    load_or_build_token_cache,
+    transform_from_token_cache,
+)
+from utilities import get_logger
+
+logger = get_logger(__name__)
+
+# Maps a classifier name to a function that trains it on feature vectors and labels
+CLASSIFIER_REGISTRY: Dict[str, Callable[[Any, Any], BaseEstimator]] = {}
+
+
+def register_classifier(
+    name: str,
+) -> Callable[[Callable[[Any, Any], BaseEstimator]], Callable[[Any, Any], BaseEstimator]]:
+    """
+    Decorator registering a training function in the benchmark. The function must be defined at module level, so it can be sent to the worker processes running the benchmark.
+
+    Parameters:
+        name (str): The name of the classifier, used in the results table.
+
+    Returns:
+        Callable: The decorator, which returns the training function unchanged.
+    """
+
+    def decorator(
+        train_function: Callable[[Any, Any], BaseEstimator]
+    ) -> Callable[[Any, Any], BaseEstimator]:
+        CLASSIFIER_REGISTRY[name] = train_function
+        return train_function
+
+    return decorator
+
+
+@register_classifier("logistic_regression")
+def train_logistic_regression_for_benchmark(X_train: Any, y_train: Any) -> BaseEstimator:
+    return train_logistic_regression_classifier_model(X_train, y_train)
+
+
+@register_classifier("neural_network")
+def train_neural_network_for_benchmark(X_train: Any, y_train: Any) -> BaseEstimator:
+    return train_neural_network_classifier_model(
+        output_dir=Path(__file__).parent / ".." / "out",
+        X_train=X_train,
+        y_train=y_train,
+        clf_parameters=PARAMETER_SPACE,
+    )
+
+
+def get_peak_rss_mb() -> Optional[float]:
+    """
+    Returns the peak resident set size of the current process in megabytes, or None where it is unavailable.
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak_rss / 1024**2 if sys.platform == "darwin" else peak_rss / 1024
+
+
+def _run_single_benchmark(
+    input_path: Path,
+    text_col: str,
+    label_col: str,
+    vectorizer_name: str,
+    vectorizer_params: Dict[str, Any],
+    data_size: Optional[int],
+    classifier_name: str,
+    train_function: Callable[[Any, Any], BaseEstimator],
+    seed: int,
+    num_latency_samples: int,
+    token_cache_dir: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """
+    Runs a single benchmark configuration. Meant to run in a fresh worker process, so the peak RSS only reflects this configuration.
+
+    With a token cache, the training features are built from the cached token ids rather than the text. The cache is indexed by row position in the input file, which the sampled rows keep in their index.
+    """
+    data = load_labeled_data_as_df(input_path)
+    if data_size is not None and data_size < len(data):
+        data, _ = train_test_split(
+            data, train_size=data_size, random_state=seed, stratify=data[label_col]
+        )
+
+    X_train, X_test, y_train, y_test = load_and_split_training_data(
+        data, text_col, label_col, seed=seed
+    )
+    vectorizer = TfidfVectorizer(**vectorizer_params)
+
+    cache = None
+    if token_cache_dir is not None:
+        cache = TokenCache.load(token_cache_dir)
+        try:
+            cache.check_vectorizer(vectorizer)
+        except ValueError as e:
+            logger.warning(f"{vectorizer_name} cannot use the token cache: {e}")
+            cache = None
+
+    start_time = time.perf_counter()
+    if cache is not None:
+        try:
+            fit_vectorizer_from_token_cache(vectorizer, cache, X_train.index.to_numpy())
+            X_train_feats = transform_from_token_cache(vectorizer, cache, X_train.index.to_numpy())
+        except ValueError as e:
+            logger.warning(f"{vectorizer_name} cannot be fitted from the token cache: {e}")
+            # Start over on the text, with an unfitted vectorizer and a fresh timer
+            vectorizer, cache = TfidfVectorizer(**vectorizer_params), None
+            start_time = time.perf_counter()
+    if cache is None:
+        X_train_feats = vectorizer.fit_transform(X_train)
+    vectorize_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    classifier = train_function(X_train_feats, y_train)
+    fit_seconds = time.perf_counter() - start_time
+
+    # Prediction is timed end-to-end from raw text, as it would be when serving the model
+    start_time = time.perf_counter()
+    y_pred = classifier.predict(vectorizer.transform(X_test))
+    predict_seconds = time.perf_counter() - start_time
+
+    latencies = []
+    for document in X_test.iloc[:num_latency_samples]:
+        start_time = time.perf_counter()
+        classifier.predict(vectorizer.transform([document]))
+        latencies.append(time.perf_counter() - start_time)
+
+    return {
+        "classifier": classifier_name,
+        "vectorizer": vectorizer_name,
+        "data_size": len(data),
+        "num_features": len(vectorizer.vocabulary_),
+        "vectorize_source": "text" if cache is None else "token_cache",
+        "vectorize_seconds": vectorize_seconds,
+        "fit_seconds": fit_seconds,
+        "predict_docs_per_second": len(X_test) / predict_seconds,
+        "single_doc_latency_ms": np.median(latencies) * 1000,
+        "peak_rss_mb": get_peak_rss_mb(),
+        "accuracy": accuracy_score(y_test, y_pred),
+        "macro_f1": f1_score(y_test, y_pred, average="macro"),
+    }
+
+
+def run_classifier_benchmark(
+    input_path: Path,
+    text_col: str,
+    label_col: str,
+    vectorizer_settings: Dict[str, Dict[str, Any]],
+    data_sizes: List[Optional[int]],
+    classifier_names: Optional[List[str]] = None,
+    seed: int = 24,
+    num_latency_samples: int = 100,
+    token_cache_dir: Optional[Path] = None,
+) -> pd.DataFrame:
+    """
+    Benchmarks every registered classifier over a matrix of vectorizer settings and data sizes.
+
+    Each configuration runs in its own worker process, so measurements, peak RSS in particular, are not affected by the configurations before it.
+
+    Parameters:
+        input_path (Path): The path to the CSV file containing the labeled data.
+        text_col (str): The name of the column containing the text data.
+        label_col (str): The name of the column containing the label data.
+        vectorizer_settings (Dict[str, Dict[str, Any]]): TfidfVectorizer parameters, keyed by a descriptive name.
+        data_sizes (List[Optional[int]]): The number of rows to sample from the data, None meaning all rows.
+        classifier_names (Optional[List[str]], optional): The registered classifiers to benchmark. Defaults to None, benchmarking all of them.
+        seed (int, optional): The random seed used for sampling and splitting. Defaults to 24.
+        num_latency_samples (int, optional): The number of single-document predictions used to measure latency. Defaults to 100.
+        token_cache_dir (Optional[Path], optional): The directory of a token cache of the text column, built there if missing. Vectorizer settings tokenizing like the cache are fitted from the cached token ids, so the sweep tokenizes the text once. Defaults to None, vectorizing the text in every configuration.
+
+    Returns:
+        pd.DataFrame: One row per configuration with fit time, prediction throughput, single-document latency, peak RSS and scores.
+    """
+    classifier_names = classifier_names or list(CLASSIFIER_REGISTRY)
+    if token_cache_dir is not None:
+        load_or_build_token_cache(
+            token_cache_dir, load_labeled_data_as_df(input_path)[text_col]
+        )
+
+    results = []
+    for vectorizer_name, vectorizer_params in vectorizer_settings.items():
+        for data_size in data_sizes:
+            for classifier_name in classifier_names:
+                logger.info(
+                    f"Benchmarking {classifier_name} with {vectorizer_name} on {data_size or 'all'} rows..."
+                )
+                # Spawned rather than forked, so the worker does not inherit the memory of this process
+                with ProcessPoolExecutor(
+                    max_workers=1, mp_context=get_context("spawn")
+                ) as executor:
+                    result = executor.submit(
+                        _run_single_benchmark,
+                        input_path,
+                        text_col,
+                        label_col,
+                        vectorizer_name,
+                        vectorizer_params,
+                        data_size,
+                        classifier_name,
+                        CLASSIFIER_REGISTRY[classifier_name],
+                        seed,
+                        num_latency_samples,
+                        token_cache_dir,
+                    ).result()
+                results.append(result)
+
+    return pd.DataFrame(results)
+
+
+def find_pareto_optimal_runs(
+    results: pd.DataFrame,
+    minimize: Tuple[str, ...] = ("fit_seconds", "single_doc_latency_ms", "peak_rss_mb"),
+    maximize: Tuple[str, ...] = ("macro_f1",),
+) -> pd.DataFrame:
+    """
+    Finds the benchmark runs that are not dominated by any other run, i.e. no other run is at least as good on every metric and strictly better on one.
+
+    Parameters:
+        results (pd.DataFrame): The benchmark results.
+        minimize (Tuple[str, ...], optional): The metrics where lower is better. Defaults to fit time, single-document latency and peak RSS.
+        maximize (Tuple[str, ...], optional): The metrics where higher is better. Defaults to macro-F1.
+
+    Returns:
+        pd.DataFrame: The Pareto-optimal runs, sorted by the first metric to maximize.
+    """
+    minimize = [metric for metric in minimize if results[metric].notna().all()]
+    # Negate the metrics to maximize, so lower is better for every column
+    maximize = list(maximize)
+    costs = np.column_stack(
+        [results[minimize].to_numpy(dtype=float), -results[maximize].to_numpy(dtype=float)]
+    )
+    at_least_as_good = (costs[:, None, :] <= costs[None, :, :]).all(axis=2)
+    strictly_better = (costs[:, None, :] < costs[None, :, :]).any(axis=2)
+    is_dominated = (at_least_as_good & strictly_better).any(axis=0)
+
+    return results[~is_dominated].sort_values(maximize[0], ascending=False)
+
+
+def save_benchmark_results(
+    results: pd.DataFrame, output_dir: Path, file_stem: str, file_format: str = "csv"
+) -> None:
+    """
+    Saves the benchmark results table in CSV or Parquet format.
+
+    Parameters:
+        results (pd.DataFrame): The benchmark results.
+        output_dir (Path): The directory where the file will be saved.
+        file_stem (str): The name of the file, without extension.
+        file_format (str, optional): Either "csv" or "parquet". Parquet requires pyarrow. Defaults to "csv".
+    """
+    if file_format == "parquet":
+        try:
+            output_dir.mkdir(parents=True, exist_ok=True)
+            results.to_parquet(output_dir / f"{file_stem}.parquet", index=False)
+            logger.info(f"Benchmark results saved as {file_stem}.parquet")
+            return
+        except ImportError:
+            logger.error("Saving as parquet requires pyarrow. Falling back to csv.")
+    export_df_as_csv(results, output_dir, f"{file_stem}.csv")
+
+
+def main():
+    # Initialize input/output paths
+    input_data_path = Path(__file__).parent / ".." / "in" / "fake_or_real_news.csv"
+    report_data_path = Path(__file__).parent / ".." / "out" / "benchmarks"
+    token_cache_path = Path(__file__).parent / ".." / "out" / "token_cache"
+
+    # Vectorizer settings to benchmark, the first being the one used by the classification scripts
+    vectorizer_settings = {
+        "tfidf_bigram_2000": {
+            "ngram_range": (1, 2),
+            "lowercase": True,
+            "max_df": 0.95,
+            "min_df": 0.05,
+            "max_features": 2000,
+        },
+        "tfidf_unigram_500": {
+            "ngram_range": (1, 1),
+            "lowercase": True,
+            "max_df": 0.95,
+            "min_df": 0.05,
+            "max_features": 500,
+        },
+    }
+
+    results = run_classifier_benchmark(
+        input_path=input_data_path,
+        text_col="text",
+        label_col="label",
+        vectorizer_settings=vectorizer_settings,
+        data_sizes=[1000, 3000, None],
+        token_cache_dir=token_cache_path,
+    )
+
+    save_benchmark_results(results, report_data_path, "classifier_benchmark_results")
+    save_benchmark_results(
+        find_pareto_optimal_runs(results),
+        report_data_path,
+        "classifier_benchmark_pareto_summary",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+from pathlib import Path
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score
+
+from data_processing_utilities import (
+    export_df_as_csv,
+    load_and_split_training_data,
+    load_labeled_data_as_df,
+)
+from model_bundle import load_model
+from utilities import get_logger
+
+logger = get_logger(__name__)
+
+
+def calculate_probability_margin(probabilities: np.ndarray) -> np.ndarray:
+    """
+    Returns the difference between the highest and second highest class probability of each row.
+    """
+    top_two = np.sort(probabilities, axis=1)[:, -2:]
+    return top_two[:, 1] - top_two[:, 0]
+
+
+def vectorizers_are_equivalent(first: Any, second: Any) -> bool:
+    """
+    Checks whether two fitted vectorizers produce the same features, i.e. have the same type, parameters, vocabulary and IDF weights.
+    """
+    if type(first) is not type(second) or first.get_params() != second.get_params():
+        return False
+    if getattr(first, "vocabulary_", None) != getattr(second, "vocabulary_", None):
+        return False
+    if hasattr(first, "idf_") != hasattr(second, "idf_"):
+        return False
+    return not hasattr(first, "idf_") or np.array_equal(first.idf_, second.idf_)
+
+
+class CascadeClassifier:
+    """
+    Predicts with a cheap model first, and only sends the articles it is uncertain about to an expensive model.
+
+    An article is escalated when the margin between the two most likely classes of the cheap model falls below the uncertainty band. A band of 0 never escalates, and a band of 1 or more always does, even for articles with a margin of exactly 1.
+
+    Parameters:
+        fast_vectorizer (Any): The fitted vectorizer of the cheap model.
+        fast_classifier (Any): The cheap classifier, which must implement predict_proba.
+        slow_vectorizer (Optional[Any]): The fitted vectorizer of the expensive model, or None if it uses the features of the cheap model. If it is equivalent to the vectorizer of the cheap model, the features are reused rather than computed twice.
+        slow_classifier (Any): The expensive classifier.
+        uncertainty_band (float, optional): The probability margin below which articles are escalated. Defaults to 0.2.
+    """
+
+    def __init__(
+        self,
+        fast_vectorizer: Any,
+        fast_classifier: Any,
+        slow_vectorizer: Optional[Any],
+        slow_classifier: Any,
+        uncertainty_band: float = 0.2,
+    ):
+        if not hasattr(fast_classifier, "predict_proba"):
+            raise ValueError("The fast classifier must implement predict_proba.")
+        if not set(slow_classifier.classes_) <= set(fast_classifier.classes_):
+            raise ValueError("The slow classifier predicts classes unknown to the fast classifier.")
+        self.fast_vectorizer = fast_vectorizer
+        self.fast_classifier = fast_classifier
+        if slow_vectorizer is not None and vectorizers_are_equivalent(
+            fast_vectorizer, slow_vectorizer
+        ):
+            logger.info("Both classifiers use the same features, which are computed once.")
+            slow_vectorizer = None
+        self.slow_vectorizer = slow_vectorizer
+        self.slow_classifier = slow_classifier
+        self.uncertainty_band = uncertainty_band
+
+    def predict_with_escalations(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Predicts the label of each text, and returns which texts were escalated to the slow classifier.
+        """
+        fast_features = self.fast_vectorizer.transform(texts)
+        probabilities = self.fast_classifier.predict_proba(fast_features)
+        predictions = self.fast_classifier.classes_[probabilities.argmax(axis=1)].astype(object)
+
+        margins = calculate_probability_margin(probabilities)
+        # A band of 1 also covers the margin of 1 of a certain prediction
+        is_escalated = (
+            margins < self.uncertainty_band
+            if self.uncertainty_band < 1
+            else np.ones(len(margins), dtype=bool)
+        )
+        if is_escalated.any():
+            if self.slow_vectorizer is None:
+                slow_features = fast_features[is_escalated]
+            else:
+                slow_features = self.slow_vectorizer.transform(
+                    [text for text, escalate in zip(texts, is_escalated) if escalate]
+                )
+            predictions[is_escalated] = self.slow_classifier.predict(slow_features)
+
+        return predictions, is_escalated
+
+    def predict(self, texts: List[str]) -> np.ndarray:
+        return self.predict_with_escalations(texts)[0]
+
+
+def _time_prediction(predict: Callable[[], Any], repeats: int) -> Tuple[Any, float]:
+    # Median of several runs, returning the output of the last one
+    durations = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        output = predict()
+        durations.append(time.perf_counter() - start_time)
+    return output, float(np.median(durations))
+
+
+def evaluate_cascade(
+    cascade: CascadeClassifier,
+    texts: List[str],
+    labels: np.ndarray,
+    uncertainty_bands: List[float],
+    repeats: int = 3,
+) -> pd.DataFrame:
+    """
+    Compares the cascade at several uncertainty bands with either of its classifiers alone.
+
+    Parameters:
+        cascade (CascadeClassifier): The cascade. Its uncertainty band is restored afterwards.
+        texts (List[str]): The held-out texts to predict.
+        labels (np.ndarray): The true labels of the texts.
+        uncertainty_bands (List[float]): The uncertainty bands to evaluate.
+        repeats (int, optional): The number of timed runs, of which the median is reported. Defaults to 3.
+
+    Returns:
+        pd.DataFrame: One row per uncertainty band with the escalation rate, the prediction latency per article, the latency saved relative to the slow classifier, and the accuracy of the cascade and of each classifier alone.
+    """
+    fast_predictions, fast_seconds = _time_prediction(
+        lambda: cascade.fast_classifier.predict(cascade.fast_vectorizer.transform(texts)),
+        repeats,
+    )
+    slow_vectorizer = cascade.slow_vectorizer or cascade.fast_vectorizer
+    slow_predictions, slow_seconds = _time_prediction(
+        lambda: cascade.slow_classifier.predict(slow_vectorizer.transform(texts)),
+        repeats,
+    )
+    fast_accuracy = accuracy_score(labels, fast_predictions)
+    slow_accuracy = accuracy_score(labels, slow_predictions)
+
+    original_band = cascade.uncertainty_band
+    results = []
+    try:
+        for band in uncertainty_bands:
+            cascade.uncertainty_band = band
+            (predictions, is_escalated), cascade_seconds = _time_prediction(
+                lambda: cascade.predict_with_escalations(texts), repeats
+            )
+            accuracy = accuracy_score(labels, predictions)
+            results.append(
+                {
+                    "uncertainty_band": band,
+                    "escalation_rate": round(is_escalated.mean(), 3),
+                    "cascade_ms_per_article": round(cascade_seconds / len(texts) * 1000, 4),
+                    "fast_ms_per_article": round(fast_seconds / len(texts) * 1000, 4),
+                    "slow_ms_per_article": round(slow_seconds / len(texts) * 1000, 4),
+                    "latency_saved_vs_slow": round(1 - cascade_seconds / slow_seconds, 3),
+                    "cascade_accuracy": round(accuracy, 3),
+                    "accuracy_vs_fast": round(accuracy - fast_accuracy, 3),
+                    "accuracy_vs_slow": round(accuracy - slow_accuracy, 3),
+                }
+            )
+            logger.info(
+                f"Band {band}: {results[-1]['escalation_rate']:.1%} escalated, accuracy {accuracy:.3f}, {results[-1]['latency_saved_vs_slow']:.1%} latency saved."
+            )
+    finally:
+        cascade.uncertainty_band = original_band
+
+    return pd.DataFrame(results)
+
+
+def main():
+    # Initialize input/output paths
+    input_data_path = Path(__file__).parent / ".." / "in" / "fake_or_real_news.csv"
+    report_data_path = Path(__file__).parent / ".." / "out"
+    models_path = Path(__file__).parent / ".." / "out" / "models"
+
+    # The test split the saved models were evaluated on, so no article was seen in training
+    news_dataset = load_labeled_data_as_df(input_data_path)
+    _, X_test, _, y_test = load_and_split_training_data(news_dataset, "text", "label")
+
+    fast_vectorizer, fast_classifier = load_model(
+        models_path / "logistic_regression", "logistic_regression"
+    )
+    slow_vectorizer, slow_classifier = load_model(
+        models_path / "neural_network", "neural_network"
+    )
+    cascade = CascadeClassifier(
+        fast_vectorizer, fast_classifier, slow_vectorizer, slow_classifier
+    )
+
+    results = evaluate_cascade(
+        cascade,
+        X_test.tolist(),
+        y_test.to_numpy(),
+        uncertainty_bands=[0.0, 0.1, 0.2, 0.3, 0.5, 1.0],
+    )
+    export_df_as_csv(results, report_data_path, "cascade_classifier_report.csv")
+
+
+if __name__ == "__main__":
+    main()
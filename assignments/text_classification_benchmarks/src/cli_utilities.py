@@ -0,0 +1,66 @@
+import argparse
+
+
+def parse_prediction_server_arguments() -> argparse.Namespace:
+    # Create the parser
+    parser = argparse.ArgumentParser(description="Serve predictions from a saved vectorizer and classifier over HTTP.")
+
+    # Add the arguments
+    parser.add_argument('-d', '--model_dir', type=str, help='The directory containing the saved models, relative to the project root.', default="out/models/logistic_regression")
+    parser.add_argument('-s', '--model_stem', type=str, help='The stem of the saved model file names.', default="logistic_regression")
+    parser.add_argument('--host', type=str, help='The host to bind the server to.', default="127.0.0.1")
+    parser.add_argument('-p', '--port', type=int, help='The port to bind the server to. 0 picks a free port.', default=8000)
+    parser.add_argument('-w', '--batch_window_ms', type=float, help='How long to wait for concurrent requests to join a batch, in milliseconds.', default=5.0)
+    parser.add_argument('-b', '--max_batch_size', type=int, help='The maximum number of documents predicted in one batch.', default=64)
+
+    # Parse the arguments
+    args = parser.parse_args()
+
+    return args
+
+
+def parse_batch_scoring_arguments() -> argparse.Namespace:
+    # Create the parser
+    parser = argparse.ArgumentParser(description="Score a large CSV or Parquet file of articles with a saved vectorizer and classifier.")
+
+    # Add the arguments
+    parser.add_argument('-i', '--input_path', type=str, help='The CSV or Parquet file of articles to score.', required=True)
+    parser.add_argument('-o', '--output_path', type=str, help='The CSV or Parquet file to write predictions to.', required=True)
+    parser.add_argument('-d', '--model_dir', type=str, help='The directory containing the saved models, relative to the project root.', default="out/models/logistic_regression")
+    parser.add_argument('-s', '--model_stem', type=str, help='The stem of the saved model file names.', default="logistic_regression")
+    parser.add_argument('-t', '--text_col', type=str, help='The name of the column containing the article text.', default="text")
+    parser.add_argument('--id_col', type=str, help='An optional column copied to the output, to identify each article.', default=None)
+    parser.add_argument('-c', '--chunk_size', type=int, help='The number of articles read and scored at a time.', default=10000)
+    parser.add_argument('-n', '--n_workers', type=int, help='The number of worker processes. Defaults to the number of cores.', default=None)
+
+    # Parse the arguments
+    args = parser.parse_args()
+
+    return args
+
+
+def parse_logistic_regression_arguments() -> argparse.Namespace:
+    # Create the parser
+    parser = argparse.ArgumentParser(description="Train and evaluate the logistic regression news classifier.")
+
+    # Add the arguments
+    parser.add_argument('--trace_memory', action='store_true', help='Record the peak memory of each traced stage with tracemalloc. Slows down the stages, so their timings are not representative.')
+
+    # Parse the arguments
+    args = parser.parse_args()
+
+    return args
+
+
+def parse_neural_network_arguments() -> argparse.Namespace:
+    # Create the parser
+    parser = argparse.ArgumentParser(description="Train and evaluate the neural network news classifier.")
+
+    # Add the arguments
+    parser.add_argument('--trace_memory', action='store_true', help='Record the peak memory of each traced stage with tracemalloc. Slows down the stages, so their timings are not representative.')
+    parser.add_argument('--compare_reduction', action='store_true', help='Also train models on SVD and random projection features and export their timings and scores next to the full-feature model.')
+
+    # Parse the arguments
+    args = parser.parse_args()
+
+    return args
@@ -0,0 +1,78 @@
+from typing import Iterable
+import zlib
+
+import numpy as np
+
+# A Mersenne prime larger than any CRC-32 value, for the pairwise independent hash family
+_HASH_PRIME = 2**61 - 1
+
+
+def hash_terms(terms: Iterable[str]) -> np.ndarray:
+    """
+    Hashes terms to unsigned 32-bit integers with CRC-32, which is stable across processes and Python versions.
+    """
+    return np.fromiter(
+        (zlib.crc32(term.encode("utf-8")) for term in terms), dtype=np.uint64
+    )
+
+
+class CountMinSketch:
+    """
+    A count-min sketch, estimating how often items were added in a fixed amount of memory.
+
+    Every item is counted in one cell of each row, chosen by a different hash function. The estimate is the smallest of those cells. Collisions can only add to a cell, so the estimate is never below the true count, and exceeds it by at most 2.7 * total / width with probability 1 - 0.37**depth.
+
+    Parameters:
+        width (int, optional): The number of cells per row. Defaults to 2**20.
+        depth (int, optional): The number of rows, i.e. hash functions. Defaults to 4.
+        seed (int, optional): The random seed the hash functions are drawn from. Defaults to 24.
+    """
+
+    def __init__(self, width: int = 2**20, depth: int = 4, seed: int = 24):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.uint32)
+        self.total = 0
+
+        random_state = np.random.RandomState(seed)
+        self._multipliers = random_state.randint(1, 2**31, size=depth).astype(np.uint64)
+        self._offsets = random_state.randint(0, 2**31, size=depth).astype(np.uint64)
+
+    @property
+    def nbytes(self) -> int:
+        return self.table.nbytes
+
+    def _get_cells(self, hashes: np.ndarray, row: int) -> np.ndarray:
+        # (a * h + b) mod p mod width. a, b < 2**31 and h < 2**32 keep the products below 2**64
+        products = self._multipliers[row] * hashes + self._offsets[row]
+        return (products % np.uint64(_HASH_PRIME) % np.uint64(self.width)).astype(np.intp)
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        """
+        Counts one occurrence of each hashed item. Repeated hashes are counted once per repetition.
+        """
+        # One row at a time, so the temporary arrays stay the size of the hashes
+        for row in range(self.depth):
+            np.add.at(self.table[row], self._get_cells(hashes, row), 1)
+        self.total += len(hashes)
+
+    def add(self, items: Iterable[str]) -> None:
+        """
+        Counts one occurrence of each item.
+        """
+        self.add_hashes(hash_terms(items))
+
+    def estimate_hashes(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Estimates the counts of hashed items. The estimates are never below the true counts.
+        """
+        estimates = self.table[0, self._get_cells(hashes, 0)]
+        for row in range(1, self.depth):
+            np.minimum(estimates, self.table[row, self._get_cells(hashes, row)], out=estimates)
+        return estimates
+
+    def estimate(self, items: Iterable[str]) -> np.ndarray:
+        """
+        Estimates the counts of items. The estimates are never below the true counts.
+        """
+        return self.estimate_hashes(hash_terms(items))
@@ -1,14 +1,24 @@
+import hashlib
+import json
 from pathlib import Path
-from typing import Any, List, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from statistics import mean
 
 from joblib import dump, load
+import numpy as np
 import pandas as pd
+from sklearn.base import clone
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.model_selection import train_test_split
-from scipy.sparse import csr_matrix
+from scipy.sparse import csr_matrix, load_npz, vstack
 
+from tracing import span, traced
 from utilities import get_logger
+from vectorizer_utilities import (
+    fit_transform_in_parallel,
+    fit_vectorizer_with_sketch,
+    transform_in_parallel,
+)
 
 logger = get_logger(__name__)
 
@@ -47,6 +57,7 @@ def export_df_as_csv(df: pd.DataFrame, directory: Path, filename: str) -> None:
         logger.error(f"Unexpected error occurred when trying to write to file: {e}")
 
 
+@traced("load_csv")
 def load_labeled_data_as_df(path_to_data: Path) -> pd.DataFrame:
     """
     Load labeled data from a CSV file into a pandas DataFrame.
@@ -60,8 +71,56 @@ def load_labeled_data_as_df(path_to_data: Path) -> pd.DataFrame:
     return pd.read_csv(path_to_data)
 
 
+def load_labeled_data_in_chunks(
+    path_to_data: Path,
+    chunk_size: int = 1000,
+    usecols: Optional[List[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Lazily load labeled data from a CSV file as a sequence of pandas DataFrames.
+
+    Parameters:
+        path_to_data (Path): The path to the CSV file.
+        chunk_size (int, optional): The number of rows per chunk. Defaults to 1000.
+        usecols (Optional[List[str]], optional): The columns to load. Defaults to None, loading all columns.
+
+    Yields:
+        pd.DataFrame: The next chunk of labeled data.
+    """
+    logger.info(f"Streaming {path_to_data.name} in chunks of {chunk_size} rows.")
+    with pd.read_csv(path_to_data, chunksize=chunk_size, usecols=usecols) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def create_deterministic_holdout_mask(
+    values: pd.Series, test_size: float = 0.2
+) -> np.ndarray:
+    """
+    Assigns rows to the test split based on a stable hash of their values, rather than their position in the file.
+
+    The same row always lands in the same split, regardless of chunk size or row order, which makes it possible to split data that is never fully loaded into memory.
+
+    Parameters:
+        values (pd.Series): The values to hash, e.g. the text column.
+        test_size (float, optional): The approximate proportion of rows to assign to the test split. Defaults to 0.2.
+
+    Returns:
+        np.ndarray: A boolean mask, True for rows in the test split.
+    """
+    if not 0 < test_size < 1:
+        raise ValueError(f"test_size must be between 0 and 1, got {test_size}.")
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    return (hashes % 10_000) < int(test_size * 10_000)
+
+
 def save_cross_validated_scores_to_csv(
-    scores: List[float], output_dir: Path, file_name: str, decimals: int = 3
+    scores: List[float],
+    output_dir: Path,
+    file_name: str,
+    decimals: int = 3,
+    fit_times: Optional[List[float]] = None,
+    score_times: Optional[List[float]] = None,
 ):
     """
     Save cross-validated scores to a CSV file.
@@ -71,6 +130,8 @@ def save_cross_validated_scores_to_csv(
         output_dir (Path): The directory where the output file will be saved.
         file_name (str): The name of the output file (without extension).
         decimals (int, optional): The number of decimal places to round the scores to. Defaults to 3.
+        fit_times (Optional[List[float]], optional): The fit time in seconds of each fold. Saved as an additional column if provided. Defaults to None.
+        score_times (Optional[List[float]], optional): The score time in seconds of each fold. Saved as an additional column if provided. Defaults to None.
 
     Raises:
         Exception: Raise if there is an error while saving the scores.
@@ -79,12 +140,19 @@ def save_cross_validated_scores_to_csv(
     try:
         output_dir.mkdir(parents=True, exist_ok=True)
         scores_df = pd.DataFrame(scores, columns=["Score"])
-        scores_df["Score"] = scores_df["Score"].round(decimals)
         scores_df["Fold"] = range(1, len(scores) + 1)
-        scores_df = scores_df[["Fold", "Score"]]
+        timing_columns = {"Fit time (s)": fit_times, "Score time (s)": score_times}
+        timing_columns = {
+            column: times for column, times in timing_columns.items() if times is not None
+        }
+        for column, times in timing_columns.items():
+            scores_df[column] = times
+        value_columns = ["Score", *timing_columns]
+        scores_df[value_columns] = scores_df[value_columns].round(decimals)
+        scores_df = scores_df[["Fold", *value_columns]]
         scores_df.loc[len(scores_df)] = [
             "Mean score",
-            scores_df["Score"].mean().round(decimals),
+            *scores_df[value_columns].mean().round(decimals),
         ]
         scores_df.to_csv(output_dir / f"{file_name}.csv", index=False)
     except Exception as e:
@@ -132,6 +200,33 @@ def load_object_from_joblib(file_path: Path) -> Any:
         logger.error(f"Failed to load object from {file_path}: {e}")
 
 
+def load_model_from_joblib(model_dir: Path, file_stem: str) -> Tuple[Any, Any]:
+    """
+    Loads a vectorizer and classifier saved by save_object_as_joblib.
+
+    Parameters:
+        model_dir (Path): The directory containing the joblib files.
+        file_stem (str): The stem of the file names, e.g. "logistic_regression".
+
+    Returns:
+        Tuple[Any, Any]: The loaded vectorizer and classifier.
+
+    Raises:
+        FileNotFoundError: If either of the joblib files does not exist.
+    """
+    file_paths = [
+        model_dir / f"{file_stem}_{object_name}.joblib"
+        for object_name in ("vectorizer", "classifier")
+    ]
+    for file_path in file_paths:
+        if not file_path.exists():
+            raise FileNotFoundError(f"Model file not found: {file_path}")
+    logger.info(f"Loading {file_stem} vectorizer and classifier from {model_dir}")
+    vectorizer, classifier = (load_object_from_joblib(file_path) for file_path in file_paths)
+    return vectorizer, classifier
+
+
+@traced("save_joblib")
 def save_object_as_joblib(
     object_to_save: Any, output_dir: Path, file_stem: str, object_name: str
 ) -> None:
@@ -154,6 +249,118 @@ def save_object_as_joblib(
         logger.error(f"Failed to save {object_name}: {e}")
 
 
+def get_csr_memory_usage(matrix: csr_matrix) -> int:
+    """
+    Returns the number of bytes used by the data, indices and index pointer arrays of a CSR matrix.
+    """
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+def convert_to_lean_csr(matrix: csr_matrix) -> csr_matrix:
+    """
+    Converts a sparse matrix to CSR with float32 values and, where the number of stored values allows it, int32 indices.
+
+    Parameters:
+        matrix (csr_matrix): The sparse matrix to convert.
+
+    Returns:
+        csr_matrix: The converted matrix. No copy is made of arrays that already have the lean dtype.
+    """
+    matrix = csr_matrix(matrix)
+    index_dtype = np.int32 if matrix.nnz <= np.iinfo(np.int32).max else np.int64
+    return csr_matrix(
+        (
+            matrix.data.astype(np.float32, copy=False),
+            matrix.indices.astype(index_dtype, copy=False),
+            matrix.indptr.astype(index_dtype, copy=False),
+        ),
+        shape=matrix.shape,
+        copy=False,
+    )
+
+
+def hash_vocabulary(vocabulary: Dict[str, int]) -> str:
+    """
+    Returns a SHA-256 hash of a fitted vocabulary, identifying the feature space a matrix was vectorized in.
+    """
+    terms_in_index_order = sorted(vocabulary, key=vocabulary.get)
+    return hashlib.sha256(json.dumps(terms_in_index_order).encode("utf-8")).hexdigest()
+
+
+def load_vectorized_manifest(manifest_path: Path) -> Dict[str, Any]:
+    """
+    Loads the manifest of a sharded vectorized dataset written by vectorize_dataset.py.
+
+    Parameters:
+        manifest_path (Path): The path to the manifest JSON file.
+
+    Returns:
+        Dict[str, Any]: The manifest, with the shard, label and vectorizer file names and the split the vectorizer was fitted on.
+
+    Raises:
+        FileNotFoundError: If the manifest does not exist.
+    """
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"Vectorized dataset manifest not found: {manifest_path}")
+    with open(manifest_path, "r") as f:
+        return json.load(f)
+
+
+def iterate_vectorized_shards(
+    manifest_path: Path,
+) -> Iterator[Tuple[csr_matrix, np.ndarray]]:
+    """
+    Lazily reads the shards of a vectorized dataset in row order, so the full matrix never has to be held in memory.
+
+    Parameters:
+        manifest_path (Path): The path to the manifest JSON file.
+
+    Yields:
+        Tuple[csr_matrix, np.ndarray]: The feature matrix and labels of the next shard.
+
+    Raises:
+        ValueError: If a shard does not have the number of rows recorded in the manifest.
+    """
+    manifest = load_vectorized_manifest(manifest_path)
+    dataset_dir = manifest_path.parent
+    # Memory-mapped, so only the labels of the current shard are read from disk
+    labels = np.load(dataset_dir / manifest["labels_file"], mmap_mode="r", allow_pickle=False)
+
+    for shard in manifest["shards"]:
+        features = load_npz(dataset_dir / shard["file"]).tocsr()
+        if features.shape[0] != shard["end_row"] - shard["start_row"]:
+            raise ValueError(f"Shard {shard['file']} does not match the row range in the manifest.")
+        yield features, np.asarray(labels[shard["start_row"] : shard["end_row"]])
+
+
+@traced("load_vectorized_shards")
+def load_vectorized_dataset(manifest_path: Path) -> Tuple[csr_matrix, np.ndarray, Any]:
+    """
+    Loads a sharded vectorized dataset and the vectorizer it was produced with.
+
+    Parameters:
+        manifest_path (Path): The path to the manifest JSON file.
+
+    Returns:
+        Tuple[csr_matrix, np.ndarray, Any]: The feature matrix, the labels and the fitted vectorizer.
+
+    Raises:
+        ValueError: If the vectorizer does not match the vocabulary hash recorded in the manifest.
+    """
+    manifest = load_vectorized_manifest(manifest_path)
+    vectorizer = load_object_from_joblib(manifest_path.parent / manifest["vectorizer_file"])
+    if hash_vocabulary(vectorizer.vocabulary_) != manifest["vocabulary_hash"]:
+        raise ValueError(
+            f"The vectorizer in {manifest['vectorizer_file']} does not match the vocabulary the shards were vectorized with."
+        )
+
+    shards, labels = zip(*iterate_vectorized_shards(manifest_path))
+    logger.info(
+        f"Loaded {manifest['num_rows']} vectorized rows from {len(shards)} shards."
+    )
+    return vstack(shards, format="csr"), np.concatenate(labels), vectorizer
+
+
 def load_and_split_training_data(
     data: pd.DataFrame,
     text_col: str,
@@ -191,7 +398,9 @@ def prepare_data_for_model_training(
     vectorizer: TfidfVectorizer,
     train_test_size: float = 0.2,
     seed: int = 24,
-) -> Tuple[csr_matrix, csr_matrix, pd.Series, pd.Series]:
+    lean_features: bool = False,
+    fit_strategy: str = "serial",
+) -> Tuple[csr_matrix, csr_matrix, pd.Series, pd.Series, TfidfVectorizer]:
     """
     Prepares data for model training and testing.
 
@@ -202,22 +411,94 @@ def prepare_data_for_model_training(
         vectorizer (TfidfVectorizer): The vectorizer used to transform text data into feature vectors.
         train_test_size (float, optional): The proportion of data to use for testing. Defaults to 0.2.
         seed (int, optional): The random seed for splitting the data. Defaults to 24.
+        lean_features (bool, optional): Whether to produce feature vectors with float32 values and int32 indices, rather than the float64 default. A float32 clone of the vectorizer is fitted, so the one passed in is left as it is. Defaults to False.
+        fit_strategy (str, optional): "serial" fits the vectorizer on one core. "parallel" counts terms and transforms the text in chunks on all cores, producing the same vocabulary and IDF weights. "sketch" prunes rare terms with a count-min sketch before counting the others exactly, capping memory when fitting bigrams on large corpora, with the same result. Defaults to "serial".
 
     Returns:
-        Tuple[csr_matrix, csr_matrix, pd.Series, pd.Series]: A tuple containing the feature vectors for training and testing, and the corresponding label series for training and testing.
+        Tuple[csr_matrix, csr_matrix, pd.Series, pd.Series, TfidfVectorizer]: A tuple containing the feature vectors for training and testing, the corresponding label series for training and testing, and the fitted vectorizer.
+
+    Raises:
+        ValueError: If the text or label column is missing, or the fit strategy is unknown.
     """
     logger.info("Preparing data for model training...")
 
     if text_col not in data.columns or label_col not in data.columns:
         raise ValueError(f"Columns {text_col} or {label_col} not found in data.")
 
-    X_train, X_test, y_train, y_test = load_and_split_training_data(
-        data, text_col, label_col, train_test_size, seed
-    )
+    with span("split"):
+        X_train, X_test, y_train, y_test = load_and_split_training_data(
+            data, text_col, label_col, train_test_size, seed
+        )
+
+    if lean_features:
+        # Setting the dtype on a clone of the vectorizer avoids ever materializing the float64 matrix
+        vectorizer = clone(vectorizer).set_params(dtype=np.float32)
 
     logger.info("Transforming text data into feature vectors.")
-    X_train_feats = vectorizer.fit_transform(X_train)
-    X_test_feats = vectorizer.transform(X_test)
+    with span("vectorize", fit_strategy=fit_strategy):
+        if fit_strategy == "serial":
+            X_train_feats = vectorizer.fit_transform(X_train)
+            X_test_feats = vectorizer.transform(X_test)
+        elif fit_strategy == "parallel":
+            vectorizer, X_train_feats = fit_transform_in_parallel(vectorizer, X_train)
+            X_test_feats = transform_in_parallel(vectorizer, X_test)
+        elif fit_strategy == "sketch":
+            vectorizer = fit_vectorizer_with_sketch(vectorizer, X_train.tolist())
+            X_train_feats = vectorizer.transform(X_train)
+            X_test_feats = vectorizer.transform(X_test)
+        else:
+            raise ValueError(f"Unknown fit strategy: {fit_strategy}")
+
+    if lean_features:
+        # The float64 matrices would have the same indices as the float32 ones before conversion, and values twice the size
+        default_bytes = sum(
+            get_csr_memory_usage(matrix) + matrix.data.nbytes
+            for matrix in (X_train_feats, X_test_feats)
+        )
+        X_train_feats = convert_to_lean_csr(X_train_feats)
+        X_test_feats = convert_to_lean_csr(X_test_feats)
+        lean_bytes = get_csr_memory_usage(X_train_feats) + get_csr_memory_usage(X_test_feats)
+        logger.info(
+            f"Lean feature vectors use {lean_bytes / 1024**2:.2f} MB, down from {default_bytes / 1024**2:.2f} MB with float64 values and the vectorizer's default indices."
+        )
+
+    logger.info("Data preparation complete!")
+    return X_train_feats, X_test_feats, y_train, y_test, vectorizer
+
+
+def prepare_data_from_vectorized_shards(
+    manifest_path: Path, train_test_size: float = 0.2, seed: int = 24
+) -> Tuple[csr_matrix, csr_matrix, np.ndarray, np.ndarray, Any]:
+    """
+    Prepares data for model training and testing from a sharded vectorized dataset, instead of vectorizing the text again.
+
+    The split is the same as in prepare_data_for_model_training. It must also be the split the vectorizer was fitted on, so no vocabulary or IDF weights were learned from the test rows.
+
+    Parameters:
+        manifest_path (Path): The path to the manifest JSON file written by vectorize_dataset.py.
+        train_test_size (float, optional): The proportion of data to use for testing. Defaults to 0.2.
+        seed (int, optional): The random seed for splitting the data. Defaults to 24.
+
+    Returns:
+        Tuple[csr_matrix, csr_matrix, np.ndarray, np.ndarray, Any]: The feature vectors for training and testing, the corresponding labels, and the fitted vectorizer.
+
+    Raises:
+        ValueError: If the vectorizer was fitted on a different split.
+    """
+    logger.info("Preparing data for model training from vectorized shards...")
+    manifest = load_vectorized_manifest(manifest_path)
+    fit_split = manifest["vectorizer_fit_split"]
+    if fit_split != {"train_test_size": train_test_size, "seed": seed}:
+        raise ValueError(
+            f"The vectorizer was fitted on the split {fit_split}, which does not match test size {train_test_size} and seed {seed}."
+        )
+
+    X, y, vectorizer = load_vectorized_dataset(manifest_path)
+    # Splitting row indices gives the same rows as splitting the text in load_and_split_training_data
+    with span("split"):
+        train_rows, test_rows = train_test_split(
+            np.arange(len(y)), test_size=train_test_size, random_state=seed, stratify=y
+        )
 
     logger.info("Data preparation complete!")
-    return X_train_feats, X_test_feats, y_train, y_test
+    return X[train_rows], X[test_rows], y[train_rows], y[test_rows], vectorizer
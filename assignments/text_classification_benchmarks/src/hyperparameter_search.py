@@ -0,0 +1,337 @@
+from datetime import datetime
+import json
+from pathlib import Path
+import sqlite3
+from typing import Any, Dict, Optional, Tuple, Union
+
+from joblib import Parallel, delayed, hash as joblib_hash
+import numpy as np
+import pandas as pd
+from scipy.stats import spearmanr
+from sklearn.base import BaseEstimator, clone
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import (
+    GridSearchCV,
+    HalvingGridSearchCV,
+    ParameterGrid,
+    StratifiedKFold,
+)
+
+from parallel_cross_validation import fit_and_score_fold
+from utilities import get_logger
+
+logger = get_logger(__name__)
+
+
+def _params_key(params: Dict[str, Any], exclude: str = "") -> str:
+    """
+    Creates a hashable, order-independent key for a set of estimator parameters, optionally leaving out a single parameter.
+    """
+    return repr(sorted(item for item in params.items() if item[0] != exclude))
+
+
+def halving_grid_search(
+    estimator: BaseEstimator,
+    param_grid: Dict[str, Any],
+    X: Any,
+    y: Union[pd.Series, np.ndarray],
+    cv: int = 5,
+    resource: str = "n_samples",
+    factor: int = 3,
+    n_jobs: int = -1,
+    random_state: int = 42,
+) -> HalvingGridSearchCV:
+    """
+    Searches the parameter grid with successive halving. All candidates are evaluated on a small budget, and only the best 1/factor of them advance to the next round with factor times the budget.
+
+    Parameters:
+        estimator (BaseEstimator): The estimator to tune.
+        param_grid (Dict[str, Any]): The grid of parameters to search.
+        X (Any): The input features.
+        y (Union[pd.Series, np.ndarray]): The target labels.
+        cv (int, optional): The number of cross-validation folds. Defaults to 5.
+        resource (str, optional): The budget that grows each round, either "n_samples" or an integer estimator parameter such as "max_iter". Defaults to "n_samples".
+        factor (int, optional): The proportion of candidates kept, and the growth of the budget, between rounds. Defaults to 3.
+        n_jobs (int, optional): The number of jobs to run in parallel. Defaults to -1.
+        random_state (int, optional): The random seed used to subsample the training data. Defaults to 42.
+
+    Returns:
+        HalvingGridSearchCV: The fitted search.
+    """
+    logger.info(
+        f"Performing successive halving search over {len(ParameterGrid(param_grid))} candidates with resource '{resource}'..."
+    )
+    max_resources = "auto" if resource == "n_samples" else estimator.get_params()[resource]
+    search = HalvingGridSearchCV(
+        estimator,
+        param_grid,
+        resource=resource,
+        max_resources=max_resources,
+        factor=factor,
+        cv=cv,
+        n_jobs=n_jobs,
+        random_state=random_state,
+        verbose=1,
+    )
+    search.fit(X, y)
+    logger.info(f"Best parameters found: {search.best_params_}")
+    return search
+
+
+def summarize_halving_search(
+    search: HalvingGridSearchCV, param_grid: Dict[str, Any], cv: int
+) -> Dict[str, Any]:
+    """
+    Estimates the compute spent by a successive halving search, relative to an exhaustive grid search over the same parameters.
+
+    Compute is measured in resource units, i.e. the sum over all fits of the number of samples or iterations each fit was given.
+
+    Parameters:
+        search (HalvingGridSearchCV): The fitted search.
+        param_grid (Dict[str, Any]): The grid of parameters that was searched.
+        cv (int): The number of cross-validation folds.
+
+    Returns:
+        Dict[str, Any]: The number of fits and resource units for both strategies, and the fraction of compute saved.
+    """
+    num_candidates = len(ParameterGrid(param_grid))
+    halving_fits = int(np.sum(search.n_candidates_)) * cv
+    halving_cost = int(np.dot(search.n_candidates_, search.n_resources_)) * cv
+    full_grid_fits = num_candidates * cv
+    full_grid_cost = full_grid_fits * search.max_resources_
+
+    summary = {
+        "best_params": search.best_params_,
+        "best_score": search.best_score_,
+        "n_iterations": search.n_iterations_,
+        "halving_fits": halving_fits,
+        "full_grid_fits": full_grid_fits,
+        "halving_resource_units": halving_cost,
+        "full_grid_resource_units": full_grid_cost,
+        "compute_saved": 1 - halving_cost / full_grid_cost,
+    }
+    logger.info(
+        f"Successive halving used {halving_cost} of {full_grid_cost} resource units, saving {summary['compute_saved']:.1%} of the full grid compute."
+    )
+    return summary
+
+
+def compare_search_rankings(
+    halving_search: HalvingGridSearchCV, grid_search: GridSearchCV
+) -> Dict[str, Any]:
+    """
+    Compares the candidates chosen by successive halving with the ranking of an exhaustive grid search over the same grid.
+
+    Parameters:
+        halving_search (HalvingGridSearchCV): The fitted successive halving search.
+        grid_search (GridSearchCV): The fitted exhaustive grid search.
+
+    Returns:
+        Dict[str, Any]: The full grid rank of the configuration chosen by successive halving, and the Spearman correlation between the two searches' scores for the candidates that reached the final halving round.
+    """
+    grid_results = pd.DataFrame(grid_search.cv_results_)
+    grid_results["key"] = grid_results["params"].map(_params_key)
+    grid_results = grid_results.set_index("key")
+
+    halving_results = pd.DataFrame(halving_search.cv_results_)
+    final_round = halving_results[halving_results["iter"] == halving_results["iter"].max()]
+    # The halving resource is recorded as a parameter when it is an estimator parameter, e.g. max_iter
+    final_round_keys = final_round["params"].map(
+        lambda params: _params_key(params, exclude=halving_search.resource)
+    )
+
+    chosen_key = _params_key(halving_search.best_params_, exclude=halving_search.resource)
+    chosen_rank = int(grid_results.loc[chosen_key, "rank_test_score"])
+    if len(final_round) > 1:
+        rank_correlation = spearmanr(
+            final_round["mean_test_score"],
+            grid_results.loc[final_round_keys, "mean_test_score"],
+        ).statistic
+    else:
+        rank_correlation = np.nan
+
+    logger.info(
+        f"The configuration chosen by successive halving ranks {chosen_rank} of {len(grid_results)} in the full grid search."
+    )
+    return {
+        "chosen_config_full_grid_rank": chosen_rank,
+        "final_round_rank_correlation": rank_correlation,
+    }
+
+
+class SearchResultStore:
+    """
+    Persists the score of every evaluated (data, parameters, fold) cell of a hyperparameter search in an SQLite database, so interrupted or widened searches only fit the cells that are missing.
+    """
+
+    def __init__(self, database_path: Path):
+        database_path.parent.mkdir(parents=True, exist_ok=True)
+        self.database_path = database_path
+        self.connection = sqlite3.connect(database_path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS search_results (
+                data_hash TEXT NOT NULL,
+                estimator_params TEXT NOT NULL,
+                n_splits INTEGER NOT NULL,
+                fold INTEGER NOT NULL,
+                score REAL NOT NULL,
+                fit_time REAL NOT NULL,
+                score_time REAL NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (data_hash, estimator_params, n_splits, fold)
+            )
+            """
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def hash_data(X: Any, y: Union[pd.Series, np.ndarray]) -> str:
+        return joblib_hash((X, np.asarray(y)))
+
+    @staticmethod
+    def serialize_params(estimator: BaseEstimator) -> str:
+        # Every parameter is included, so changing e.g. max_iter on the base estimator invalidates old results.
+        # Nested estimators, such as pipeline steps, are represented by their own parameters, and the pipeline cache location is left out
+        params = {
+            name: value
+            for name, value in estimator.get_params(deep=True).items()
+            if not isinstance(value, BaseEstimator) and name not in ("steps", "memory")
+        }
+        return json.dumps(
+            {"estimator": type(estimator).__name__, **params},
+            sort_keys=True,
+            default=repr,
+        )
+
+    def get(
+        self, data_hash: str, estimator_params: str, n_splits: int, fold: int
+    ) -> Optional[Dict[str, float]]:
+        """
+        Returns the stored result of a cell, or None if it has not been evaluated.
+        """
+        row = self.connection.execute(
+            """
+            SELECT score, fit_time, score_time FROM search_results
+            WHERE data_hash = ? AND estimator_params = ? AND n_splits = ? AND fold = ?
+            """,
+            (data_hash, estimator_params, n_splits, fold),
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("score", "fit_time", "score_time"), row))
+
+    def put(
+        self,
+        data_hash: str,
+        estimator_params: str,
+        n_splits: int,
+        fold: int,
+        result: Dict[str, float],
+    ) -> None:
+        """
+        Stores the result of a cell, replacing any previous result.
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO search_results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                data_hash,
+                estimator_params,
+                n_splits,
+                fold,
+                result["score"],
+                result["fit_time"],
+                result["score_time"],
+                datetime.now().isoformat(timespec="seconds"),
+            ),
+        )
+        # Commit after every fold, so an interrupted search keeps all completed work
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def resumable_grid_search(
+    estimator: BaseEstimator,
+    param_grid: Dict[str, Any],
+    X: Any,
+    y: Union[pd.Series, np.ndarray],
+    store_path: Path,
+    cv: int = 5,
+    n_jobs: int = -1,
+) -> Tuple[BaseEstimator, pd.DataFrame]:
+    """
+    Performs an exhaustive grid search backed by a persistent result store.
+
+    Each (parameters, fold) cell is looked up in the store before fitting, and written to it as soon as it completes. Rerunning the search, or running it with a widened grid, only fits the cells that have not been evaluated on the same data before.
+
+    Parameters:
+        estimator (BaseEstimator): The estimator to tune.
+        param_grid (Dict[str, Any]): The grid of parameters to search.
+        X (Any): The input features.
+        y (Union[pd.Series, np.ndarray]): The target labels.
+        store_path (Path): The path to the SQLite database used to store the results.
+        cv (int, optional): The number of stratified cross-validation folds. Defaults to 5.
+        n_jobs (int, optional): The number of jobs to run in parallel. Defaults to -1.
+
+    Returns:
+        Tuple[BaseEstimator, pd.DataFrame]: The best estimator refitted on all of X, and the mean and standard deviation of the scores of every parameter combination, ranked.
+    """
+    y = np.asarray(y)
+    store = SearchResultStore(store_path)
+    data_hash = store.hash_data(X, y)
+    folds = list(StratifiedKFold(n_splits=cv).split(np.zeros(len(y)), y))
+    candidates = list(ParameterGrid(param_grid))
+
+    scores = {}
+    pending_cells = []
+    for candidate_index, params in enumerate(candidates):
+        serialized_params = store.serialize_params(clone(estimator).set_params(**params))
+        for fold, (train_indices, test_indices) in enumerate(folds):
+            result = store.get(data_hash, serialized_params, cv, fold)
+            if result is None:
+                pending_cells.append((candidate_index, serialized_params, fold))
+            else:
+                scores[candidate_index, fold] = result["score"]
+
+    logger.info(
+        f"Grid search over {len(candidates)} candidates and {cv} folds: {len(scores)} cells loaded from {store_path.name}, {len(pending_cells)} left to fit."
+    )
+    try:
+        results = Parallel(n_jobs=n_jobs, return_as="generator")(
+            delayed(fit_and_score_fold)(
+                clone(estimator).set_params(**candidates[candidate_index]),
+                X,
+                y,
+                *folds[fold],
+            )
+            for candidate_index, _, fold in pending_cells
+        )
+        for (candidate_index, serialized_params, fold), result in zip(
+            pending_cells, results
+        ):
+            store.put(data_hash, serialized_params, cv, fold, result)
+            scores[candidate_index, fold] = result["score"]
+    finally:
+        store.close()
+
+    fold_scores = np.array(
+        [[scores[candidate_index, fold] for fold in range(cv)] for candidate_index in range(len(candidates))]
+    )
+    search_results = pd.DataFrame(
+        {
+            "params": candidates,
+            "mean_test_score": fold_scores.mean(axis=1),
+            "std_test_score": fold_scores.std(axis=1),
+        }
+    )
+    search_results["rank_test_score"] = (
+        search_results["mean_test_score"].rank(method="min", ascending=False).astype(int)
+    )
+
+    best_params = candidates[int(np.argmax(search_results["mean_test_score"]))]
+    logger.info(f"Best parameters found: {best_params}")
+    best_estimator = clone(estimator).set_params(**best_params).fit(X, y)
+
+    return best_estimator, search_results.sort_values("rank_test_score")
@@ -0,0 +1,262 @@
+from pathlib import Path
+import time
+from typing import Any, Dict, Tuple
+
+from joblib import dump, load
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, vstack
+from sklearn.base import clone
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, classification_report
+
+from data_processing_utilities import (
+    create_deterministic_holdout_mask,
+    load_labeled_data_as_df,
+    save_classification_report_to_txt,
+    save_object_as_joblib,
+)
+from utilities import get_logger
+from vectorizer_utilities import calculate_idf, weight_term_counts
+
+logger = get_logger(__name__)
+
+MODEL_STEM = "incremental_logistic_regression"
+
+
+def hash_labeled_rows(data: pd.DataFrame, text_col: str, label_col: str) -> np.ndarray:
+    """
+    Hashes the text and label of each row, so rows can be recognized regardless of their position in the file.
+    """
+    return pd.util.hash_pandas_object(data[[text_col, label_col]], index=False).to_numpy()
+
+
+def key_labeled_rows(row_hashes: np.ndarray) -> pd.MultiIndex:
+    """
+    Keys each row by its hash and the number of earlier rows with the same hash, so identical rows are counted as a multiset rather than collapsed into one.
+    """
+    occurrences = pd.Series(row_hashes).groupby(row_hashes).cumcount().to_numpy()
+    return pd.MultiIndex.from_arrays([row_hashes, occurrences])
+
+
+def calculate_vocabulary_drift(
+    vectorizer: TfidfVectorizer, new_texts: pd.Series
+) -> float:
+    """
+    Measures how much of the vocabulary new texts would select is missing from the fitted vocabulary.
+
+    A copy of the vectorizer is fitted on the new texts alone, with the same pruning settings. The drift is the share of the terms it selects that are not in the fitted vocabulary.
+
+    Parameters:
+        vectorizer (TfidfVectorizer): The fitted vectorizer.
+        new_texts (pd.Series): The texts that were added since it was fitted.
+
+    Returns:
+        float: The drift, between 0 (every selected term is known) and 1 (none is).
+    """
+    try:
+        new_vocabulary = clone(vectorizer).fit(new_texts).vocabulary_
+    except ValueError:
+        # Too few new texts for min_df/max_df to leave any terms
+        return 0.0
+    num_known_terms = sum(term in vectorizer.vocabulary_ for term in new_vocabulary)
+    return 1 - num_known_terms / len(new_vocabulary)
+
+
+def _count_terms(vectorizer: TfidfVectorizer, texts: pd.Series) -> csr_matrix:
+    # Raw counts over the fitted vocabulary, the state TF-IDF weights are recomputed from
+    counter = CountVectorizer(
+        analyzer=vectorizer.build_analyzer(),
+        vocabulary=vectorizer.vocabulary_,
+        dtype=np.int32,
+    )
+    return counter.transform(texts)
+
+
+def _refit_from_scratch(
+    vectorizer: TfidfVectorizer,
+    texts: pd.Series,
+    labels: np.ndarray,
+    is_holdout: np.ndarray,
+) -> Tuple[TfidfVectorizer, LogisticRegression, Dict[str, Any]]:
+    """
+    Fits the vectorizer and classifier on all training rows, and builds the refresh state from them.
+    """
+    vectorizer = clone(vectorizer).fit(texts[~is_holdout])
+    counts = _count_terms(vectorizer, texts)
+    document_frequencies = np.bincount(
+        counts[~is_holdout].indices, minlength=len(vectorizer.vocabulary_)
+    )
+
+    classifier = LogisticRegression(random_state=24).fit(
+        weight_term_counts(vectorizer, counts[~is_holdout]), labels[~is_holdout]
+    )
+    state = {
+        "counts": counts,
+        "labels": labels,
+        "is_holdout": is_holdout,
+        "document_frequencies": document_frequencies,
+        "num_train_documents": int((~is_holdout).sum()),
+    }
+    return vectorizer, classifier, state
+
+
+def refresh_logistic_regression_model(
+    data: pd.DataFrame,
+    text_col: str,
+    label_col: str,
+    vectorizer: TfidfVectorizer,
+    model_path: Path,
+    report_path: Path,
+    drift_threshold: float = 0.2,
+    holdout_size: float = 0.2,
+) -> Dict[str, Any]:
+    """
+    Brings a logistic regression model up to date with the labeled data, only processing the rows added since the last refresh.
+
+    New rows are detected by hashing their text and label, counting identical rows as often as they occur, so an appended duplicate of an existing article is still new. Their term counts are added to the stored counts, the document frequencies and IDF weights are updated, and the classifier is warm-started from its previous coefficients. Only the new rows are tokenized, so the cost of a refresh grows with the amount of new data rather than the size of the dataset. The vocabulary is kept fixed, so when the vocabulary of the new rows drifts too far from it, or rows were removed or relabeled, the model is refitted from scratch instead.
+
+    Rows are assigned to a holdout split by hashing their text, so existing rows never change split as new ones are appended.
+
+    Parameters:
+        data (pd.DataFrame): All labeled data, including the rows seen in earlier refreshes.
+        text_col (str): The name of the column containing the text data.
+        label_col (str): The name of the column containing the label data.
+        vectorizer (TfidfVectorizer): The unfitted vectorizer, used for the first fit and full refits.
+        model_path (Path): The directory where the model and refresh state are saved.
+        report_path (Path): The directory where the classification report is saved.
+        drift_threshold (float, optional): The vocabulary drift above which the model is refitted from scratch. Defaults to 0.2.
+        holdout_size (float, optional): The approximate proportion of rows held out for evaluation. Defaults to 0.2.
+
+    Returns:
+        Dict[str, Any]: The refresh mode, the number of new rows, the vocabulary drift, the elapsed time and the holdout accuracy.
+    """
+    start_time = time.perf_counter()
+    data = data.dropna(subset=[text_col, label_col]).reset_index(drop=True)
+    row_hashes = hash_labeled_rows(data, text_col, label_col)
+    state_path = model_path / f"{MODEL_STEM}_refresh_state.joblib"
+    summary = {"num_rows": len(data), "num_new_rows": len(data), "vocabulary_drift": None}
+
+    if state_path.exists():
+        state = load(state_path)
+        vectorizer_path = model_path / f"{MODEL_STEM}_vectorizer.joblib"
+        classifier_path = model_path / f"{MODEL_STEM}_classifier.joblib"
+        fitted_vectorizer, classifier = load(vectorizer_path), load(classifier_path)
+
+        # An appended copy of an existing article is new, since it is one occurrence more than was seen
+        row_keys, seen_row_keys = key_labeled_rows(row_hashes), key_labeled_rows(state["row_hashes"])
+        is_new = ~row_keys.isin(seen_row_keys)
+        num_missing_rows = int((~seen_row_keys.isin(row_keys)).sum())
+        new_rows = data[is_new]
+        summary["num_new_rows"] = len(new_rows)
+
+        if num_missing_rows:
+            logger.warning(
+                f"{num_missing_rows} previously seen rows were removed or changed. Refitting from scratch."
+            )
+            summary["mode"] = "full_refit"
+        elif new_rows.empty:
+            logger.info("No new rows since the last refresh. The model is up to date.")
+            summary["mode"] = "unchanged"
+            return summary
+        elif not set(new_rows[label_col]).issubset(classifier.classes_):
+            logger.info("New rows contain unseen labels. Refitting from scratch.")
+            summary["mode"] = "full_refit"
+        else:
+            summary["vocabulary_drift"] = round(
+                calculate_vocabulary_drift(fitted_vectorizer, new_rows[text_col]), 3
+            )
+            summary["mode"] = (
+                "full_refit" if summary["vocabulary_drift"] > drift_threshold else "incremental"
+            )
+            logger.info(
+                f"Found {len(new_rows)} new rows with vocabulary drift {summary['vocabulary_drift']}."
+            )
+    else:
+        logger.info("No refresh state found. Fitting the initial model.")
+        summary["mode"] = "initial"
+
+    if summary["mode"] == "incremental":
+        # Previously seen rows keep their stored counts and split, and new rows are appended after them
+        new_is_holdout = create_deterministic_holdout_mask(new_rows[text_col], holdout_size)
+        new_counts = _count_terms(fitted_vectorizer, new_rows[text_col])
+        state["document_frequencies"] = state["document_frequencies"] + np.bincount(
+            new_counts[~new_is_holdout].indices,
+            minlength=len(fitted_vectorizer.vocabulary_),
+        )
+        state["num_train_documents"] += int((~new_is_holdout).sum())
+        state["counts"] = vstack([state["counts"], new_counts], format="csr")
+        state["labels"] = np.concatenate([state["labels"], new_rows[label_col].to_numpy()])
+        state["is_holdout"] = np.concatenate([state["is_holdout"], new_is_holdout])
+        row_hashes = np.concatenate([state["row_hashes"], row_hashes[is_new]])
+
+        if fitted_vectorizer.use_idf:
+            fitted_vectorizer.idf_ = calculate_idf(
+                fitted_vectorizer, state["document_frequencies"], state["num_train_documents"]
+            )
+        is_train = ~state["is_holdout"]
+        classifier.set_params(warm_start=True)
+        classifier.fit(
+            weight_term_counts(fitted_vectorizer, state["counts"][is_train]),
+            state["labels"][is_train],
+        )
+    else:
+        is_holdout = create_deterministic_holdout_mask(data[text_col], holdout_size)
+        fitted_vectorizer, classifier, state = _refit_from_scratch(
+            vectorizer, data[text_col], data[label_col].to_numpy(), is_holdout
+        )
+
+    state["row_hashes"] = row_hashes
+    summary["n_iter"] = int(classifier.n_iter_.max())
+
+    is_holdout = state["is_holdout"]
+    y_pred = classifier.predict(weight_term_counts(fitted_vectorizer, state["counts"][is_holdout]))
+    summary["holdout_accuracy"] = round(accuracy_score(state["labels"][is_holdout], y_pred), 3)
+    save_classification_report_to_txt(
+        classification_report=classification_report(state["labels"][is_holdout], y_pred),
+        output_dir=report_path,
+        file_name=f"{MODEL_STEM}_classification_report",
+    )
+
+    save_object_as_joblib(fitted_vectorizer, model_path, MODEL_STEM, "vectorizer")
+    save_object_as_joblib(classifier, model_path, MODEL_STEM, "classifier")
+    dump(state, state_path)
+
+    summary["elapsed_seconds"] = round(time.perf_counter() - start_time, 3)
+    logger.info(f"Refresh complete: {summary}")
+    return summary
+
+
+def main():
+    # Initialize input/output paths
+    input_data_path = Path(__file__).parent / ".." / "in" / "fake_or_real_news.csv"
+    report_data_path = Path(__file__).parent / ".." / "out"
+    model_data_path = (
+        Path(__file__).parent / ".." / "out" / "models" / "incremental_refresh"
+    )
+
+    # Load the labeled data, including any rows appended since the last refresh
+    news_dataset = load_labeled_data_as_df(input_data_path)
+
+    # Same vectorizer settings as the classification scripts, used when fitting from scratch
+    vectorizer = TfidfVectorizer(
+        ngram_range=(1, 2),
+        lowercase=True,
+        max_df=0.95,
+        min_df=0.05,
+        max_features=2000,
+    )
+
+    refresh_logistic_regression_model(
+        data=news_dataset,
+        text_col="text",
+        label_col="label",
+        vectorizer=vectorizer,
+        model_path=model_data_path,
+        report_path=report_data_path,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+from pathlib import Path
+from typing import Any, Dict
+
+import pandas as pd
+from sklearn.base import clone
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics import classification_report
+
+from data_processing_utilities import (
+    export_df_as_csv,
+    get_csr_memory_usage,
+    load_labeled_data_as_df,
+    prepare_data_for_model_training,
+)
+from logistic_regression import train_logistic_regression_classifier_model
+from utilities import get_logger
+
+logger = get_logger(__name__)
+
+
+def _run_feature_mode(
+    data: pd.DataFrame,
+    text_col: str,
+    label_col: str,
+    vectorizer: TfidfVectorizer,
+    lean_features: bool,
+    solver: str,
+) -> Dict[str, Any]:
+    X_train_feats, X_test_feats, y_train, y_test, _ = prepare_data_for_model_training(
+        data, text_col, label_col, vectorizer, lean_features=lean_features
+    )
+    classifier = train_logistic_regression_classifier_model(
+        X_train_feats, y_train, solver=solver
+    )
+    report = classification_report(
+        y_test, classifier.predict(X_test_feats), output_dict=True
+    )
+
+    return {
+        "mode": "lean" if lean_features else "default",
+        "solver": solver,
+        "value_dtype": str(X_train_feats.dtype),
+        "index_dtype": str(X_train_feats.indices.dtype),
+        "feature_memory_mb": (
+            get_csr_memory_usage(X_train_feats) + get_csr_memory_usage(X_test_feats)
+        )
+        / 1024**2,
+        "coef_dtype": str(classifier.coef_.dtype),
+        "accuracy": report["accuracy"],
+        "macro_f1": report["macro avg"]["f1-score"],
+    }
+
+
+def compare_lean_features(
+    data: pd.DataFrame,
+    text_col: str,
+    label_col: str,
+    vectorizer: TfidfVectorizer,
+    solver: str = "newton-cg",
+    decimals: int = 3,
+) -> pd.DataFrame:
+    """
+    Trains the logistic regression classifier on default float64 features and on lean float32 features, and compares their memory usage and scores.
+
+    Both modes are trained with the same solver, so any difference in scores comes from the feature dtype alone. The default newton-cg solver trains on float32 features without copying them to float64, unlike lbfgs.
+
+    Parameters:
+        data (pd.DataFrame): The input data containing text and label columns.
+        text_col (str): The name of the column containing the text data.
+        label_col (str): The name of the column containing the label data.
+        vectorizer (TfidfVectorizer): The unfitted vectorizer, cloned for each mode.
+        solver (str, optional): The logistic regression solver used in both modes. Defaults to "newton-cg".
+        decimals (int, optional): The number of decimals the accuracy of both modes must agree to. Defaults to 3.
+
+    Returns:
+        pd.DataFrame: One row per mode with the feature dtypes, the feature memory in megabytes and the scores.
+    """
+    results = pd.DataFrame(
+        [
+            _run_feature_mode(
+                data, text_col, label_col, clone(vectorizer), lean_features, solver
+            )
+            for lean_features in (False, True)
+        ]
+    )
+
+    default_run, lean_run = results.iloc[0], results.iloc[1]
+    logger.info(
+        f"Feature memory: {default_run['feature_memory_mb']:.2f} MB with default features, {lean_run['feature_memory_mb']:.2f} MB with lean features."
+    )
+    if round(default_run["accuracy"], decimals) == round(lean_run["accuracy"], decimals):
+        logger.info(f"Accuracy is unchanged with lean features: {lean_run['accuracy']:.{decimals}f}")
+    else:
+        logger.warning(
+            f"Accuracy changed with lean features: {default_run['accuracy']:.{decimals}f} -> {lean_run['accuracy']:.{decimals}f}"
+        )
+
+    return results
+
+
+def main():
+    # Initialize input/output paths
+    input_data_path = Path(__file__).parent / ".." / "in" / "fake_or_real_news.csv"
+    report_data_path = Path(__file__).parent / ".." / "out"
+
+    # Load the labeled data
+    news_dataset = load_labeled_data_as_df(input_data_path)
+
+    # Same vectorizer settings as the classification scripts
+    vectorizer = TfidfVectorizer(
+        ngram_range=(1, 2),
+        lowercase=True,
+        max_df=0.95,
+        min_df=0.05,
+        max_features=2000,
+    )
+
+    results = compare_lean_features(news_dataset, "text", "label", vectorizer)
+    export_df_as_csv(results.round(3), report_data_path, "lean_feature_comparison.csv")
+
+
+if __name__ == "__main__":
+    main()
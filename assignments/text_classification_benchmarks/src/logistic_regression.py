@@ -1,6 +1,7 @@
+from functools import partial
 from pathlib import Path
 from statistics import mean
-from typing import Union
+from typing import Optional, Union
 
 import numpy as np
 import pandas as pd
@@ -10,6 +11,7 @@ from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report
 
+from cli_utilities import parse_logistic_regression_arguments
 from data_processing_utilities import (
     export_df_as_csv,
     load_labeled_data_as_df,
@@ -17,7 +19,11 @@ from data_processing_utilities import (
     save_cross_validated_scores_to_csv,
     save_object_as_joblib,
     prepare_data_for_model_training,
+    prepare_data_from_vectorized_shards,
 )
+from parallel_cross_validation import parallel_cross_validate
+from progressive_sampling import progressive_sampling_fit
+from tracing import TRACER, span, traced
 from utilities import get_logger
 
 
@@ -25,13 +31,16 @@ logger = get_logger(__name__)
 
 
 def train_logistic_regression_classifier_model(
-    X_train: Union[pd.DataFrame, np.ndarray], y_train: Union[pd.Series, np.ndarray]
+    X_train: Union[pd.DataFrame, np.ndarray],
+    y_train: Union[pd.Series, np.ndarray],
+    solver: str = "lbfgs",
 ) -> LogisticRegression:
     logger.info("Training logistic regression classifier...")
-    classifier = LogisticRegression(random_state=24).fit(X_train, y_train)
+    classifier = LogisticRegression(random_state=24, solver=solver).fit(X_train, y_train)
     return classifier
 
 
+@traced("logistic_regression_pipeline")
 def logistic_regression_news_classification_pipeline(
     data: pd.DataFrame,
     text_col: str,
@@ -43,25 +52,83 @@ def logistic_regression_news_classification_pipeline(
     seed: int = 24,
     cross_validate: bool = False,
     cv_fold: int = 10,
+    cv_n_jobs: int = 1,
+    lean_features: bool = False,
+    vectorizer_fit_strategy: str = "serial",
+    vectorized_manifest_path: Optional[Path] = None,
+    progressive_sampling: bool = False,
+    progressive_sampling_tolerance: float = 0.005,
 ) -> None:
 
-    X_train_feats, X_test_feats, y_train, y_test = prepare_data_for_model_training(
-        data, text_col, label_col, vectorizer, train_test_size, seed
-    )
-
-    classifier = train_logistic_regression_classifier_model(X_train_feats, y_train)
+    if vectorized_manifest_path is not None:
+        # Read the features and the fitted vectorizer exported by vectorize_dataset.py, instead of vectorizing the text again
+        X_train_feats, X_test_feats, y_train, y_test, vectorizer = (
+            prepare_data_from_vectorized_shards(
+                vectorized_manifest_path, train_test_size, seed
+            )
+        )
+    else:
+        X_train_feats, X_test_feats, y_train, y_test, vectorizer = prepare_data_for_model_training(
+            data,
+            text_col,
+            label_col,
+            vectorizer,
+            train_test_size,
+            seed,
+            lean_features,
+            vectorizer_fit_strategy,
+        )
 
-    y_pred = classifier.predict(X_test_feats)
+    # The lbfgs solver copies float32 features to float64, newton-cg trains on them as they are
+    train_function = partial(
+        train_logistic_regression_classifier_model,
+        solver="newton-cg" if lean_features else "lbfgs",
+    )
+    with span("fit", progressive_sampling=progressive_sampling):
+        if progressive_sampling:
+            classifier, learning_curve = progressive_sampling_fit(
+                train_function,
+                X_train_feats,
+                y_train,
+                tolerance=progressive_sampling_tolerance,
+                seed=seed,
+            )
+            export_df_as_csv(
+                learning_curve.round(3),
+                report_path,
+                "logistic_regression_progressive_sampling_curve.csv",
+            )
+        else:
+            classifier = train_function(X_train_feats, y_train)
+
+    with span("predict"):
+        y_pred = classifier.predict(X_test_feats)
 
     if cross_validate:
-        logger.info(f"Cross-validating with {cv_fold} folds...")
-        scores = cross_val_score(classifier, X_train_feats, y_train, cv=cv_fold)
-        logger.info(
-            f"Cross-validation complete. Cross-validated mean score: {round(mean(scores), 2)}"
-        )
-        save_cross_validated_scores_to_csv(
-            scores, report_path, "logistic_regression_cross_validated_scores"
-        )
+        with span("cross_validate", folds=cv_fold, n_jobs=cv_n_jobs):
+            if cv_n_jobs != 1:
+                cv_results = parallel_cross_validate(
+                    classifier, X_train_feats, y_train, cv_fold, cv_n_jobs
+                )
+                logger.info(
+                    f"Cross-validation complete. Cross-validated mean score: {round(mean(cv_results['score']), 2)}"
+                )
+                save_cross_validated_scores_to_csv(
+                    cv_results["score"],
+                    report_path,
+                    "logistic_regression_cross_validated_scores",
+                    fit_times=cv_results["fit_time"],
+                    score_times=cv_results["score_time"],
+                )
+            else:
+                logger.info(f"Cross-validating with {cv_fold} folds...")
+                scores = cross_val_score(classifier, X_train_feats, y_train, cv=cv_fold)
+                logger.info(
+                    f"Cross-validation complete. Cross-validated mean score: {round(mean(scores), 2)}"
+                )
+                save_cross_validated_scores_to_csv(
+                    scores, report_path, "logistic_regression_cross_validated_scores"
+                )
 
     save_classification_report_to_txt(
         classification_report=classification_report(y_test, y_pred),
@@ -84,6 +151,9 @@ def logistic_regression_news_classification_pipeline(
 
 
 def main():
+    # Get the command-line arguments
+    cli_args = parse_logistic_regression_arguments()
+
     # Initialize input/output paths
     input_data_path = Path(__file__).parent / ".." / "in" / "fake_or_real_news.csv"
     report_data_path = Path(__file__).parent / ".." / "out"
@@ -91,6 +161,9 @@ def main():
         Path(__file__).parent / ".." / "out" / "models" / "logistic_regression"
     )
 
+    # Record the wall time and CPU time of each pipeline stage, and their peak memory only on request, since tracing memory slows the stages down
+    TRACER.enable(trace_memory=cli_args.trace_memory)
+
     # Load the labeled data
     news_dataset = load_labeled_data_as_df(input_data_path)
 
@@ -113,8 +186,14 @@ def main():
         model_path=model_data_path,
         cross_validate=True,
         cv_fold=10,
+        cv_n_jobs=-1,
     )
 
+    # Save the stage timings for a trace viewer such as chrome://tracing or Perfetto
+    TRACER.disable()
+    logger.info(f"Time and memory per stage:\n{TRACER.summarize().to_string(index=False)}")
+    TRACER.export_chrome_trace(report_data_path, "logistic_regression_trace.json")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,265 @@
+from pathlib import Path
+import time
+from typing import Any, Dict, List, Tuple
+
+from joblib import dump, load
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import (
+    CountVectorizer,
+    HashingVectorizer,
+    TfidfTransformer,
+    TfidfVectorizer,
+)
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import LabelBinarizer
+
+from data_processing_utilities import load_labeled_data_as_df, load_model_from_joblib
+from utilities import get_logger
+
+logger = get_logger(__name__)
+
+BUNDLE_FORMAT_VERSION = 2
+
+SUPPORTED_VECTORIZERS = {
+    vectorizer_class.__name__: vectorizer_class
+    for vectorizer_class in (CountVectorizer, HashingVectorizer, TfidfVectorizer)
+}
+SUPPORTED_CLASSIFIERS = {
+    classifier_class.__name__: classifier_class
+    for classifier_class in (LogisticRegression, MLPClassifier, SGDClassifier)
+}
+
+
+def _get_bundle_path(model_dir: Path, file_stem: str) -> Path:
+    return model_dir / f"{file_stem}_bundle.joblib"
+
+
+def save_model_bundle(
+    vectorizer: Any, classifier: Any, output_dir: Path, file_stem: str
+) -> Path:
+    """
+    Saves a fitted vectorizer and classifier as a single bundle file of plain numpy arrays and a small metadata header.
+
+    Unlike save_object_as_joblib, no estimator objects are pickled. The arrays are stored uncompressed, so the bundle can be loaded with memory-mapping and shared between processes.
+
+    Parameters:
+        vectorizer (Any): The fitted CountVectorizer, TfidfVectorizer or HashingVectorizer.
+        classifier (Any): The fitted LogisticRegression, SGDClassifier or MLPClassifier.
+        output_dir (Path): The directory where the bundle will be saved.
+        file_stem (str): The stem of the bundle file name.
+
+    Returns:
+        Path: The path to the saved bundle.
+
+    Raises:
+        ValueError: If the vectorizer or classifier type is not supported.
+    """
+    vectorizer_name, classifier_name = type(vectorizer).__name__, type(classifier).__name__
+    if vectorizer_name not in SUPPORTED_VECTORIZERS:
+        raise ValueError(f"Unsupported vectorizer type for model bundle: {vectorizer_name}")
+    if classifier_name not in SUPPORTED_CLASSIFIERS:
+        raise ValueError(f"Unsupported classifier type for model bundle: {classifier_name}")
+
+    arrays = {"classes": np.asarray(classifier.classes_)}
+    if hasattr(vectorizer, "vocabulary_"):
+        terms = np.empty(len(vectorizer.vocabulary_), dtype=object)
+        terms[list(vectorizer.vocabulary_.values())] = list(vectorizer.vocabulary_.keys())
+        # Fixed-width unicode, rather than object, so the terms can be memory-mapped
+        arrays["vocabulary"] = terms.astype(str)
+    if isinstance(vectorizer, TfidfVectorizer) and vectorizer.use_idf:
+        arrays["idf"] = np.asarray(vectorizer.idf_)
+
+    if isinstance(classifier, MLPClassifier):
+        for layer, (coefs, intercepts) in enumerate(
+            zip(classifier.coefs_, classifier.intercepts_)
+        ):
+            arrays[f"coefs_{layer}"] = coefs
+            arrays[f"intercepts_{layer}"] = intercepts
+    else:
+        arrays["coef"] = classifier.coef_
+        arrays["intercept"] = classifier.intercept_
+
+    metadata = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "vectorizer_class": vectorizer_name,
+        "vectorizer_params": vectorizer.get_params(),
+        "classifier_class": classifier_name,
+        "classifier_params": classifier.get_params(),
+        # The settings of the TF-IDF weighting, which is rebuilt on load whether or not it uses IDF
+        "tfidf_settings": {
+            setting: getattr(vectorizer, setting)
+            for setting in ("norm", "use_idf", "smooth_idf", "sublinear_tf")
+        }
+        if isinstance(vectorizer, TfidfVectorizer)
+        else None,
+        "n_features_in": getattr(classifier, "n_features_in_", None),
+        "out_activation": getattr(classifier, "out_activation_", None),
+    }
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    bundle_path = _get_bundle_path(output_dir, file_stem)
+    dump({"metadata": metadata, "arrays": arrays}, bundle_path)
+    logger.info(f"Model bundle saved as {bundle_path.name}")
+    return bundle_path
+
+
+def _build_vocabulary(terms: np.ndarray) -> Dict[str, int]:
+    return {term: index for index, term in enumerate(terms.tolist())}
+
+
+def _rebuild_tfidf_transformer(
+    tfidf_settings: Dict[str, Any], num_features: int, idf: Any = None
+) -> TfidfTransformer:
+    # The fitted TF-IDF weighting of a TfidfVectorizer, with the IDF vector of the bundle if it uses one
+    transformer = TfidfTransformer(**tfidf_settings)
+    transformer.fit(csr_matrix((1, num_features)))
+    if idf is not None:
+        transformer.idf_ = idf
+    return transformer
+
+
+def load_model_bundle(bundle_path: Path, mmap_mode: str = "r") -> Tuple[Any, Any]:
+    """
+    Loads a vectorizer and classifier from a bundle saved by save_model_bundle.
+
+    The arrays are memory-mapped, but the vocabulary dict of a CountVectorizer or TfidfVectorizer is rebuilt from the term array on every load, which takes time proportional to the vocabulary size. verify_model_bundle reports the time spent on it.
+
+    Parameters:
+        bundle_path (Path): The path to the bundle.
+        mmap_mode (str, optional): The memory-mapping mode passed to joblib. "r" shares the arrays between processes loading the same bundle. None loads them into private memory. Defaults to "r".
+
+    Returns:
+        Tuple[Any, Any]: The reconstructed vectorizer and classifier.
+
+    Raises:
+        ValueError: If the bundle was saved with an unsupported format version.
+    """
+    bundle = load(bundle_path, mmap_mode=mmap_mode)
+    metadata, arrays = bundle["metadata"], bundle["arrays"]
+    if metadata["format_version"] != BUNDLE_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported model bundle format version: {metadata['format_version']}. Save the bundle again with save_model_bundle."
+        )
+
+    vectorizer = SUPPORTED_VECTORIZERS[metadata["vectorizer_class"]](
+        **metadata["vectorizer_params"]
+    )
+    if "vocabulary" in arrays:
+        vectorizer.vocabulary_ = _build_vocabulary(arrays["vocabulary"])
+        vectorizer.fixed_vocabulary_ = False
+    if metadata["tfidf_settings"] is not None:
+        vectorizer._tfidf = _rebuild_tfidf_transformer(
+            metadata["tfidf_settings"], len(vectorizer.vocabulary_), arrays.get("idf")
+        )
+
+    classifier = SUPPORTED_CLASSIFIERS[metadata["classifier_class"]](
+        **metadata["classifier_params"]
+    )
+    classifier.classes_ = arrays["classes"]
+    if metadata["n_features_in"] is not None:
+        classifier.n_features_in_ = metadata["n_features_in"]
+
+    if isinstance(classifier, MLPClassifier):
+        num_layers = sum(1 for name in arrays if name.startswith("coefs_"))
+        classifier.coefs_ = [arrays[f"coefs_{layer}"] for layer in range(num_layers)]
+        classifier.intercepts_ = [arrays[f"intercepts_{layer}"] for layer in range(num_layers)]
+        classifier.n_layers_ = num_layers + 1
+        classifier.n_outputs_ = classifier.coefs_[-1].shape[1]
+        classifier.out_activation_ = metadata["out_activation"]
+        classifier._label_binarizer = LabelBinarizer().fit(classifier.classes_)
+    else:
+        classifier.coef_ = arrays["coef"]
+        classifier.intercept_ = arrays["intercept"]
+
+    return vectorizer, classifier
+
+
+def load_model(model_dir: Path, file_stem: str) -> Tuple[Any, Any]:
+    """
+    Loads a vectorizer and classifier, preferring a memory-mapped model bundle and falling back to the separate joblib files.
+
+    Parameters:
+        model_dir (Path): The directory containing the saved models.
+        file_stem (str): The stem of the saved model file names.
+
+    Returns:
+        Tuple[Any, Any]: The loaded vectorizer and classifier.
+    """
+    bundle_path = _get_bundle_path(model_dir, file_stem)
+    if bundle_path.exists():
+        logger.info(f"Loading {file_stem} from model bundle {bundle_path.name}")
+        return load_model_bundle(bundle_path)
+    return load_model_from_joblib(model_dir, file_stem)
+
+
+def verify_model_bundle(
+    vectorizer: Any, classifier: Any, bundle_path: Path, texts: List[str]
+) -> Dict[str, Any]:
+    """
+    Checks that a bundle reproduces the features, predictions and probabilities of the objects it was saved from, and times loading it.
+
+    Parameters:
+        vectorizer (Any): The original fitted vectorizer.
+        classifier (Any): The original fitted classifier.
+        bundle_path (Path): The path to the bundle saved from them.
+        texts (List[str]): The texts to compare predictions on.
+
+    Returns:
+        Dict[str, Any]: Whether features, predictions and probabilities match, the vocabulary size, and the time in milliseconds to load the bundle and, as part of it, to rebuild the vocabulary dict.
+    """
+    start_time = time.perf_counter()
+    bundled_vectorizer, bundled_classifier = load_model_bundle(bundle_path)
+    load_ms = (time.perf_counter() - start_time) * 1000
+
+    vocabulary_size = len(getattr(bundled_vectorizer, "vocabulary_", {}))
+    vocabulary_rebuild_ms = 0.0
+    if vocabulary_size:
+        terms = load(bundle_path, mmap_mode="r")["arrays"]["vocabulary"]
+        start_time = time.perf_counter()
+        _build_vocabulary(terms)
+        vocabulary_rebuild_ms = (time.perf_counter() - start_time) * 1000
+
+    original_features = vectorizer.transform(texts)
+    bundled_features = bundled_vectorizer.transform(texts)
+    results = {
+        "features_match": (original_features != bundled_features).nnz == 0,
+        "predictions_match": bool(
+            np.array_equal(
+                classifier.predict(original_features),
+                bundled_classifier.predict(bundled_features),
+            )
+        ),
+        "vocabulary_size": vocabulary_size,
+        "bundle_load_ms": round(load_ms, 3),
+        "vocabulary_rebuild_ms": round(vocabulary_rebuild_ms, 3),
+    }
+    if hasattr(classifier, "predict_proba"):
+        results["probabilities_match"] = bool(
+            np.allclose(
+                classifier.predict_proba(original_features),
+                bundled_classifier.predict_proba(bundled_features),
+            )
+        )
+    logger.info(f"Model bundle verification for {bundle_path.name}: {results}")
+    return results
+
+
+def main():
+    # Initialize input/output paths
+    input_data_path = Path(__file__).parent / ".." / "in" / "fake_or_real_news.csv"
+    models_path = Path(__file__).parent / ".." / "out" / "models"
+
+    # Texts used to verify that the bundles reproduce the original predictions
+    sample_texts = load_labeled_data_as_df(input_data_path)["text"].head(500).tolist()
+
+    for model_name in ("logistic_regression", "neural_network"):
+        model_dir = models_path / model_name
+        vectorizer, classifier = load_model_from_joblib(model_dir, model_name)
+        bundle_path = save_model_bundle(vectorizer, classifier, model_dir, model_name)
+        verify_model_bundle(vectorizer, classifier, bundle_path, sample_texts)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,105 @@
 from pathlib import Path
-from typing import Any, Dict, Optional, Union
+from tempfile import TemporaryDirectory
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
+from sklearn.base import BaseEstimator, clone
+from sklearn.decomposition import TruncatedSVD
 from sklearn.model_selection import cross_val_score, GridSearchCV
 from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
 from sklearn.neural_network import MLPClassifier
-from sklearn.metrics import classification_report
+from sklearn.metrics import accuracy_score, classification_report, f1_score
 from sklearn.neural_network import MLPClassifier
 from sklearn.model_selection import GridSearchCV, cross_val_score
+from sklearn.pipeline import Pipeline
+from sklearn.random_projection import SparseRandomProjection
 
+from cli_utilities import parse_neural_network_arguments
 from data_processing_utilities import (
+    export_df_as_csv,
     load_labeled_data_as_df,
     save_classification_report_to_txt,
     save_cross_validated_scores_to_csv,
     save_object_as_joblib,
     prepare_data_for_model_training,
 )
+from hyperparameter_search import (
+    compare_search_rankings,
+    halving_grid_search,
+    resumable_grid_search,
+    summarize_halving_search,
+)
+from parallel_cross_validation import parallel_cross_validate
+from progressive_sampling import progressive_sampling_fit
+from tracing import TRACER, span
 from utilities import get_logger
 
 logger = get_logger(__name__)
 
+# Hyperparameters determined through iterative testing and grid search
+PARAMETER_SPACE = {
+    "hidden_layer_sizes": [(50, 100, 50)],
+    "activation": ["relu"],
+    "solver": ["adam"],
+    "alpha": [0.05],
+    "learning_rate": ["constant"],
+}
+
+
+def build_reduction_stage(reduction: str, n_components: int) -> BaseEstimator:
+    """
+    Builds a transformer reducing sparse TF-IDF features to dense low-rank features.
+
+    Parameters:
+        reduction (str): Either "svd" for TruncatedSVD, or "random_projection" for a sparse random projection.
+        n_components (int): The number of dimensions to reduce to.
+
+    Returns:
+        BaseEstimator: The unfitted transformer.
+
+    Raises:
+        ValueError: If the reduction is unknown.
+    """
+    if reduction == "svd":
+        return TruncatedSVD(n_components=n_components, random_state=42)
+    if reduction == "random_projection":
+        return SparseRandomProjection(
+            n_components=n_components, dense_output=True, random_state=42
+        )
+    raise ValueError(f"Unknown reduction: {reduction}")
+
+
+def build_reduced_mlp_pipeline(
+    mlp: MLPClassifier, reduction: str, n_components: int, cache_dir: Path
+) -> Pipeline:
+    """
+    Chains a reduction stage and an MLP classifier. The fitted reduction stage is cached in cache_dir, so it is only fitted once per training fold, however many MLP configurations are trained on that fold.
+
+    Parameters:
+        mlp (MLPClassifier): The unfitted MLP classifier.
+        reduction (str): Either "svd" or "random_projection".
+        n_components (int): The number of dimensions to reduce to.
+        cache_dir (Path): The directory where fitted reduction stages are cached.
+
+    Returns:
+        Pipeline: The pipeline, with steps named "reduction" and "mlp".
+    """
+    return Pipeline(
+        [("reduction", build_reduction_stage(reduction, n_components)), ("mlp", mlp)],
+        memory=str(cache_dir),
+    )
+
+
+def prefix_parameter_grid(
+    parameter_grid: Dict[str, List[Any]], step_name: str = "mlp"
+) -> Dict[str, List[Any]]:
+    """
+    Prefixes the parameter names of a grid with a pipeline step name, so the grid applies to that step.
+    """
+    return {f"{step_name}__{name}": values for name, values in parameter_grid.items()}
+
 
 def train_neural_network_classifier_model(
     output_dir: Path,
@@ -30,9 +109,19 @@ def train_neural_network_classifier_model(
     use_grid_search: bool = False,
     grid_search_params: Optional[Dict[str, Any]] = None,
     grid_search_folds: int = 5,
+    search_strategy: str = "grid",
+    halving_resource: str = "n_samples",
+    compare_with_full_grid: bool = False,
+    search_store_path: Optional[Path] = None,
     cross_validate: bool = False,
     cv_fold: int = 10,
-) -> MLPClassifier:
+    cv_n_jobs: int = 1,
+    reduction: Optional[str] = None,
+    n_components: int = 100,
+    reduction_cache_dir: Optional[Path] = None,
+    progressive_sampling: bool = False,
+    progressive_sampling_tolerance: float = 0.005,
+) -> Union[MLPClassifier, Pipeline]:
     """
     Trains a neural network classifier model. Saves the trained model, vectroizer, and classification report.
 
@@ -43,58 +132,225 @@ def train_neural_network_classifier_model(
         clf_parameters (Dict[str, Any]): The parameters for the MLPClassifier model.
         use_grid_search (bool, optional): Whether to perform grid search for hyperparameters. Defaults to False.
         grid_search_params (Optional[Dict[str, Any]], optional): The grid search parameters. Defaults to None.
+        grid_search_folds (int, optional): The number of cross-validation folds used in the grid search. Defaults to 5.
+        search_strategy (str, optional): Either "grid" for an exhaustive grid search, "halving" for a successive halving search that discards weak configurations early, or "resumable" for an exhaustive grid search that persists every fold result and skips the ones already evaluated. Defaults to "grid".
+        halving_resource (str, optional): The budget that grows between successive halving rounds, either "n_samples" or "max_iter". Defaults to "n_samples".
+        compare_with_full_grid (bool, optional): Whether to also run the exhaustive grid search, to report the rank agreement of the successive halving result. Defaults to False.
+        search_store_path (Optional[Path], optional): The SQLite database used by the resumable search. Defaults to None, using neural_network_search_results.sqlite in output_dir.
         cross_validate (bool, optional): Whether to perform cross-validation. Defaults to False.
         cv_fold (int, optional): The number of cross-validation folds. Defaults to 10.
+        cv_n_jobs (int, optional): The number of processes used for cross-validation. Values other than 1 run the folds in parallel on a memory-mapped copy of X_train. Defaults to 1.
+        reduction (Optional[str], optional): Either "svd" or "random_projection" to train the MLP on dense low-rank features, or None to train it on the sparse features. Defaults to None.
+        n_components (int, optional): The number of dimensions the reduction stage reduces to. Defaults to 100.
+        reduction_cache_dir (Optional[Path], optional): The directory where fitted reduction stages are cached. Defaults to None, using neural_network_reduction_cache in output_dir.
+        progressive_sampling (bool, optional): Whether to train on growing subsets of the training data, stopping once the validation accuracy plateaus, instead of on all of it. Only used without grid search. The learning curve is saved as neural_network_progressive_sampling_curve.csv. Defaults to False.
+        progressive_sampling_tolerance (float, optional): The smallest gain in validation accuracy that counts as an improvement when progressive sampling. Defaults to 0.005.
 
     Returns:
-        MLPClassifier: The trained MLPClassifier model.
+        Union[MLPClassifier, Pipeline]: The trained MLPClassifier model, or a pipeline of the reduction stage and the model if a reduction is used.
+
+    Raises:
+        ValueError: If the search strategy is unknown.
     """
-    logger.info("Training neural network classifier...")
+    if search_strategy not in ("grid", "halving", "resumable"):
+        raise ValueError(f"Unknown search strategy: {search_strategy}")
 
-    if use_grid_search and grid_search_params is not None:
-        num_combinations = np.prod([len(v) for v in grid_search_params.values()])
-        num_fits = num_combinations * grid_search_folds
-        logger.info("Performing grid search for hyperparameters...")
-        # Define the model
-        mlp = MLPClassifier(max_iter=1000, random_state=42, early_stopping=True)
-
-        # Set up the grid search
-        clf = GridSearchCV(mlp, grid_search_params, n_jobs=-1, cv=grid_search_folds, verbose=3)
-
-        # Fit the model and find the best hyperparameters
-        clf.fit(X_train, y_train)
-
-        logger.info(f"Best parameters found: {clf.best_params_}")
-
-        best_estimator = clf.best_estimator_
-    else:
-        unpacked_clf_parameters = {
-            key: value[0] for key, value in clf_parameters.items()
-        }
-        best_estimator = MLPClassifier(
-            **unpacked_clf_parameters,
-            max_iter=1000,
-            random_state=42,
-            early_stopping=True,
-        ).fit(X_train, y_train)
+    logger.info("Training neural network classifier...")
 
-    if cross_validate:
-        logger.info(f"Cross-validating with {cv_fold} folds...")
-        scores = cross_val_score(best_estimator, X_train, y_train, cv=cv_fold)
-        logger.info(
-            f"Cross-validation complete. Cross-validated mean score: {round(np.mean(scores), 2)}"
+    def build_estimator(mlp: MLPClassifier) -> Union[MLPClassifier, Pipeline]:
+        if reduction is None:
+            return mlp
+        return build_reduced_mlp_pipeline(
+            mlp,
+            reduction,
+            n_components,
+            reduction_cache_dir or output_dir / "neural_network_reduction_cache",
         )
 
-        save_cross_validated_scores_to_csv(scores, output_dir, "neural_network_cross_validated_scores")
+    if reduction is not None and grid_search_params is not None:
+        # The grid and the halving resource apply to the MLP step of the pipeline
+        grid_search_params = prefix_parameter_grid(grid_search_params)
+        if halving_resource != "n_samples":
+            halving_resource = f"mlp__{halving_resource}"
+
+    with span("fit"):
+        if use_grid_search and grid_search_params is not None:
+            num_combinations = np.prod([len(v) for v in grid_search_params.values()])
+            num_fits = num_combinations * grid_search_folds
+            logger.info("Performing grid search for hyperparameters...")
+            # Define the model
+            mlp = build_estimator(
+                MLPClassifier(max_iter=1000, random_state=42, early_stopping=True)
+            )
+
+            if search_strategy == "halving":
+                clf = halving_grid_search(
+                    mlp,
+                    grid_search_params,
+                    X_train,
+                    y_train,
+                    cv=grid_search_folds,
+                    resource=halving_resource,
+                )
+                search_summary = summarize_halving_search(
+                    clf, grid_search_params, grid_search_folds
+                )
+                if compare_with_full_grid:
+                    full_grid_search = GridSearchCV(
+                        mlp, grid_search_params, n_jobs=-1, cv=grid_search_folds, verbose=3
+                    ).fit(X_train, y_train)
+                    search_summary |= compare_search_rankings(clf, full_grid_search)
+
+                export_df_as_csv(
+                    pd.DataFrame([search_summary]),
+                    output_dir,
+                    "neural_network_halving_search_report.csv",
+                )
+
+                best_estimator = clf.best_estimator_
+            elif search_strategy == "resumable":
+                best_estimator, search_results = resumable_grid_search(
+                    mlp,
+                    grid_search_params,
+                    X_train,
+                    y_train,
+                    store_path=search_store_path
+                    or output_dir / "neural_network_search_results.sqlite",
+                    cv=grid_search_folds,
+                )
+                export_df_as_csv(
+                    search_results, output_dir, "neural_network_grid_search_results.csv"
+                )
+            else:
+                # Set up the grid search
+                clf = GridSearchCV(mlp, grid_search_params, n_jobs=-1, cv=grid_search_folds, verbose=3)
+
+                # Fit the model and find the best hyperparameters
+                clf.fit(X_train, y_train)
+
+                logger.info(f"Best parameters found: {clf.best_params_}")
+
+                best_estimator = clf.best_estimator_
+        else:
+            unpacked_clf_parameters = {
+                key: value[0] for key, value in clf_parameters.items()
+            }
+            mlp = build_estimator(
+                MLPClassifier(
+                    **unpacked_clf_parameters,
+                    max_iter=1000,
+                    random_state=42,
+                    early_stopping=True,
+                )
+            )
+            if progressive_sampling:
+                best_estimator, learning_curve = progressive_sampling_fit(
+                    lambda X, y: clone(mlp).fit(X, y),
+                    X_train,
+                    y_train,
+                    tolerance=progressive_sampling_tolerance,
+                )
+                export_df_as_csv(
+                    learning_curve.round(3),
+                    output_dir,
+                    "neural_network_progressive_sampling_curve.csv",
+                )
+            else:
+                best_estimator = mlp.fit(X_train, y_train)
+
+    if cross_validate:
+        with span("cross_validate", folds=cv_fold, n_jobs=cv_n_jobs):
+            if cv_n_jobs != 1:
+                cv_results = parallel_cross_validate(
+                    best_estimator, X_train, y_train, cv_fold, cv_n_jobs
+                )
+                logger.info(
+                    f"Cross-validation complete. Cross-validated mean score: {round(np.mean(cv_results['score']), 2)}"
+                )
+
+                save_cross_validated_scores_to_csv(
+                    cv_results["score"],
+                    output_dir,
+                    "neural_network_cross_validated_scores",
+                    fit_times=cv_results["fit_time"],
+                    score_times=cv_results["score_time"],
+                )
+            else:
+                logger.info(f"Cross-validating with {cv_fold} folds...")
+                scores = cross_val_score(best_estimator, X_train, y_train, cv=cv_fold)
+                logger.info(
+                    f"Cross-validation complete. Cross-validated mean score: {round(np.mean(scores), 2)}"
+                )
+
+                save_cross_validated_scores_to_csv(scores, output_dir, "neural_network_cross_validated_scores")
 
     return best_estimator
 
 
+def compare_reduction_with_full_features(
+    output_dir: Path,
+    X_train: Union[pd.DataFrame, np.ndarray],
+    y_train: Union[pd.Series, np.ndarray],
+    X_test: Union[pd.DataFrame, np.ndarray],
+    y_test: Union[pd.Series, np.ndarray],
+    clf_parameters: Dict[str, Any],
+    reductions: List[Tuple[str, int]],
+) -> pd.DataFrame:
+    """
+    Trains the MLP on the full sparse features and on each reduced feature set, and saves their training time, prediction time and scores side by side.
+
+    Parameters:
+        output_dir (Path): The directory where the comparison is saved, as neural_network_reduction_comparison.csv.
+        X_train (Union[pd.DataFrame, np.ndarray]): The input features for training.
+        y_train (Union[pd.Series, np.ndarray]): The target labels for training.
+        X_test (Union[pd.DataFrame, np.ndarray]): The input features for testing.
+        y_test (Union[pd.Series, np.ndarray]): The target labels for testing.
+        clf_parameters (Dict[str, Any]): The parameters for the MLPClassifier model.
+        reductions (List[Tuple[str, int]]): The reductions to compare, as pairs of reduction name and number of components.
+
+    Returns:
+        pd.DataFrame: One row per feature set, the first being the full-feature baseline.
+    """
+    results = []
+    for reduction, n_components in [(None, X_train.shape[1])] + reductions:
+        with TemporaryDirectory(prefix="reduction_cache_") as cache_dir:
+            start_time = time.perf_counter()
+            classifier = train_neural_network_classifier_model(
+                output_dir=output_dir,
+                X_train=X_train,
+                y_train=y_train,
+                clf_parameters=clf_parameters,
+                reduction=reduction,
+                n_components=n_components,
+                reduction_cache_dir=Path(cache_dir),
+            )
+            fit_seconds = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        y_pred = classifier.predict(X_test)
+        predict_seconds = time.perf_counter() - start_time
+
+        results.append(
+            {
+                "features": "full" if reduction is None else f"{reduction}_{n_components}",
+                "num_features": n_components,
+                "fit_seconds": round(fit_seconds, 3),
+                "predict_seconds": round(predict_seconds, 3),
+                "accuracy": round(accuracy_score(y_test, y_pred), 3),
+                "macro_f1": round(f1_score(y_test, y_pred, average="macro"), 3),
+            }
+        )
+
+    comparison = pd.DataFrame(results)
+    export_df_as_csv(comparison, output_dir, "neural_network_reduction_comparison.csv")
+    return comparison
+
+
 def neural_network_news_classification_pipeline(
     vectorizer: Union[CountVectorizer, TfidfVectorizer],
     report_path: Path,
     model_path: Path,
-    classifier: MLPClassifier, 
+    classifier: Union[MLPClassifier, Pipeline],
     X_test_feats: Union[pd.DataFrame, np.ndarray],
     y_test: Union[pd.Series, np.ndarray],
 ) -> None:
@@ -105,12 +361,13 @@ def neural_network_news_classification_pipeline(
         vectorizer (Union[CountVectorizer, TfidfVectorizer]): The vectorizer used to transform the input data.
         report_path (Path): The path to save the classification report.
         model_path (Path): The path to save the trained model.
-        classifier (MLPClassifier): The neural network classifier.
+        classifier (Union[MLPClassifier, Pipeline]): The neural network classifier, optionally preceded by a reduction stage.
         X_test_feats (Union[pd.DataFrame, np.ndarray]): The features of the test data.
         y_test (Union[pd.Series, np.ndarray]): The labels of the test data.
 
     """
-    y_pred = classifier.predict(X_test_feats)
+    with span("predict"):
+        y_pred = classifier.predict(X_test_feats)
 
     save_classification_report_to_txt(
         classification_report=classification_report(y_test, y_pred),
@@ -133,11 +390,17 @@ def neural_network_news_classification_pipeline(
 
 
 def main():
+    # Get the command-line arguments
+    cli_args = parse_neural_network_arguments()
+
     # Initialize input/output paths
     input_data_path = Path(__file__).parent / ".." / "in" / "fake_or_real_news.csv"
     report_data_path = Path(__file__).parent / ".." / "out"
     model_data_path = Path(__file__).parent / ".." / "out" / "models" / "neural_network"
 
+    # Record the wall time and CPU time of each pipeline stage, and their peak memory only on request, since tracing memory slows the stages down
+    TRACER.enable(trace_memory=cli_args.trace_memory)
+
     # Load the labeled data
     news_dataset = load_labeled_data_as_df(input_data_path)
 
@@ -150,25 +413,18 @@ def main():
         max_features=2000,
     )
 
-    # Prepare the data for model training
-    X_train_feats, X_test_feats, y_train, y_test = prepare_data_for_model_training(
+    # Prepare the data for model training. With lean_features=True, the MLP trains on float32 features with int32 indices, which it keeps as float32
+    X_train_feats, X_test_feats, y_train, y_test, vectorizer = prepare_data_for_model_training(
         data=news_dataset,
         text_col="text",
         label_col="label",
         vectorizer=vectorizer,
         train_test_size=0.20,
         seed=24,
+        lean_features=False,
     )
 
     # Define the grid of hyperparameters to search
-    parameter_space = {
-        "hidden_layer_sizes": [(50, 100, 50)],
-        "activation": ["relu"],
-        "solver": ["adam"],
-        "alpha": [0.05],
-        "learning_rate": ["constant"],
-    }
-
     grid_search_parameters = {
         "hidden_layer_sizes": [(50, 100, 50), (100, 100, 100), (100, 200, 100)],
         "alpha": [0.05, 0.01, 0.001],
@@ -184,11 +440,12 @@ def main():
         output_dir=report_data_path,
         X_train=X_train_feats,
         y_train=y_train,
-        clf_parameters=parameter_space,
+        clf_parameters=PARAMETER_SPACE,
         use_grid_search=False,
         grid_search_params=grid_search_parameters,
         cross_validate=True,
         cv_fold=10,
+        cv_n_jobs=-1,
     )
 
     # Run the neural network pipeline, training the model and saving the report and model
@@ -201,6 +458,23 @@ def main():
         model_path=model_data_path,
     )
 
+    # Save the stage timings for a trace viewer such as chrome://tracing or Perfetto
+    TRACER.disable()
+    logger.info(f"Time and memory per stage:\n{TRACER.summarize().to_string(index=False)}")
+    TRACER.export_chrome_trace(report_data_path, "neural_network_trace.json")
+
+    # Optionally compare the full-feature model with models trained on dense low-rank features
+    if cli_args.compare_reduction:
+        compare_reduction_with_full_features(
+            output_dir=report_data_path,
+            X_train=X_train_feats,
+            y_train=y_train,
+            X_test=X_test_feats,
+            y_test=y_test,
+            clf_parameters=PARAMETER_SPACE,
+            reductions=[("svd", 100), ("random_projection", 100)],
+        )
+
 
 if __name__ == "__main__":
     main()
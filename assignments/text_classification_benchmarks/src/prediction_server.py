@@ -0,0 +1,302 @@
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from cli_utilities import parse_prediction_server_arguments
+from model_bundle import load_model
+from utilities import get_logger
+
+logger = get_logger(__name__)
+
+
+class LatencyTracker:
+    """
+    Keeps a rolling window of request latencies and batch sizes, and summarizes them as percentiles.
+    """
+
+    def __init__(self, window_size: int = 10000):
+        self.latencies = deque(maxlen=window_size)
+        self.batch_sizes = deque(maxlen=window_size)
+        self.num_requests = 0
+        self.lock = threading.Lock()
+
+    def record_request(self, latency_seconds: float) -> None:
+        with self.lock:
+            self.latencies.append(latency_seconds)
+            self.num_requests += 1
+
+    def record_batch(self, batch_size: int) -> None:
+        with self.lock:
+            self.batch_sizes.append(batch_size)
+
+    def summary(self) -> Dict[str, Any]:
+        with self.lock:
+            latencies_ms = np.array(self.latencies) * 1000
+            batch_sizes = np.array(self.batch_sizes)
+            num_requests = self.num_requests
+
+        if latencies_ms.size == 0:
+            return {"num_requests": num_requests}
+        return {
+            "num_requests": num_requests,
+            "p50_latency_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+            "p99_latency_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+            "mean_batch_size": round(float(batch_sizes.mean()), 2) if batch_sizes.size else None,
+        }
+
+
+class MicroBatcher:
+    """
+    Collects documents from concurrent requests for a short time window, and predicts them in a single vectorizer and classifier call.
+    """
+
+    def __init__(
+        self,
+        vectorizer: Any,
+        classifier: Any,
+        latency_tracker: LatencyTracker,
+        max_batch_size: int = 64,
+        batch_window_ms: float = 5.0,
+    ):
+        self.vectorizer = vectorizer
+        self.classifier = classifier
+        self.latency_tracker = latency_tracker
+        self.max_batch_size = max_batch_size
+        self.batch_window_seconds = batch_window_ms / 1000
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        Queues documents for prediction. The returned future resolves to one prediction per document.
+        """
+        future = Future()
+        self.requests.put((texts, future))
+        return future
+
+    def stop(self) -> None:
+        self.requests.put(None)
+        self.worker.join()
+
+    def _collect_batch(self) -> List[Tuple[List[str], Future]]:
+        batch = [self.requests.get()]
+        if batch[0] is None:
+            return []
+        num_documents = len(batch[0][0])
+        deadline = time.perf_counter() + self.batch_window_seconds
+        while num_documents < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                # Put the stop signal back, so the loop exits after this batch
+                self.requests.put(None)
+                break
+            batch.append(request)
+            num_documents += len(request[0])
+        return batch
+
+    def _predict(self, texts: List[str]) -> List[Dict[str, Any]]:
+        features = self.vectorizer.transform(texts)
+        labels = self.classifier.predict(features)
+        if not hasattr(self.classifier, "predict_proba"):
+            return [{"label": str(label)} for label in labels]
+
+        probabilities = self.classifier.predict_proba(features)
+        classes = [str(label) for label in self.classifier.classes_]
+        return [
+            {"label": str(label), "probabilities": dict(zip(classes, row.round(6).tolist()))}
+            for label, row in zip(labels, probabilities)
+        ]
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            if not batch:
+                return
+
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                predictions = self._predict(texts)
+            except Exception as e:
+                logger.error(f"Failed to predict batch of {len(texts)} documents: {e}")
+                self._predict_requests_separately(batch)
+                continue
+
+            self.latency_tracker.record_batch(len(texts))
+            start = 0
+            for request_texts, future in batch:
+                future.set_result(predictions[start : start + len(request_texts)])
+                start += len(request_texts)
+
+    def _predict_requests_separately(self, batch: List[Tuple[List[str], Future]]) -> None:
+        # Fallback after a failed batch, so a request that cannot be predicted only fails itself
+        for request_texts, future in batch:
+            try:
+                predictions = self._predict(request_texts)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            self.latency_tracker.record_batch(len(request_texts))
+            future.set_result(predictions)
+
+
+def get_texts_from_request_body(body: Any) -> List[str]:
+    """
+    Returns the documents of a /predict request body, either {"texts": [...]} with a non-empty list of strings or {"text": "..."}.
+
+    Raises:
+        ValueError: If the body has neither form.
+    """
+    if not isinstance(body, dict):
+        raise ValueError("The body must be a JSON object.")
+    if "texts" in body:
+        texts = body["texts"]
+        if not isinstance(texts, list) or not texts:
+            raise ValueError('"texts" must be a non-empty list of strings.')
+    elif "text" in body:
+        texts = [body["text"]]
+    else:
+        raise ValueError('The body must contain "texts" or "text".')
+    if not all(isinstance(text, str) for text in texts):
+        raise ValueError("All texts must be strings.")
+    return texts
+
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles POST /predict with a JSON body of {"texts": [...]} or {"text": "..."}, GET /metrics and GET /health.
+    """
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self._send_json(200, self.server.latency_tracker.summary())
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        start_time = time.perf_counter()
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            texts = get_texts_from_request_body(body)
+        except ValueError as e:
+            self._send_json(400, {"error": f"Invalid request body: {e}"})
+            return
+
+        try:
+            predictions = self.server.batcher.submit(texts).result()
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+
+        self.server.latency_tracker.record_request(time.perf_counter() - start_time)
+        self._send_json(200, {"predictions": predictions})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Route access logs through the project logger, at debug level to keep the output readable under load
+        logger.debug(format % args)
+
+
+class PredictionHTTPServer(ThreadingHTTPServer):
+    """
+    A threading HTTP server with a listen backlog large enough for bursts of concurrent clients. The default of 5 resets connections beyond it.
+    """
+
+    request_queue_size = 128
+
+
+def create_prediction_server(
+    vectorizer: Any,
+    classifier: Any,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    max_batch_size: int = 64,
+    batch_window_ms: float = 5.0,
+) -> ThreadingHTTPServer:
+    """
+    Creates an HTTP server predicting with an already loaded vectorizer and classifier. The server is not started.
+
+    Parameters:
+        vectorizer (Any): The fitted vectorizer.
+        classifier (Any): The fitted classifier.
+        host (str, optional): The host to bind the server to. Defaults to "127.0.0.1".
+        port (int, optional): The port to bind the server to, 0 picking a free port. Defaults to 8000.
+        max_batch_size (int, optional): The maximum number of documents predicted in one batch. Defaults to 64.
+        batch_window_ms (float, optional): How long to wait for concurrent requests to join a batch, in milliseconds. Defaults to 5.0.
+
+    Returns:
+        ThreadingHTTPServer: The server. Call serve_forever to start it, and shutdown_prediction_server to stop it.
+    """
+    server = PredictionHTTPServer((host, port), PredictionRequestHandler)
+    server.latency_tracker = LatencyTracker()
+    server.batcher = MicroBatcher(
+        vectorizer, classifier, server.latency_tracker, max_batch_size, batch_window_ms
+    )
+    return server
+
+
+def shutdown_prediction_server(server: ThreadingHTTPServer) -> None:
+    """
+    Stops a running prediction server and its batching thread.
+    """
+    server.shutdown()
+    server.server_close()
+    server.batcher.stop()
+
+
+def main():
+    # Get the command-line arguments
+    cli_args = parse_prediction_server_arguments()
+
+    # Load the vectorizer and classifier once, shared by all requests
+    model_dir = Path(__file__).parent / ".." / cli_args.model_dir
+    vectorizer, classifier = load_model(model_dir, cli_args.model_stem)
+
+    server = create_prediction_server(
+        vectorizer,
+        classifier,
+        host=cli_args.host,
+        port=cli_args.port,
+        max_batch_size=cli_args.max_batch_size,
+        batch_window_ms=cli_args.batch_window_ms,
+    )
+    host, port = server.server_address[:2]
+    logger.info(f"Serving {cli_args.model_stem} predictions on http://{host}:{port}/predict")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down prediction server...")
+    finally:
+        server.server_close()
+        server.batcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import time
+from typing import Any, Callable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator
+from sklearn.model_selection import train_test_split
+
+from utilities import get_logger
+
+logger = get_logger(__name__)
+
+
+def order_rows_for_stratified_prefixes(
+    y: Union[pd.Series, np.ndarray], seed: int = 24
+) -> np.ndarray:
+    """
+    Orders rows so that every prefix of the order is a stratified sample, i.e. has close to the class proportions of the full data.
+
+    Rows are shuffled within each class, and each row is placed at its relative position within its class, so the classes are interleaved evenly.
+
+    Parameters:
+        y (Union[pd.Series, np.ndarray]): The labels.
+        seed (int, optional): The random seed for shuffling within each class. Defaults to 24.
+
+    Returns:
+        np.ndarray: The row indices in order.
+    """
+    y = np.asarray(y)
+    random_state = np.random.RandomState(seed)
+    positions = np.empty(len(y))
+    for label in np.unique(y):
+        class_rows = random_state.permutation(np.flatnonzero(y == label))
+        positions[class_rows] = (np.arange(len(class_rows)) + 0.5) / len(class_rows)
+    return np.argsort(positions, kind="stable")
+
+
+def get_geometric_sample_sizes(
+    num_rows: int, initial_size: int, growth_factor: float
+) -> List[int]:
+    """
+    Returns sample sizes growing geometrically from initial_size, the last one being num_rows.
+    """
+    if growth_factor <= 1:
+        raise ValueError(f"growth_factor must be greater than 1, got {growth_factor}.")
+    sizes = []
+    size = float(min(initial_size, num_rows))
+    while int(size) < num_rows:
+        sizes.append(int(size))
+        size *= growth_factor
+    return sizes + [num_rows]
+
+
+def progressive_sampling_fit(
+    train_function: Callable[[Any, Any], BaseEstimator],
+    X_train: Any,
+    y_train: Union[pd.Series, np.ndarray],
+    validation_size: float = 0.2,
+    initial_size: int = 200,
+    growth_factor: float = 2.0,
+    tolerance: float = 0.005,
+    patience: int = 2,
+    seed: int = 24,
+) -> Tuple[BaseEstimator, pd.DataFrame]:
+    """
+    Trains on geometrically growing, nested and stratified subsets of the training data, and stops once the validation score has plateaued.
+
+    A validation set is carved out of the training data, so the test set stays untouched. Training stops when the validation accuracy has improved by less than the tolerance for `patience` consecutive subsets, or when the subset is the whole remaining training data.
+
+    Parameters:
+        train_function (Callable[[Any, Any], BaseEstimator]): A function training a classifier on features and labels.
+        X_train (Any): The training features.
+        y_train (Union[pd.Series, np.ndarray]): The training labels.
+        validation_size (float, optional): The proportion of the training data held out for validation. Defaults to 0.2.
+        initial_size (int, optional): The number of rows in the first subset. Defaults to 200.
+        growth_factor (float, optional): The factor the subset grows by each step. Defaults to 2.0.
+        tolerance (float, optional): The smallest gain in validation accuracy that counts as an improvement. Defaults to 0.005.
+        patience (int, optional): The number of consecutive subsets without improvement after which training stops, so a single noisy step on a small subset does not end training. Defaults to 2.
+        seed (int, optional): The random seed for the validation split and subset order. Defaults to 24.
+
+    Returns:
+        Tuple[BaseEstimator, pd.DataFrame]: The classifier with the best validation accuracy, and the learning curve with the subset size, validation accuracy, fit time and cumulative compute of each step.
+    """
+    y_train = np.asarray(y_train)
+    fit_rows, validation_rows = train_test_split(
+        np.arange(len(y_train)),
+        test_size=validation_size,
+        random_state=seed,
+        stratify=y_train,
+    )
+    X_fit, y_fit = X_train[fit_rows], y_train[fit_rows]
+    X_validation, y_validation = X_train[validation_rows], y_train[validation_rows]
+
+    row_order = order_rows_for_stratified_prefixes(y_fit, seed)
+    sample_sizes = get_geometric_sample_sizes(len(y_fit), initial_size, growth_factor)
+
+    curve = []
+    best_score = -np.inf
+    steps_without_improvement = 0
+    for sample_size in sample_sizes:
+        subset = row_order[:sample_size]
+        start_time = time.perf_counter()
+        classifier = train_function(X_fit[subset], y_fit[subset])
+        fit_seconds = time.perf_counter() - start_time
+        score = classifier.score(X_validation, y_validation)
+
+        curve.append(
+            {
+                "sample_size": sample_size,
+                "validation_accuracy": score,
+                "gain": None if not curve else score - curve[-1]["validation_accuracy"],
+                "fit_seconds": fit_seconds,
+                "cumulative_fit_seconds": fit_seconds
+                + (curve[-1]["cumulative_fit_seconds"] if curve else 0),
+                "cumulative_rows_fitted": sample_size
+                + (curve[-1]["cumulative_rows_fitted"] if curve else 0),
+            }
+        )
+        logger.info(
+            f"Trained on {sample_size} of {len(y_fit)} rows: validation accuracy {score:.3f}."
+        )
+
+        if score - best_score < tolerance:
+            steps_without_improvement += 1
+        else:
+            steps_without_improvement = 0
+        if score > best_score:
+            best_score, best_classifier = score, classifier
+        if steps_without_improvement >= patience:
+            logger.info(
+                f"Validation accuracy plateaued after {sample_size} rows. Stopping early."
+            )
+            break
+
+    curve = pd.DataFrame(curve)
+    logger.info(
+        f"Progressive sampling fitted {curve['cumulative_rows_fitted'].iloc[-1]} rows in total, on subsets of up to {curve['sample_size'].iloc[-1]} of {len(y_fit)} rows."
+    )
+    return best_classifier, curve
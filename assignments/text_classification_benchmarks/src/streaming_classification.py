@@ -0,0 +1,223 @@
+from pathlib import Path
+from typing import List, Union
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import classification_report
+from sklearn.naive_bayes import MultinomialNB
+
+from data_processing_utilities import (
+    create_deterministic_holdout_mask,
+    load_labeled_data_in_chunks,
+    save_classification_report_to_txt,
+    save_object_as_joblib,
+)
+from utilities import get_logger
+
+logger = get_logger(__name__)
+
+
+def train_classifier_out_of_core(
+    input_path: Path,
+    text_col: str,
+    label_col: str,
+    vectorizer: HashingVectorizer,
+    classifier: Union[SGDClassifier, MultinomialNB],
+    classes: List[str],
+    train_test_size: float = 0.2,
+    chunk_size: int = 1000,
+    epochs: int = 1,
+) -> Union[SGDClassifier, MultinomialNB]:
+    """
+    Trains a classifier incrementally, streaming the training data from disk in chunks.
+
+    Only a single chunk is held in memory at a time. Rows are assigned to the test split by hashing their text, so the held-out rows are skipped during training and can be evaluated separately.
+
+    Parameters:
+        input_path (Path): The path to the CSV file containing the labeled data.
+        text_col (str): The name of the column containing the text data.
+        label_col (str): The name of the column containing the label data.
+        vectorizer (HashingVectorizer): The stateless vectorizer used to transform each chunk into feature vectors.
+        classifier (Union[SGDClassifier, MultinomialNB]): The classifier to train. Must implement partial_fit.
+        classes (List[str]): All labels present in the data, required by partial_fit on the first call.
+        train_test_size (float, optional): The proportion of data to hold out for testing. Defaults to 0.2.
+        chunk_size (int, optional): The number of rows per chunk. Defaults to 1000.
+        epochs (int, optional): The number of passes over the training data. Defaults to 1.
+
+    Returns:
+        Union[SGDClassifier, MultinomialNB]: The trained classifier.
+    """
+    logger.info(
+        f"Training {type(classifier).__name__} out-of-core over {epochs} epoch(s)..."
+    )
+    for epoch in range(1, epochs + 1):
+        num_train_rows = 0
+        for chunk in load_labeled_data_in_chunks(
+            input_path, chunk_size, usecols=[text_col, label_col]
+        ):
+            chunk = chunk.dropna(subset=[text_col, label_col])
+            is_test = create_deterministic_holdout_mask(chunk[text_col], train_test_size)
+            train_chunk = chunk[~is_test]
+            if train_chunk.empty:
+                continue
+
+            X_chunk = vectorizer.transform(train_chunk[text_col])
+            classifier.partial_fit(X_chunk, train_chunk[label_col], classes=classes)
+            num_train_rows += len(train_chunk)
+        logger.info(f"Epoch {epoch} complete. Trained on {num_train_rows} rows.")
+
+    return classifier
+
+
+def evaluate_classifier_out_of_core(
+    input_path: Path,
+    text_col: str,
+    label_col: str,
+    vectorizer: HashingVectorizer,
+    classifier: Union[SGDClassifier, MultinomialNB],
+    train_test_size: float = 0.2,
+    chunk_size: int = 1000,
+) -> str:
+    """
+    Evaluates a classifier on the held-out rows of a CSV file, streaming the data from disk in chunks.
+
+    Parameters:
+        input_path (Path): The path to the CSV file containing the labeled data.
+        text_col (str): The name of the column containing the text data.
+        label_col (str): The name of the column containing the label data.
+        vectorizer (HashingVectorizer): The vectorizer used during training.
+        classifier (Union[SGDClassifier, MultinomialNB]): The trained classifier.
+        train_test_size (float, optional): The proportion of data held out for testing. Must match the value used in training. Defaults to 0.2.
+        chunk_size (int, optional): The number of rows per chunk. Defaults to 1000.
+
+    Returns:
+        str: The classification report for the held-out rows.
+    """
+    logger.info(f"Evaluating {type(classifier).__name__} on held-out rows...")
+    y_true, y_pred = [], []
+    for chunk in load_labeled_data_in_chunks(
+        input_path, chunk_size, usecols=[text_col, label_col]
+    ):
+        chunk = chunk.dropna(subset=[text_col, label_col])
+        is_test = create_deterministic_holdout_mask(chunk[text_col], train_test_size)
+        test_chunk = chunk[is_test]
+        if test_chunk.empty:
+            continue
+
+        y_true.append(test_chunk[label_col].to_numpy())
+        y_pred.append(classifier.predict(vectorizer.transform(test_chunk[text_col])))
+
+    return classification_report(np.concatenate(y_true), np.concatenate(y_pred))
+
+
+def streaming_news_classification_pipeline(
+    input_path: Path,
+    text_col: str,
+    label_col: str,
+    vectorizer: HashingVectorizer,
+    classifier: Union[SGDClassifier, MultinomialNB],
+    classes: List[str],
+    file_stem: str,
+    report_path: Path,
+    model_path: Path,
+    train_test_size: float = 0.2,
+    chunk_size: int = 1000,
+    epochs: int = 1,
+) -> None:
+    """
+    Runs the out-of-core news classification pipeline. Saves the classification report, vectorizer and classifier.
+
+    Parameters:
+        input_path (Path): The path to the CSV file containing the labeled data.
+        text_col (str): The name of the column containing the text data.
+        label_col (str): The name of the column containing the label data.
+        vectorizer (HashingVectorizer): The stateless vectorizer used to transform the text data.
+        classifier (Union[SGDClassifier, MultinomialNB]): The classifier to train. Must implement partial_fit.
+        classes (List[str]): All labels present in the data.
+        file_stem (str): The stem used for the report and model file names.
+        report_path (Path): The path to save the classification report.
+        model_path (Path): The path to save the vectorizer and trained model.
+        train_test_size (float, optional): The proportion of data to hold out for testing. Defaults to 0.2.
+        chunk_size (int, optional): The number of rows per chunk. Defaults to 1000.
+        epochs (int, optional): The number of passes over the training data. Defaults to 1.
+    """
+    classifier = train_classifier_out_of_core(
+        input_path,
+        text_col,
+        label_col,
+        vectorizer,
+        classifier,
+        classes,
+        train_test_size,
+        chunk_size,
+        epochs,
+    )
+
+    save_classification_report_to_txt(
+        classification_report=evaluate_classifier_out_of_core(
+            input_path,
+            text_col,
+            label_col,
+            vectorizer,
+            classifier,
+            train_test_size,
+            chunk_size,
+        ),
+        output_dir=report_path,
+        file_name=f"{file_stem}_classification_report",
+    )
+
+    save_object_as_joblib(
+        object_to_save=vectorizer,
+        output_dir=model_path,
+        file_stem=file_stem,
+        object_name="vectorizer",
+    )
+    save_object_as_joblib(
+        object_to_save=classifier,
+        output_dir=model_path,
+        file_stem=file_stem,
+        object_name="classifier",
+    )
+
+
+def main():
+    # Initialize input/output paths
+    input_data_path = Path(__file__).parent / ".." / "in" / "fake_or_real_news.csv"
+    report_data_path = Path(__file__).parent / ".." / "out"
+    model_data_path = Path(__file__).parent / ".." / "out" / "models" / "streaming"
+
+    # Initialize the vectorizer. Hashing is stateless, so no vocabulary is built or held in memory.
+    # Negative feature values are disabled, as MultinomialNB only accepts non-negative input.
+    vectorizer = HashingVectorizer(
+        ngram_range=(1, 2),
+        lowercase=True,
+        n_features=2**18,
+        alternate_sign=False,
+    )
+
+    classifiers = {
+        "sgd": SGDClassifier(loss="log_loss", alpha=1e-5, random_state=24),
+        "multinomial_nb": MultinomialNB(alpha=0.01),
+    }
+
+    # Run the streaming pipeline for each incremental classifier
+    for classifier_name, classifier in classifiers.items():
+        streaming_news_classification_pipeline(
+            input_path=input_data_path,
+            text_col="text",
+            label_col="label",
+            vectorizer=vectorizer,
+            classifier=classifier,
+            classes=["FAKE", "REAL"],
+            file_stem=f"streaming_{classifier_name}",
+            report_path=report_data_path,
+            model_path=model_data_path,
+            chunk_size=1000,
+            epochs=3,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+import hashlib
+import json
+from numbers import Integral
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+from utilities import get_logger
+from vectorizer_utilities import (
+    check_vectorizer_can_be_fitted_from_counts,
+    fit_vectorizer_from_term_counts,
+    weight_term_counts,
+)
+
+logger = get_logger(__name__)
+
+# The vectorizer parameters that determine how text is split into tokens
+TOKENIZATION_PARAMS = ["lowercase", "strip_accents", "token_pattern"]
+
+
+def hash_documents(documents: Iterable[str]) -> str:
+    """
+    Returns a SHA-256 hash of the documents and their order, identifying the corpus a token cache was built from.
+    """
+    digest = hashlib.sha256()
+    for document in documents:
+        encoded = document.encode("utf-8")
+        # Length-prefixed, so the boundaries between documents are part of the hash
+        digest.update(len(encoded).to_bytes(8, "little"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class TokenCache:
+    """
+    Pre-tokenized documents, stored as integer token ids in a flat array with per-document offsets, plus the vocabulary of all tokens.
+
+    The tokens of document i are token_ids[offsets[i]:offsets[i + 1]], and the string of token id t is tokens[t]. Word n-gram counts for any n-gram range, stop word list and pruning settings can be built from the ids alone, so sweeping vectorizer parameters never processes the text again.
+
+    Parameters:
+        token_ids (np.ndarray): The int32 token ids of all documents, concatenated.
+        offsets (np.ndarray): The int64 start of each document in token_ids, followed by the total number of tokens.
+        tokens (np.ndarray): The string of every token id.
+        tokenization_params (Dict[str, Any]): The lowercase, strip_accents and token_pattern the documents were tokenized with.
+        documents_hash (str): The hash_documents hash of the documents the cache was built from.
+    """
+
+    def __init__(
+        self,
+        token_ids: np.ndarray,
+        offsets: np.ndarray,
+        tokens: np.ndarray,
+        tokenization_params: Dict[str, Any],
+        documents_hash: str,
+    ):
+        self.token_ids = token_ids
+        self.offsets = offsets
+        self.tokens = tokens
+        self.tokenization_params = tokenization_params
+        self.documents_hash = documents_hash
+
+    @property
+    def num_documents(self) -> int:
+        return len(self.offsets) - 1
+
+    @classmethod
+    def build(
+        cls,
+        documents: Iterable[str],
+        lowercase: bool = True,
+        strip_accents: Optional[str] = None,
+        token_pattern: str = r"(?u)\b\w\w+\b",
+    ) -> "TokenCache":
+        """
+        Tokenizes documents the way a CountVectorizer or TfidfVectorizer with the same parameters would, and stores the result.
+
+        Parameters:
+            documents (Iterable[str]): The documents to tokenize.
+            lowercase (bool, optional): Whether to lowercase the documents. Defaults to True.
+            strip_accents (Optional[str], optional): "ascii", "unicode" or None, as in CountVectorizer. Defaults to None.
+            token_pattern (str, optional): The regular expression matching tokens. Defaults to scikit-learn's default pattern.
+
+        Returns:
+            TokenCache: The token cache.
+        """
+        tokenization_params = {
+            "lowercase": lowercase,
+            "strip_accents": strip_accents,
+            "token_pattern": token_pattern,
+        }
+        # The preprocessor and tokenizer of a vectorizer, so tokens match its analyzer exactly
+        vectorizer = CountVectorizer(**tokenization_params)
+        preprocess, tokenize = vectorizer.build_preprocessor(), vectorizer.build_tokenizer()
+
+        documents = list(documents)
+        document_tokens = [tokenize(preprocess(document)) for document in documents]
+        lengths = np.fromiter(map(len, document_tokens), dtype=np.int64, count=len(document_tokens))
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+        all_tokens = np.fromiter(
+            (token for tokens in document_tokens for token in tokens),
+            dtype=object,
+            count=int(offsets[-1]),
+        )
+        token_ids, tokens = pd.factorize(all_tokens)
+        logger.info(
+            f"Tokenized {len(document_tokens)} documents into {len(token_ids)} tokens with {len(tokens)} distinct tokens."
+        )
+        return cls(
+            token_ids.astype(np.int32),
+            offsets,
+            np.asarray(tokens, dtype=str),
+            tokenization_params,
+            hash_documents(documents),
+        )
+
+    def save(self, output_dir: Path) -> None:
+        """
+        Saves the token ids, offsets and vocabulary as .npy files, and a JSON manifest with the tokenization parameters and the hash of the documents, in output_dir.
+        """
+        output_dir.mkdir(parents=True, exist_ok=True)
+        np.save(output_dir / "token_ids.npy", self.token_ids)
+        np.save(output_dir / "offsets.npy", self.offsets)
+        np.save(output_dir / "tokens.npy", self.tokens)
+        manifest = {
+            "tokenization_params": self.tokenization_params,
+            "num_documents": self.num_documents,
+            "documents_hash": self.documents_hash,
+        }
+        with open(output_dir / "manifest.json", "w") as f:
+            json.dump(manifest, f, indent=2)
+        logger.info(f"Token cache saved to {output_dir}")
+
+    @classmethod
+    def load(cls, cache_dir: Path) -> "TokenCache":
+        """
+        Loads a token cache saved with save. The token ids are memory-mapped, so processes sharing a cache do not each hold a copy.
+
+        Raises:
+            FileNotFoundError: If there is no token cache in cache_dir.
+        """
+        manifest_path = cache_dir / "manifest.json"
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"No token cache found in {cache_dir}")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        return cls(
+            np.load(cache_dir / "token_ids.npy", mmap_mode="r"),
+            np.load(cache_dir / "offsets.npy"),
+            np.load(cache_dir / "tokens.npy"),
+            manifest["tokenization_params"],
+            manifest["documents_hash"],
+        )
+
+    def check_vectorizer(self, vectorizer: Union[CountVectorizer, TfidfVectorizer]) -> None:
+        """
+        Checks that the vectorizer's analyzer can be reproduced from the cached tokens.
+
+        Raises:
+            ValueError: If the vectorizer does not analyze text content into word n-grams, or tokenizes differently from the cache.
+        """
+        if (
+            vectorizer.input != "content"
+            or vectorizer.analyzer != "word"
+            or vectorizer.preprocessor is not None
+            or vectorizer.tokenizer is not None
+        ):
+            raise ValueError(
+                "Only vectorizers analyzing text content into word n-grams with the default preprocessor and tokenizer can use the token cache."
+            )
+        vectorizer_params = {param: getattr(vectorizer, param) for param in TOKENIZATION_PARAMS}
+        if vectorizer_params != self.tokenization_params:
+            raise ValueError(
+                f"The vectorizer tokenizes with {vectorizer_params}, but the cache was built with {self.tokenization_params}."
+            )
+
+    def _gather_tokens(
+        self, rows: np.ndarray, stop_words: Optional[Iterable[str]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # The token ids of the rows, and the position in rows of the document each token belongs to
+        lengths = np.diff(self.offsets)[rows]
+        starts = np.repeat(self.offsets[rows] - np.cumsum(lengths) + lengths, lengths)
+        token_ids = np.asarray(self.token_ids[starts + np.arange(lengths.sum())])
+        documents = np.repeat(np.arange(len(rows)), lengths)
+
+        if stop_words:
+            # Removed before forming n-grams, like scikit-learn does
+            is_stop_word = np.isin(self.tokens, list(stop_words))
+            is_kept = ~is_stop_word[token_ids]
+            token_ids, documents = token_ids[is_kept], documents[is_kept]
+        return token_ids, documents
+
+    def count_ngrams(
+        self,
+        rows: Sequence[int],
+        ngram_range: Tuple[int, int] = (1, 1),
+        stop_words: Optional[Iterable[str]] = None,
+    ) -> List[Tuple[int, np.ndarray, np.ndarray]]:
+        """
+        Finds the word n-grams of the given documents, as integer keys rather than strings.
+
+        The key of an n-gram of token ids (t_1, ..., t_n) is t_1 * V**(n-1) + ... + t_n, V being the number of distinct tokens. N-grams never span two documents.
+
+        Parameters:
+            rows (Sequence[int]): The documents to count, as positions in the cache.
+            ngram_range (Tuple[int, int], optional): The lower and upper n of the n-grams. Defaults to (1, 1).
+            stop_words (Optional[Iterable[str]], optional): Tokens removed before forming n-grams. Defaults to None.
+
+        Returns:
+            List[Tuple[int, np.ndarray, np.ndarray]]: For each n, the n, the key of every n-gram occurrence, and the position in rows of the document it occurs in.
+
+        Raises:
+            ValueError: If the keys of the longest n-grams do not fit in 64 bits.
+        """
+        min_n, max_n = ngram_range
+        num_tokens = len(self.tokens)
+        if num_tokens > 1 and max_n * np.log2(num_tokens) >= 63:
+            raise ValueError(
+                f"{max_n}-gram keys over {num_tokens} distinct tokens do not fit in 64 bits."
+            )
+
+        token_ids, documents = self._gather_tokens(np.asarray(rows), stop_words)
+        ngrams = []
+        for n in range(min_n, max_n + 1):
+            num_starts = max(len(token_ids) - n + 1, 0)
+            starts = np.flatnonzero(documents[:num_starts] == documents[n - 1 : n - 1 + num_starts])
+            keys = token_ids[starts].astype(np.int64)
+            for offset in range(1, n):
+                keys = keys * num_tokens + token_ids[starts + offset]
+            ngrams.append((n, keys, documents[starts]))
+        return ngrams
+
+    def decode_ngrams(self, n: int, keys: np.ndarray) -> List[str]:
+        """
+        Returns the n-grams with the given keys as strings, tokens joined by spaces like scikit-learn's word n-grams.
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        token_columns = []
+        for _ in range(n):
+            token_columns.append(self.tokens[keys % len(self.tokens)])
+            keys = keys // len(self.tokens)
+        return [" ".join(ngram) for ngram in zip(*reversed(token_columns))]
+
+    def encode_ngrams(self, terms: List[str]) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Returns the keys of n-grams given as strings, grouped by n, together with their positions in terms. Terms containing tokens missing from the cache are left out.
+        """
+        term_tokens = [term.split(" ") for term in terms]
+        lengths = np.fromiter(map(len, term_tokens), dtype=np.int64, count=len(term_tokens))
+        starts = np.cumsum(lengths) - lengths
+        token_positions = pd.Index(self.tokens).get_indexer(
+            [token for tokens in term_tokens for token in tokens]
+        )
+        is_missing = np.zeros(len(terms), dtype=bool)
+        is_missing[np.repeat(np.arange(len(terms)), lengths)[token_positions < 0]] = True
+
+        encoded = {}
+        for n in np.unique(lengths):
+            positions = np.flatnonzero((lengths == n) & ~is_missing)
+            keys = np.zeros(len(positions), dtype=np.int64)
+            for offset in range(n):
+                keys = keys * len(self.tokens) + token_positions[starts[positions] + offset]
+            encoded[int(n)] = (keys, positions)
+        return encoded
+
+
+def _count_ngram_matrix(
+    ngrams: List[Tuple[int, np.ndarray, np.ndarray]],
+    vocabulary_keys: Dict[int, Tuple[np.ndarray, np.ndarray]],
+    num_documents: int,
+    num_features: int,
+) -> csr_matrix:
+    # Raw counts of the vocabulary n-grams, with the columns of the vocabulary
+    document_indices, feature_indices = [], []
+    for n, keys, documents in ngrams:
+        if n not in vocabulary_keys:
+            continue
+        term_keys, term_columns = vocabulary_keys[n]
+        order = np.argsort(term_keys)
+        term_keys, term_columns = term_keys[order], term_columns[order]
+        positions = np.minimum(np.searchsorted(term_keys, keys), len(term_keys) - 1)
+        is_known = term_keys[positions] == keys
+        document_indices.append(documents[is_known])
+        feature_indices.append(term_columns[positions[is_known]])
+
+    document_indices = np.concatenate(document_indices or [np.empty(0, dtype=np.int64)])
+    feature_indices = np.concatenate(feature_indices or [np.empty(0, dtype=np.int64)])
+    # Duplicate entries are summed into counts
+    counts = csr_matrix(
+        (np.ones(len(document_indices), dtype=np.int64), (document_indices, feature_indices)),
+        shape=(num_documents, num_features),
+    )
+    counts.sum_duplicates()
+    return counts
+
+
+def fit_vectorizer_from_token_cache(
+    vectorizer: Union[CountVectorizer, TfidfVectorizer],
+    cache: TokenCache,
+    rows: Sequence[int],
+) -> Union[CountVectorizer, TfidfVectorizer]:
+    """
+    Fits a CountVectorizer or TfidfVectorizer on cached documents, producing the same vocabulary and IDF weights as fitting it on their text.
+
+    N-grams are counted and pruned by min_df and max_df as integer keys, so only the n-grams that can enter the vocabulary are turned into strings, to break ties in max_features the way scikit-learn does.
+
+    Parameters:
+        vectorizer (Union[CountVectorizer, TfidfVectorizer]): The vectorizer to fit, in place. It must tokenize the same way as the cache.
+        cache (TokenCache): The token cache.
+        rows (Sequence[int]): The documents to fit on, as positions in the cache.
+
+    Returns:
+        Union[CountVectorizer, TfidfVectorizer]: The fitted vectorizer, which can also transform raw text.
+
+    Raises:
+        ValueError: If the vectorizer tokenizes differently from the cache, has a fixed vocabulary, or is a TfidfVectorizer with use_idf=False.
+    """
+    cache.check_vectorizer(vectorizer)
+    check_vectorizer_can_be_fitted_from_counts(vectorizer)
+
+    num_documents = len(rows)
+    max_df, min_df = vectorizer.max_df, vectorizer.min_df
+    max_doc_count = max_df if isinstance(max_df, Integral) else max_df * num_documents
+    min_doc_count = min_df if isinstance(min_df, Integral) else min_df * num_documents
+
+    candidate_terms, candidate_dfs, candidate_tfs = [], [], []
+    num_terms = 0
+    ngrams = cache.count_ngrams(rows, vectorizer.ngram_range, vectorizer.get_stop_words())
+    for n, keys, documents in ngrams:
+        unique_keys, term_indices, tfs = np.unique(keys, return_inverse=True, return_counts=True)
+        # Each distinct (document, n-gram) pair counts once towards the document frequency
+        dfs = np.bincount(
+            np.unique(documents * len(unique_keys) + term_indices) % len(unique_keys),
+            minlength=len(unique_keys),
+        )
+        num_terms += len(unique_keys)
+        is_candidate = (dfs >= min_doc_count) & (dfs <= max_doc_count)
+        candidate_terms += cache.decode_ngrams(n, unique_keys[is_candidate])
+        candidate_dfs.append(dfs[is_candidate])
+        candidate_tfs.append(tfs[is_candidate])
+
+    # Pruned terms could never be selected, so selecting among the candidates gives the same vocabulary
+    term_counts = pd.DataFrame(
+        {
+            "df": np.concatenate(candidate_dfs or [np.empty(0, dtype=np.int64)]),
+            "tf": np.concatenate(candidate_tfs or [np.empty(0, dtype=np.int64)]),
+        },
+        index=pd.Index(candidate_terms, name="term"),
+    )
+    term_counts = term_counts.loc[sorted(term_counts.index)]
+    logger.info(f"{len(term_counts)} of {num_terms} terms pass min_df and max_df.")
+    return fit_vectorizer_from_term_counts(vectorizer, term_counts, num_documents)
+
+
+def transform_from_token_cache(
+    vectorizer: Union[CountVectorizer, TfidfVectorizer],
+    cache: TokenCache,
+    rows: Sequence[int],
+) -> csr_matrix:
+    """
+    Transforms cached documents with a fitted vectorizer, giving the same matrix as its transform on their text.
+
+    Parameters:
+        vectorizer (Union[CountVectorizer, TfidfVectorizer]): The fitted vectorizer. It must tokenize the same way as the cache.
+        cache (TokenCache): The token cache.
+        rows (Sequence[int]): The documents to transform, as positions in the cache.
+
+    Returns:
+        csr_matrix: The document-term matrix, with one row per entry of rows.
+
+    Raises:
+        ValueError: If the vectorizer tokenizes differently from the cache.
+    """
+    cache.check_vectorizer(vectorizer)
+    vocabulary = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    counts = _count_ngram_matrix(
+        cache.count_ngrams(rows, vectorizer.ngram_range, vectorizer.get_stop_words()),
+        cache.encode_ngrams(vocabulary),
+        len(rows),
+        len(vocabulary),
+    )
+    return weight_term_counts(vectorizer, counts)
+
+
+def load_or_build_token_cache(
+    cache_dir: Path, documents: Iterable[str], **tokenization_params: Any
+) -> TokenCache:
+    """
+    Loads the token cache in cache_dir, or builds it from the documents and saves it there if there is none.
+
+    A cache built with different tokenization parameters, or from documents with a different hash, e.g. after rows of the CSV were edited or replaced, is rebuilt.
+    """
+    documents = list(documents)
+    expected_params = {
+        param: CountVectorizer().get_params()[param] for param in TOKENIZATION_PARAMS
+    }
+    expected_params.update(tokenization_params)
+    try:
+        cache = TokenCache.load(cache_dir)
+        if (
+            cache.tokenization_params == expected_params
+            and cache.documents_hash == hash_documents(documents)
+        ):
+            logger.info(f"Loaded the token cache from {cache_dir}")
+            return cache
+        logger.info("The token cache was built for other documents or tokenization parameters. Rebuilding it.")
+    except FileNotFoundError:
+        pass
+
+    cache = TokenCache.build(documents, **expected_params)
+    cache.save(cache_dir)
+    return cache
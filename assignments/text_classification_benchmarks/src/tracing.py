@@ -0,0 +1,187 @@
+from contextlib import contextmanager
+from functools import wraps
+import json
+import os
+from pathlib import Path
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from utilities import get_logger
+
+logger = get_logger(__name__)
+
+
+class Tracer:
+    """
+    Records the wall time, CPU time and peak traced memory of named spans, and exports them as Chrome trace events.
+
+    Spans can be nested. The peak memory of a span includes the peaks of the spans nested in it, and is measured with tracemalloc, so it covers the allocations of Python and NumPy in this process, but not those of worker processes. CPU time is that of the whole process, including threads started by the span, such as BLAS threads.
+
+    The tracer records nothing until it is enabled, so instrumented functions cost nothing when they are used without tracing.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.events: List[Dict[str, Any]] = []
+        self._origin = time.perf_counter()
+        self._open_spans: List[Dict[str, Any]] = []
+        self._started_tracemalloc = False
+
+    def enable(self, trace_memory: bool = False) -> None:
+        """
+        Starts recording spans, dropping the ones recorded before.
+
+        Parameters:
+            trace_memory (bool, optional): Whether to record the peak memory of each span. tracemalloc slows down allocation-heavy code, tokenizing text several times over, so wall and CPU times are only representative with it disabled. Defaults to False.
+        """
+        self.clear()
+        self.enabled = True
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def disable(self) -> None:
+        """
+        Stops recording spans. The recorded spans are kept until the tracer is enabled again.
+        """
+        self.enabled = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def clear(self) -> None:
+        self.events = []
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[None]:
+        """
+        Context manager recording the code it wraps as a span.
+
+        Parameters:
+            name (str): The name of the span, e.g. the pipeline stage.
+            **args (Any): Extra JSON-serializable values shown with the span in the trace viewer.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        record = {"max_peak": 0}
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # The peak so far belongs to the enclosing span, the new span starts its own
+            if self._open_spans:
+                self._open_spans[-1]["max_peak"] = max(self._open_spans[-1]["max_peak"], peak)
+            tracemalloc.reset_peak()
+            record["start_memory"] = current
+        self._open_spans.append(record)
+
+        start_time, start_cpu = time.perf_counter(), time.process_time()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            wall_seconds = time.perf_counter() - start_time
+            cpu_seconds = time.process_time() - start_cpu
+            self._open_spans.pop()
+
+            event_args = dict(args, cpu_ms=round(cpu_seconds * 1000, 3))
+            if self.trace_memory:
+                peak = max(record["max_peak"], tracemalloc.get_traced_memory()[1])
+                if self._open_spans:
+                    self._open_spans[-1]["max_peak"] = max(self._open_spans[-1]["max_peak"], peak)
+                event_args["peak_memory_mb"] = round(peak / 1024**2, 3)
+                event_args["peak_memory_increase_mb"] = round(
+                    (peak - record["start_memory"]) / 1024**2, 3
+                )
+            if error is not None:
+                event_args["error"] = error
+
+            self.events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": round((start_time - self._origin) * 1e6, 3),
+                    "dur": round(wall_seconds * 1e6, 3),
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": event_args,
+                }
+            )
+
+    def trace(self, name: Optional[str] = None) -> Callable[[Callable], Callable]:
+        """
+        Decorator recording every call of a function as a span.
+
+        Parameters:
+            name (Optional[str], optional): The name of the span. Defaults to None, using the name of the function.
+
+        Returns:
+            Callable: The decorator.
+        """
+
+        def decorator(function: Callable) -> Callable:
+            @wraps(function)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.span(name or function.__qualname__):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def summarize(self) -> pd.DataFrame:
+        """
+        Returns the number of calls, total wall and CPU time, and largest peak memory of each span name, slowest first.
+        """
+        if not self.events:
+            return pd.DataFrame()
+        spans = pd.DataFrame(
+            {
+                "span": event["name"],
+                "wall_ms": event["dur"] / 1000,
+                "cpu_ms": event["args"]["cpu_ms"],
+                "peak_memory_mb": event["args"].get("peak_memory_mb"),
+            }
+            for event in self.events
+        )
+        summary = spans.groupby("span").agg(
+            calls=("wall_ms", "size"),
+            wall_ms=("wall_ms", "sum"),
+            cpu_ms=("cpu_ms", "sum"),
+            peak_memory_mb=("peak_memory_mb", "max"),
+        )
+        return summary.sort_values("wall_ms", ascending=False).round(3).reset_index()
+
+    def export_chrome_trace(self, output_dir: Path, file_name: str) -> Path:
+        """
+        Saves the recorded spans in the Chrome trace event format, which can be opened in chrome://tracing or https://ui.perfetto.dev.
+
+        Parameters:
+            output_dir (Path): The directory where the trace will be saved.
+            file_name (str): The name of the trace file, including the .json extension.
+
+        Returns:
+            Path: The path to the trace file.
+        """
+        output_dir.mkdir(parents=True, exist_ok=True)
+        trace_path = output_dir / file_name
+        with open(trace_path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+        logger.info(f"Trace of {len(self.events)} spans saved as {file_name}")
+        return trace_path
+
+
+# The tracer shared by the pipeline modules, so their spans end up in one trace
+TRACER = Tracer()
+span = TRACER.span
+traced = TRACER.trace
@@ -1,39 +1,136 @@
+import json
 from pathlib import Path
+from typing import Any
 
+import numpy as np
+from scipy.sparse import csr_matrix, save_npz
 from sklearn.feature_extraction.text import TfidfVectorizer
 
 from data_processing_utilities import (
+    convert_to_lean_csr,
+    get_csr_memory_usage,
+    hash_vocabulary,
+    load_and_split_training_data,
     save_object_as_joblib,
     load_labeled_data_as_df,
 )
+from utilities import get_logger
+
+logger = get_logger(__name__)
+
+MANIFEST_FORMAT_VERSION = 1
+
+
+def export_vectorized_shards(
+    features: csr_matrix,
+    labels: np.ndarray,
+    vectorizer: Any,
+    output_dir: Path,
+    dataset_name: str,
+    train_test_size: float,
+    seed: int,
+    shard_size: int = 1000,
+) -> Path:
+    """
+    Exports a vectorized dataset as uncompressed .npz CSR shards, a label array, the fitted vectorizer and a JSON manifest describing them.
+
+    Parameters:
+        features (csr_matrix): The feature matrix, with one row per document in the original order.
+        labels (np.ndarray): The label of each row.
+        vectorizer (Any): The fitted vectorizer the features were produced with.
+        output_dir (Path): The directory where the dataset will be saved.
+        dataset_name (str): The prefix of the file names.
+        train_test_size (float): The test size of the split the vectorizer was fitted on.
+        seed (int): The random seed of the split the vectorizer was fitted on.
+        shard_size (int, optional): The number of rows per shard. Defaults to 1000.
+
+    Returns:
+        Path: The path to the manifest.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    labels = np.asarray(labels).astype(str)
+
+    shards = []
+    for shard_index, start_row in enumerate(range(0, features.shape[0], shard_size)):
+        end_row = min(start_row + shard_size, features.shape[0])
+        shard_file = f"{dataset_name}_shard_{shard_index:05d}.npz"
+        save_npz(output_dir / shard_file, features[start_row:end_row], compressed=False)
+        shards.append(
+            {
+                "file": shard_file,
+                "start_row": start_row,
+                "end_row": end_row,
+                "nnz": int(features[start_row:end_row].nnz),
+            }
+        )
+
+    labels_file = f"{dataset_name}_labels.npy"
+    np.save(output_dir / labels_file, labels, allow_pickle=False)
+    save_object_as_joblib(
+        object_to_save=vectorizer,
+        output_dir=output_dir,
+        file_stem=dataset_name,
+        object_name="vectorizer",
+    )
+
+    manifest = {
+        "format_version": MANIFEST_FORMAT_VERSION,
+        "num_rows": features.shape[0],
+        "num_features": features.shape[1],
+        "dtype": str(features.dtype),
+        "vocabulary_hash": hash_vocabulary(vectorizer.vocabulary_),
+        "vectorizer_file": f"{dataset_name}_vectorizer.joblib",
+        "vectorizer_fit_split": {"train_test_size": train_test_size, "seed": seed},
+        "labels_file": labels_file,
+        "shards": shards,
+    }
+    manifest_path = output_dir / f"{dataset_name}_manifest.json"
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=4)
+
+    logger.info(f"Exported {features.shape[0]} rows in {len(shards)} shards to {output_dir.name}")
+    return manifest_path
 
 
 def main():
     # Initialize input/output paths
     input_data_path = Path(__file__).parent / ".." / "in" / "fake_or_real_news.csv"
-    output_data_path = Path(__file__).parent / ".." / "in"
+    output_data_path = Path(__file__).parent / ".." / "in" / "fake_or_real_news_vectorized"
 
     # Load the labeled data
     news_dataset = load_labeled_data_as_df(input_data_path)
 
-    # Instantiate vectorizer
+    # Instantiate vectorizer, with the same settings as the classification scripts
     vectorizer = TfidfVectorizer(
         ngram_range=(1, 2),
         lowercase=True,
         max_df=0.95,
         min_df=0.05,
-        max_features=100,
+        max_features=2000,
+        dtype=np.float32,
     )
 
-    X = news_dataset["text"]
+    # Fit on the training split the classification scripts use, so no vocabulary or IDF weights are learned from their test rows
+    train_test_size, seed = 0.2, 24
+    X_train, _, _, _ = load_and_split_training_data(
+        news_dataset, "text", "label", train_test_size, seed
+    )
+    vectorizer.fit(X_train)
 
-    X_train_feats = vectorizer.fit_transform(X)
+    # Store the features as float32 values with int32 indices, half the size of float64 values
+    features = convert_to_lean_csr(vectorizer.transform(news_dataset["text"]))
+    logger.info(f"Vectorized data uses {get_csr_memory_usage(features) / 1024**2:.2f} MB.")
 
-    save_object_as_joblib(
-        object_to_save=X_train_feats,
+    export_vectorized_shards(
+        features=features,
+        labels=news_dataset["label"].to_numpy(),
+        vectorizer=vectorizer,
         output_dir=output_data_path,
-        file_stem="fake_or_real_news",
-        object_name="vectorized_data",
+        dataset_name="fake_or_real_news",
+        train_test_size=train_test_size,
+        seed=seed,
     )
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,358 @@
+from collections import Counter
+from numbers import Integral
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+from joblib import Parallel, delayed, effective_n_jobs
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, vstack
+from sklearn.base import clone
+from sklearn.feature_extraction.text import (
+    CountVectorizer,
+    TfidfTransformer,
+    TfidfVectorizer,
+)
+
+from count_min_sketch import CountMinSketch, hash_terms
+from utilities import get_logger
+
+logger = get_logger(__name__)
+
+
+def split_into_chunks(documents: Iterable[str], chunk_size: int) -> List[List[str]]:
+    """
+    Splits documents into consecutive chunks of at most chunk_size documents, keeping their order.
+    """
+    documents = list(documents)
+    return [
+        documents[start : start + chunk_size]
+        for start in range(0, len(documents), chunk_size)
+    ]
+
+
+def _get_term_dtype(vectorizer: CountVectorizer) -> np.dtype:
+    # The dtype scikit-learn sums term counts in, so ties in term frequency are broken the same way
+    if np.issubdtype(vectorizer.dtype, np.integer):
+        return np.dtype(np.int64)
+    return np.dtype(vectorizer.dtype)
+
+
+def _count_chunk_terms(vectorizer: CountVectorizer, documents: List[str]) -> pd.DataFrame:
+    """
+    Counts the document frequency and total term frequency of every term in a chunk of documents, in a worker process.
+    """
+    counts = CountVectorizer(analyzer=vectorizer.build_analyzer(), dtype=np.int64)
+    X = counts.fit_transform(documents).tocsc()
+    terms = np.empty(len(counts.vocabulary_), dtype=object)
+    terms[list(counts.vocabulary_.values())] = list(counts.vocabulary_.keys())
+
+    return pd.DataFrame(
+        {
+            "term": terms,
+            "df": np.diff(X.indptr),
+            "tf": np.asarray(X.sum(axis=0)).ravel(),
+        }
+    )
+
+
+def count_terms_in_parallel(
+    vectorizer: CountVectorizer,
+    documents: Iterable[str],
+    chunk_size: int = 1000,
+    n_jobs: Optional[int] = -1,
+) -> pd.DataFrame:
+    """
+    Counts the document frequency and total term frequency of every term the vectorizer's analyzer produces, splitting the documents into chunks counted in parallel.
+
+    Parameters:
+        vectorizer (CountVectorizer): The vectorizer whose analyzer (tokenization and n-gram settings) is used. It is not modified.
+        documents (Iterable[str]): The documents to count.
+        chunk_size (int, optional): The number of documents counted per task. Defaults to 1000.
+        n_jobs (Optional[int], optional): The number of worker processes. -1 uses all available cores. Defaults to -1.
+
+    Returns:
+        pd.DataFrame: The merged counts, indexed by term in sorted order, with "df" and "tf" columns.
+    """
+    chunks = split_into_chunks(documents, chunk_size)
+    logger.info(
+        f"Counting terms in {len(chunks)} chunks on {effective_n_jobs(n_jobs)} processes..."
+    )
+    chunk_counts = Parallel(n_jobs=n_jobs)(
+        delayed(_count_chunk_terms)(clone(vectorizer), chunk) for chunk in chunks
+    )
+    term_counts = pd.concat(chunk_counts, ignore_index=True).groupby("term", sort=False).sum()
+
+    # Python string order, which is the order scikit-learn assigns feature indices in
+    return term_counts.loc[sorted(term_counts.index)]
+
+
+def select_vocabulary_from_counts(
+    vectorizer: CountVectorizer, term_counts: pd.DataFrame, num_documents: int
+) -> List[str]:
+    """
+    Applies the vectorizer's min_df, max_df and max_features to merged term counts, the same way scikit-learn does when fitting.
+
+    Parameters:
+        vectorizer (CountVectorizer): The vectorizer whose pruning parameters are applied.
+        term_counts (pd.DataFrame): The counts returned by count_terms_in_parallel, sorted by term.
+        num_documents (int): The number of documents the terms were counted in.
+
+    Returns:
+        List[str]: The selected terms, in sorted order.
+
+    Raises:
+        ValueError: If max_df corresponds to fewer documents than min_df, or no terms remain after pruning.
+    """
+    max_df, min_df = vectorizer.max_df, vectorizer.min_df
+    max_doc_count = max_df if isinstance(max_df, Integral) else max_df * num_documents
+    min_doc_count = min_df if isinstance(min_df, Integral) else min_df * num_documents
+    if max_doc_count < min_doc_count:
+        raise ValueError("max_df corresponds to < documents than min_df")
+
+    dfs = term_counts["df"].to_numpy()
+    # With binary features, every occurrence counts once per document
+    tfs = (dfs if vectorizer.binary else term_counts["tf"].to_numpy()).astype(
+        _get_term_dtype(vectorizer)
+    )
+
+    mask = (dfs <= max_doc_count) & (dfs >= min_doc_count)
+    limit = vectorizer.max_features
+    if limit is not None and mask.sum() > limit:
+        mask_indices = (-tfs[mask]).argsort()[:limit]
+        limited_mask = np.zeros(len(dfs), dtype=bool)
+        limited_mask[np.where(mask)[0][mask_indices]] = True
+        mask = limited_mask
+
+    if not mask.any():
+        raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+    return term_counts.index[mask].tolist()
+
+
+def transform_in_parallel(
+    vectorizer: CountVectorizer,
+    documents: Iterable[str],
+    chunk_size: int = 1000,
+    n_jobs: Optional[int] = -1,
+) -> csr_matrix:
+    """
+    Transforms documents with a fitted vectorizer, splitting them into chunks transformed in parallel. Rows are returned in the order of the documents.
+
+    Parameters:
+        vectorizer (CountVectorizer): The fitted CountVectorizer or TfidfVectorizer.
+        documents (Iterable[str]): The documents to transform.
+        chunk_size (int, optional): The number of documents transformed per task. Defaults to 1000.
+        n_jobs (Optional[int], optional): The number of worker processes. -1 uses all available cores. Defaults to -1.
+
+    Returns:
+        csr_matrix: The document-term matrix.
+    """
+    chunk_matrices = Parallel(n_jobs=n_jobs)(
+        delayed(vectorizer.transform)(chunk)
+        for chunk in split_into_chunks(documents, chunk_size)
+    )
+    return vstack(chunk_matrices, format="csr").astype(vectorizer.dtype, copy=False)
+
+
+def check_vectorizer_can_be_fitted_from_counts(
+    vectorizer: Union[CountVectorizer, TfidfVectorizer]
+) -> None:
+    """
+    Raises a ValueError if the vectorizer cannot be fitted from term counts, i.e. has a fixed vocabulary or is a TfidfVectorizer with use_idf=False.
+    """
+    if vectorizer.vocabulary is not None:
+        raise ValueError("Fitting from term counts requires a vectorizer without a fixed vocabulary.")
+    if isinstance(vectorizer, TfidfVectorizer) and not vectorizer.use_idf:
+        raise ValueError("Fitting a TfidfVectorizer from term counts requires use_idf=True.")
+
+
+def calculate_idf(
+    vectorizer: TfidfVectorizer, document_frequencies: np.ndarray, num_documents: int
+) -> np.ndarray:
+    """
+    Computes the IDF weights from document frequencies the way TfidfTransformer.fit does, with the vectorizer's smooth_idf and in the same dtype.
+    """
+    idf_dtype = vectorizer.dtype if vectorizer.dtype in (np.float32, np.float64) else np.float64
+    document_frequencies = np.asarray(document_frequencies).astype(idf_dtype)
+    smoothing = int(vectorizer.smooth_idf)
+    return np.log((num_documents + smoothing) / (document_frequencies + smoothing)) + 1
+
+
+def fit_vectorizer_from_term_counts(
+    vectorizer: Union[CountVectorizer, TfidfVectorizer],
+    term_counts: pd.DataFrame,
+    num_documents: int,
+) -> Union[CountVectorizer, TfidfVectorizer]:
+    """
+    Selects the vocabulary from exact term counts and sets the fitted attributes of the vectorizer, the same way fitting it on the documents would.
+
+    Parameters:
+        vectorizer (Union[CountVectorizer, TfidfVectorizer]): The vectorizer to fit, in place.
+        term_counts (pd.DataFrame): The document frequency and total term frequency of every term, indexed by term in sorted order, with "df" and "tf" columns.
+        num_documents (int): The number of documents the terms were counted in.
+
+    Returns:
+        Union[CountVectorizer, TfidfVectorizer]: The fitted vectorizer.
+    """
+    vocabulary = select_vocabulary_from_counts(vectorizer, term_counts, num_documents)
+    logger.info(f"Selected {len(vocabulary)} of {len(term_counts)} terms.")
+
+    vectorizer.vocabulary_ = {term: index for index, term in enumerate(vocabulary)}
+    vectorizer.fixed_vocabulary_ = False
+
+    if isinstance(vectorizer, TfidfVectorizer):
+        vectorizer.idf_ = calculate_idf(
+            vectorizer, term_counts.loc[vocabulary, "df"].to_numpy(), num_documents
+        )
+
+    return vectorizer
+
+
+def weight_term_counts(
+    vectorizer: Union[CountVectorizer, TfidfVectorizer], counts: csr_matrix
+) -> csr_matrix:
+    """
+    Turns raw term counts over the fitted vocabulary into the features the vectorizer's transform would return. A CountVectorizer only applies binary and dtype, a TfidfVectorizer also its TF-IDF weighting and normalization.
+    """
+    if vectorizer.binary:
+        counts = counts.copy()
+        counts.data.fill(1)
+    counts = counts.astype(vectorizer.dtype)
+    if not isinstance(vectorizer, TfidfVectorizer):
+        return counts
+
+    transformer = TfidfTransformer(
+        norm=vectorizer.norm,
+        use_idf=vectorizer.use_idf,
+        smooth_idf=vectorizer.smooth_idf,
+        sublinear_tf=vectorizer.sublinear_tf,
+    )
+    if vectorizer.use_idf:
+        transformer.idf_ = vectorizer.idf_
+    else:
+        # There is nothing to learn without IDF, but transform requires a fitted transformer, and fit at least one row
+        transformer.fit(csr_matrix((1, counts.shape[1])))
+    return transformer.transform(counts)
+
+
+def fit_vectorizer_in_parallel(
+    vectorizer: Union[CountVectorizer, TfidfVectorizer],
+    documents: Iterable[str],
+    chunk_size: int = 1000,
+    n_jobs: Optional[int] = -1,
+) -> Union[CountVectorizer, TfidfVectorizer]:
+    """
+    Fits a CountVectorizer or TfidfVectorizer from term counts computed in parallel, producing the same vocabulary and IDF weights as fitting it serially.
+
+    Parameters:
+        vectorizer (Union[CountVectorizer, TfidfVectorizer]): The vectorizer to fit, in place.
+        documents (Iterable[str]): The documents to fit on.
+        chunk_size (int, optional): The number of documents counted per task. Defaults to 1000.
+        n_jobs (Optional[int], optional): The number of worker processes. -1 uses all available cores. Defaults to -1.
+
+    Returns:
+        Union[CountVectorizer, TfidfVectorizer]: The fitted vectorizer.
+
+    Raises:
+        ValueError: If the vectorizer has a fixed vocabulary, or is a TfidfVectorizer with use_idf=False.
+    """
+    check_vectorizer_can_be_fitted_from_counts(vectorizer)
+
+    documents = list(documents)
+    term_counts = count_terms_in_parallel(vectorizer, documents, chunk_size, n_jobs)
+    return fit_vectorizer_from_term_counts(vectorizer, term_counts, len(documents))
+
+
+def fit_vectorizer_with_sketch(
+    vectorizer: Union[CountVectorizer, TfidfVectorizer],
+    documents: Sequence[str],
+    sketch_width: int = 2**20,
+    sketch_depth: int = 4,
+    batch_size: int = 100,
+    seed: int = 24,
+) -> Union[CountVectorizer, TfidfVectorizer]:
+    """
+    Fits a CountVectorizer or TfidfVectorizer in two passes over the documents, without ever holding the counts of every term in memory.
+
+    The first pass estimates the document frequency of every term in a fixed-size count-min sketch. The estimates are never below the true document frequencies, so every term passing min_df is a candidate. The second pass counts the candidates exactly, and the vocabulary and IDF weights are selected from these counts the same way as a serial fit. Memory is bounded by the sketch and the candidates, which number at most the summed document frequencies divided by the minimum document count, plus the few false positives of the sketch.
+
+    Parameters:
+        vectorizer (Union[CountVectorizer, TfidfVectorizer]): The vectorizer to fit, in place.
+        documents (Sequence[str]): The documents to fit on. They are iterated over twice.
+        sketch_width (int, optional): The number of cells per row of the sketch. Defaults to 2**20.
+        sketch_depth (int, optional): The number of rows of the sketch. Defaults to 4.
+        batch_size (int, optional): The number of documents whose terms are added to the sketch at a time. Defaults to 100.
+        seed (int, optional): The random seed of the sketch hash functions. Defaults to 24.
+
+    Returns:
+        Union[CountVectorizer, TfidfVectorizer]: The fitted vectorizer.
+
+    Raises:
+        ValueError: If the vectorizer has a fixed vocabulary, or is a TfidfVectorizer with use_idf=False.
+    """
+    check_vectorizer_can_be_fitted_from_counts(vectorizer)
+
+    analyzer = vectorizer.build_analyzer()
+    num_documents = len(documents)
+    min_df = vectorizer.min_df
+    min_doc_count = min_df if isinstance(min_df, Integral) else min_df * num_documents
+    if min_doc_count <= 1:
+        logger.warning("min_df keeps every term, so the sketch cannot prune any candidates.")
+
+    sketch = CountMinSketch(sketch_width, sketch_depth, seed)
+    logger.info(
+        f"Estimating document frequencies in a {sketch.nbytes / 1024**2:.1f} MB count-min sketch..."
+    )
+    for batch in split_into_chunks(documents, batch_size):
+        # Each document adds each of its distinct terms once
+        sketch.add_hashes(
+            np.concatenate(
+                [hash_terms(set(analyzer(document))) for document in batch]
+                or [np.empty(0, dtype=np.uint64)]
+            )
+        )
+
+    logger.info("Counting candidate terms exactly...")
+    document_frequencies, term_frequencies = Counter(), Counter()
+    for document in documents:
+        term_counts = Counter(analyzer(document))
+        terms = list(term_counts)
+        is_candidate = sketch.estimate_hashes(hash_terms(terms)) >= min_doc_count
+        for term, candidate in zip(terms, is_candidate):
+            if candidate:
+                document_frequencies[term] += 1
+                term_frequencies[term] += term_counts[term]
+
+    candidates = sorted(document_frequencies)
+    term_counts = pd.DataFrame(
+        {
+            "df": [document_frequencies[term] for term in candidates],
+            "tf": [term_frequencies[term] for term in candidates],
+        },
+        index=pd.Index(candidates, name="term"),
+    )
+    return fit_vectorizer_from_term_counts(vectorizer, term_counts, num_documents)
+
+
+def fit_transform_in_parallel(
+    vectorizer: Union[CountVectorizer, TfidfVectorizer],
+    documents: Iterable[str],
+    chunk_size: int = 1000,
+    n_jobs: Optional[int] = -1,
+) -> Tuple[Union[CountVectorizer, TfidfVectorizer], csr_matrix]:
+    """
+    Fits a vectorizer and transforms the documents it was fitted on, both in parallel.
+
+    The matrix is identical to transforming the documents with the serially fitted vectorizer. It can differ from the serial fit_transform in the last bit of some values, since that path normalizes rows before sorting their column indices.
+
+    Parameters:
+        vectorizer (Union[CountVectorizer, TfidfVectorizer]): The vectorizer to fit, in place.
+        documents (Iterable[str]): The documents to fit on and transform.
+        chunk_size (int, optional): The number of documents per task. Defaults to 1000.
+        n_jobs (Optional[int], optional): The number of worker processes. -1 uses all available cores. Defaults to -1.
+
+    Returns:
+        Tuple[Union[CountVectorizer, TfidfVectorizer], csr_matrix]: The fitted vectorizer and the document-term matrix.
+    """
+    documents = list(documents)
+    fit_vectorizer_in_parallel(vectorizer, documents, chunk_size, n_jobs)
+    return vectorizer, transform_in_parallel(vectorizer, documents, chunk_size, n_jobs)
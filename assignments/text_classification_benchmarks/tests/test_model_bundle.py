@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import (
+    CountVectorizer,
+    HashingVectorizer,
+    TfidfVectorizer,
+)
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.neural_network import MLPClassifier
+
+from model_bundle import load_model, load_model_bundle, save_model_bundle, verify_model_bundle
+
+VECTORIZERS = {
+    "count": lambda: CountVectorizer(),
+    "count_binary_bigrams": lambda: CountVectorizer(binary=True, ngram_range=(1, 2)),
+    "hashing": lambda: HashingVectorizer(n_features=2**10, alternate_sign=False),
+    "tfidf": lambda: TfidfVectorizer(),
+    "tfidf_no_idf": lambda: TfidfVectorizer(use_idf=False),
+    "tfidf_sublinear_unnormalized": lambda: TfidfVectorizer(sublinear_tf=True, norm=None),
+    "tfidf_float32": lambda: TfidfVectorizer(dtype=np.float32),
+}
+CLASSIFIERS = {
+    "logistic_regression": lambda: LogisticRegression(max_iter=1000),
+    "mlp": lambda: MLPClassifier(hidden_layer_sizes=(8,), max_iter=300, random_state=0),
+    "sgd_log_loss": lambda: SGDClassifier(loss="log_loss", random_state=0),
+    "sgd_hinge": lambda: SGDClassifier(random_state=0),
+}
+
+
+def make_corpus(num_classes, num_documents=90, seed=0):
+    # Documents of each class draw most of their words from a class-specific vocabulary
+    random_state = np.random.RandomState(seed)
+    shared_words = [f"shared{i}" for i in range(30)]
+    texts, labels = [], []
+    for document in range(num_documents):
+        label = document % num_classes
+        class_words = [f"class{label}word{i}" for i in range(10)]
+        words = random_state.choice(class_words, 8).tolist() + random_state.choice(shared_words, 8).tolist()
+        texts.append(" ".join(random_state.permutation(words)))
+        labels.append(["FAKE", "REAL", "SATIRE"][label])
+    return texts, np.array(labels)
+
+
+@pytest.mark.filterwarnings("ignore::sklearn.exceptions.ConvergenceWarning")
+@pytest.mark.parametrize("num_classes", [2, 3])
+@pytest.mark.parametrize("classifier_name", CLASSIFIERS)
+@pytest.mark.parametrize("vectorizer_name", VECTORIZERS)
+def test_bundle_round_trip(tmp_path, vectorizer_name, classifier_name, num_classes):
+    texts, labels = make_corpus(num_classes)
+    vectorizer = VECTORIZERS[vectorizer_name]()
+    classifier = CLASSIFIERS[classifier_name]().fit(vectorizer.fit_transform(texts), labels)
+
+    bundle_path = save_model_bundle(vectorizer, classifier, tmp_path, "model")
+    held_out_texts, _ = make_corpus(num_classes, num_documents=30, seed=1)
+    results = verify_model_bundle(vectorizer, classifier, bundle_path, held_out_texts)
+
+    assert results["features_match"]
+    assert results["predictions_match"]
+    assert results.get("probabilities_match", True)
+    assert results["vocabulary_size"] == len(getattr(vectorizer, "vocabulary_", {}))
+
+    bundled_vectorizer, bundled_classifier = load_model_bundle(bundle_path)
+    np.testing.assert_array_equal(bundled_classifier.classes_, classifier.classes_)
+    np.testing.assert_allclose(
+        bundled_classifier.decision_function(bundled_vectorizer.transform(held_out_texts))
+        if hasattr(classifier, "decision_function")
+        else bundled_classifier.predict_proba(bundled_vectorizer.transform(held_out_texts)),
+        classifier.decision_function(vectorizer.transform(held_out_texts))
+        if hasattr(classifier, "decision_function")
+        else classifier.predict_proba(vectorizer.transform(held_out_texts)),
+    )
+
+
+def test_bundle_loads_into_private_memory(tmp_path):
+    texts, labels = make_corpus(2)
+    vectorizer = TfidfVectorizer()
+    classifier = LogisticRegression().fit(vectorizer.fit_transform(texts), labels)
+    bundle_path = save_model_bundle(vectorizer, classifier, tmp_path, "model")
+
+    bundled_vectorizer, bundled_classifier = load_model_bundle(bundle_path, mmap_mode=None)
+
+    assert not isinstance(bundled_classifier.coef_, np.memmap)
+    np.testing.assert_array_equal(
+        bundled_classifier.predict(bundled_vectorizer.transform(texts)),
+        classifier.predict(vectorizer.transform(texts)),
+    )
+
+
+def test_load_model_prefers_bundle(tmp_path):
+    texts, labels = make_corpus(2)
+    vectorizer = CountVectorizer()
+    classifier = LogisticRegression().fit(vectorizer.fit_transform(texts), labels)
+    save_model_bundle(vectorizer, classifier, tmp_path, "model")
+
+    loaded_vectorizer, loaded_classifier = load_model(tmp_path, "model")
+
+    assert isinstance(loaded_classifier.coef_, np.memmap)
+    assert loaded_vectorizer.vocabulary_ == vectorizer.vocabulary_
+
+
+def test_unsupported_classifier_is_refused(tmp_path):
+    texts, labels = make_corpus(2)
+    vectorizer = CountVectorizer()
+    classifier = MultinomialNB().fit(vectorizer.fit_transform(texts), labels)
+
+    with pytest.raises(ValueError, match="Unsupported classifier"):
+        save_model_bundle(vectorizer, classifier, tmp_path, "model")
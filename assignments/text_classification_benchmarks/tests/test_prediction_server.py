@@ -0,0 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from prediction_server import (
+    LatencyTracker,
+    MicroBatcher,
+    create_prediction_server,
+    shutdown_prediction_server,
+)
+
+TEXTS = ["fake news about aliens", "real report on the economy"] * 10
+LABELS = ["FAKE", "REAL"] * 10
+
+
+@pytest.fixture
+def fitted_model():
+    vectorizer = TfidfVectorizer()
+    classifier = LogisticRegression().fit(vectorizer.fit_transform(TEXTS), LABELS)
+    return vectorizer, classifier
+
+
+@pytest.fixture
+def server_url(fitted_model):
+    server = create_prediction_server(*fitted_model, port=0, batch_window_ms=20)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    yield f"http://{host}:{port}"
+    shutdown_prediction_server(server)
+    thread.join()
+
+
+def request_json(url, body=None):
+    # Returns the status and JSON body of a GET, or of a POST when a body is given
+    data = None if body is None else (body if isinstance(body, bytes) else json.dumps(body).encode("utf-8"))
+    try:
+        with urlopen(Request(url, data=data, headers={"Content-Type": "application/json"})) as response:
+            return response.status, json.loads(response.read())
+    except HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_health(server_url):
+    assert request_json(f"{server_url}/health") == (200, {"status": "ok"})
+
+
+def test_concurrent_predictions_and_metrics(server_url):
+    bodies = [{"texts": ["aliens fake", "economy report"]}, {"text": "aliens news"}] * 16
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        responses = list(executor.map(lambda body: request_json(f"{server_url}/predict", body), bodies))
+
+    for body, (status, response) in zip(bodies, responses):
+        assert status == 200
+        labels = [prediction["label"] for prediction in response["predictions"]]
+        assert labels == (["FAKE", "REAL"] if "texts" in body else ["FAKE"])
+        assert set(response["predictions"][0]["probabilities"]) == {"FAKE", "REAL"}
+
+    status, metrics = request_json(f"{server_url}/metrics")
+    assert status == 200
+    assert metrics["num_requests"] == len(bodies)
+    assert metrics["p50_latency_ms"] <= metrics["p99_latency_ms"]
+    # The concurrent requests were predicted in fewer batches than requests
+    assert metrics["mean_batch_size"] > 1
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"texts": []},
+        {"texts": "ab"},
+        {"texts": ["ok", 1]},
+        {"text": 1},
+        {"documents": ["ok"]},
+        ["ok"],
+        b"not json",
+    ],
+)
+def test_invalid_bodies_are_rejected(server_url, body):
+    status, response = request_json(f"{server_url}/predict", body)
+
+    assert status == 400
+    assert response["error"].startswith("Invalid request body")
+
+
+def test_unknown_path(server_url):
+    assert request_json(f"{server_url}/score", {"texts": ["ok"]})[0] == 404
+    assert request_json(f"{server_url}/status")[0] == 404
+
+
+class FailingVectorizer:
+    # Fails on any batch containing the text "poison"
+    def __init__(self, vectorizer):
+        self.vectorizer = vectorizer
+
+    def transform(self, texts):
+        if "poison" in texts:
+            raise ValueError("Cannot vectorize poison")
+        return self.vectorizer.transform(texts)
+
+
+def test_failing_request_does_not_fail_its_batch(fitted_model):
+    vectorizer, classifier = fitted_model
+    batcher = MicroBatcher(
+        FailingVectorizer(vectorizer), classifier, LatencyTracker(), batch_window_ms=200
+    )
+    good_request = batcher.submit(["aliens fake"])
+    bad_request = batcher.submit(["poison"])
+
+    assert good_request.result(timeout=5)[0]["label"] == "FAKE"
+    with pytest.raises(ValueError, match="poison"):
+        bad_request.result(timeout=5)
+    batcher.stop()
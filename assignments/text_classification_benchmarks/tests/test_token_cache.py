@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+from token_cache import (
+    fit_vectorizer_from_token_cache,
+    load_or_build_token_cache,
+    transform_from_token_cache,
+)
+
+DOCUMENTS = [
+    "The cat sat on the mat.",
+    "The dog sat on the log!",
+    "Cats and dogs, and cats again.",
+    "A log on a mat, the end.",
+]
+
+
+def test_cache_is_reused_for_the_same_documents(tmp_path):
+    cache = load_or_build_token_cache(tmp_path, DOCUMENTS)
+    reloaded = load_or_build_token_cache(tmp_path, DOCUMENTS)
+
+    assert reloaded.documents_hash == cache.documents_hash
+    # A reused cache memory-maps its token ids
+    assert isinstance(reloaded.token_ids, np.memmap)
+
+
+def test_cache_is_rebuilt_when_documents_change_in_place(tmp_path):
+    load_or_build_token_cache(tmp_path, DOCUMENTS)
+    edited_documents = DOCUMENTS[:-1] + ["An edited row with new words."]
+
+    cache = load_or_build_token_cache(tmp_path, edited_documents)
+
+    vectorizer = CountVectorizer()
+    rows = np.arange(len(edited_documents))
+    fit_vectorizer_from_token_cache(vectorizer, cache, rows)
+    assert vectorizer.vocabulary_ == CountVectorizer().fit(edited_documents).vocabulary_
+
+
+@pytest.mark.parametrize(
+    "vectorizer",
+    [CountVectorizer(ngram_range=(1, 2)), TfidfVectorizer(), TfidfVectorizer(use_idf=False)],
+    ids=repr,
+)
+def test_transform_from_token_cache_matches_transform(tmp_path, vectorizer):
+    cache = load_or_build_token_cache(tmp_path, DOCUMENTS)
+    # use_idf=False cannot be fitted from counts, so every vectorizer is fitted on the text
+    vectorizer.fit(DOCUMENTS)
+
+    features = transform_from_token_cache(vectorizer, cache, np.arange(len(DOCUMENTS)))
+
+    np.testing.assert_allclose(features.toarray(), vectorizer.transform(DOCUMENTS).toarray())
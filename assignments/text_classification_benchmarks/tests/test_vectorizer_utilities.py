@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+from vectorizer_utilities import weight_term_counts
+
+TEXTS = [
+    "the cat sat on the mat",
+    "the dog sat on the log",
+    "cats and dogs and cats",
+    "a log on a mat",
+]
+
+
+@pytest.mark.parametrize(
+    "vectorizer",
+    [
+        CountVectorizer(),
+        CountVectorizer(binary=True, dtype=np.float32),
+        TfidfVectorizer(),
+        TfidfVectorizer(use_idf=False),
+        TfidfVectorizer(use_idf=False, sublinear_tf=True, norm="l1"),
+        TfidfVectorizer(smooth_idf=False, norm=None),
+        TfidfVectorizer(binary=True, dtype=np.float32),
+    ],
+    ids=repr,
+)
+def test_weight_term_counts_matches_transform(vectorizer):
+    vectorizer.fit(TEXTS)
+    counts = CountVectorizer(vocabulary=vectorizer.vocabulary_).transform(TEXTS)
+
+    features = weight_term_counts(vectorizer, counts)
+
+    expected = vectorizer.transform(TEXTS)
+    assert features.dtype == expected.dtype
+    np.testing.assert_allclose(features.toarray(), expected.toarray(), rtol=1e-6)
@@ -1,13 +1,19 @@
 #!/usr/bin/env python
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+
+import joblib
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from sklearn.base import clone, is_classifier
 from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import cross_validate, ShuffleSplit, learning_curve
+from sklearn.model_selection import check_cv, cross_validate, ShuffleSplit, learning_curve
 
-# Function for balancing datasets using pandas
-def balance(dataframe, n=500):
+# Function for balancing datasets using numpy
+def balance(dataframe, n=500, random_state=None, label_col='label'):
     """
     Create a balanced sample from imbalanced datasets.
     
@@ -15,18 +21,234 @@ def balance(dataframe, n=500):
         Pandas dataframe with a column called 'text' and one called 'label'
     n:         
         Number of samples from each label, defaults to 500
+    random_state:
+        Seed for the sample, defaults to None (a different sample every call)
+    label_col:
+        Name of the label column, defaults to 'label'
+    """
+    rng = np.random.default_rng(random_state)
+    # Label-encode with a hash table, then group row positions by label with an integer sort
+    codes, labels = pd.factorize(dataframe[label_col])
+    counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+    if (counts < n).any():
+        label = labels[np.argmax(counts < n)]
+        raise ValueError(f"Label {label} has {counts[np.argmax(counts < n)]} rows, fewer than n={n}")
+    grouped = np.argsort(codes, kind='stable')[len(codes) - counts.sum():]
+    group_starts = np.cumsum(counts) - counts
+    # Draw n positions without replacement from each label, labels in sorted order
+    rows = [grouped[group_starts[code] + rng.choice(counts[code], size=n, replace=False)]
+            for code in np.argsort(labels)]
+    out = dataframe.iloc[np.concatenate(rows)].reset_index(drop=True)
+    
+    return out
+
+# Function for balancing datasets streamed in chunks
+def balance_stream(chunks, n=500, random_state=None, label_col='label'):
+    """
+    Create a balanced sample from an iterator of dataframe chunks, e.g. pd.read_csv(..., chunksize=...),
+    keeping a reservoir sample of each label so only n rows per label are held in memory.
+    
+    chunks:
+        Iterable of pandas dataframes with a column called 'label'
+    n:
+        Number of samples from each label, defaults to 500
+    random_state:
+        Seed for the sample, defaults to None. The sample only depends on the seed and the order of the rows,
+        not on the chunk size
+    label_col:
+        Name of the label column, defaults to 'label'
+    """
+    seed_sequence = np.random.SeedSequence(random_state)
+    # Per label: the reservoir, the number of rows seen and a random generator
+    reservoirs, seen, rngs = {}, {}, {}
+    for chunk in chunks:
+        for label, rows in chunk.groupby(label_col, sort=False):
+            if label not in reservoirs:
+                reservoirs[label], seen[label] = rows.iloc[:0], 0
+                rngs[label] = np.random.default_rng(seed_sequence.spawn(1)[0])
+            reservoir = reservoirs[label]
+            # Position of each row among all rows of its label seen so far
+            positions = seen[label] + np.arange(len(rows))
+            seen[label] += len(rows)
+            # Rows fill the reservoir until it holds n, then replace a random slot with probability n / (position + 1)
+            slots = np.where(positions < n, positions,
+                             rngs[label].integers(0, positions + 1))
+            is_kept = slots < n
+            combined = pd.concat([reservoir, rows.iloc[is_kept]])
+            sources = np.arange(min(seen[label], n))
+            # A slot replaced twice in a chunk keeps the later row
+            kept_slots = slots[is_kept][::-1]
+            kept_sources = len(reservoir) + np.arange(len(kept_slots))[::-1]
+            unique_slots, last = np.unique(kept_slots, return_index=True)
+            sources[unique_slots] = kept_sources[last]
+            reservoirs[label] = combined.iloc[sources]
+    # Same output as balance: labels in sorted order
+    for label in reservoirs:
+        if seen[label] < n:
+            raise ValueError(f"Label {label} has {seen[label]} rows, fewer than n={n}")
+    out = pd.concat([reservoirs[label] for label in sorted(reservoirs)]).reset_index(drop=True)
+    
+    return out
+
+# Get the names of selected feature indices without building the full feature name array
+def get_feature_names(vectorizer, indices):
+    """
+    Return the names of the features at the given indices.
+    
+    vectorizer:
+        A fitted vectorizer, e.g. 'CountVectorizer'. Vectorizers without a vocabulary,
+        e.g. 'HashingVectorizer', get names like 'feature_123'
+    indices:
+        Array of feature indices
+    """
+    indices = np.asarray(indices)
+    vocabulary = getattr(vectorizer, 'vocabulary_', None)
+    if vocabulary is None:
+        return np.array([f"feature_{index}" for index in indices.ravel()], dtype=object).reshape(indices.shape)
+    # Invert only the needed part of the vocabulary, without sorting it
+    terms = np.fromiter(vocabulary.keys(), dtype=object, count=len(vocabulary))
+    term_indices = np.fromiter(vocabulary.values(), dtype=np.int64, count=len(vocabulary))
+    is_needed = np.isin(term_indices, indices)
+    names = pd.Series(terms[is_needed], index=term_indices[is_needed])
+    return names.loc[indices.ravel()].to_numpy().reshape(indices.shape)
+
+# Get the top-k positive and negative features of every class
+def top_features(vectorizer, classifier, k=20):
+    """
+    Return the k features with the largest positive and negative weights for each class.
+    
+    vectorizer:
+        The fitted vectorizer the classifier was trained on
+    classifier:
+        A fitted linear classifier with 'coef_', e.g. 'LogisticRegression',
+        or a naive Bayes classifier with 'feature_log_prob_', e.g. 'MultinomialNB'
+    k:
+        Number of features per class and direction, defaults to 20
+        
+    Returns a dataframe with the columns class, direction, rank, feature and weight.
+    For binary classifiers, the single row of weights is split into the positive class (largest weights)
+    and the negative class (smallest weights).
     """
-    # Use pandas select a random bunch of examples from each label
-    out = (dataframe.groupby('label', as_index=False)
-            .apply(lambda x: x.sample(n=n))
-            .reset_index(drop=True))
+    if hasattr(classifier, 'coef_'):
+        weights = np.asarray(classifier.coef_)
+    elif hasattr(classifier, 'feature_log_prob_'):
+        weights = np.asarray(classifier.feature_log_prob_)
+    else:
+        raise ValueError(f"{type(classifier).__name__} is not supported, it has no per-feature weights ('coef_' or 'feature_log_prob_')")
+    weights = np.atleast_2d(weights)
+    k = min(k, weights.shape[1])
+    # Partition in linear time, then only sort the k selected weights
+    top = np.argpartition(-weights, k - 1, axis=1)[:, :k]
+    bottom = np.argpartition(weights, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(top, np.argsort(-np.take_along_axis(weights, top, axis=1), axis=1), axis=1)
+    bottom = np.take_along_axis(bottom, np.argsort(np.take_along_axis(weights, bottom, axis=1), axis=1), axis=1)
+    
+    classes = classifier.classes_
+    if len(weights) == 1:
+        # Binary: positive weights predict classes_[1], negative weights predict classes_[0]
+        selections = [(classes[1], 'positive', top[0], weights[0]), (classes[0], 'negative', bottom[0], weights[0])]
+    else:
+        selections = [selection for row, label in enumerate(classes)
+                      for selection in ((label, 'positive', top[row], weights[row]),
+                                        (label, 'negative', bottom[row], weights[row]))]
+    names = get_feature_names(vectorizer, np.concatenate([indices for _, _, indices, _ in selections]))
+    out = pd.DataFrame({
+        'class': np.repeat([label for label, _, _, _ in selections], k),
+        'direction': np.repeat([direction for _, direction, _, _ in selections], k),
+        'rank': np.tile(np.arange(1, k + 1), len(selections)),
+        'feature': names,
+        'weight': np.concatenate([row[indices] for _, _, indices, row in selections]),
+    })
+    
+    return out
+
+# Load the vectorizer vocabulary and classifier weights of a model bundle
+def load_bundle_weights(bundle_path):
+    """
+    Load a '<name>_bundle.joblib' file saved by the model bundles of the text classification
+    benchmarks, without the modules that saved it.
+    
+    bundle_path:
+        Path of the bundle
+        
+    Returns a vectorizer and classifier with only the attributes top_features needs.
+    Raises a ValueError if the classifier of the bundle has no per-feature weights, e.g. 'MLPClassifier'.
+    """
+    bundle = joblib.load(bundle_path, mmap_mode='r')
+    metadata, arrays = bundle['metadata'], bundle['arrays']
+    if 'coef' not in arrays:
+        raise ValueError(f"{metadata['classifier_class']} is not supported, it has no per-feature weights ('coef_' or 'feature_log_prob_')")
+    vectorizer = SimpleNamespace()
+    if 'vocabulary' in arrays:
+        terms = arrays['vocabulary'].tolist()
+        vectorizer.vocabulary_ = dict(zip(terms, range(len(terms))))
+    classifier = SimpleNamespace(coef_=arrays['coef'], classes_=np.asarray(arrays['classes']))
+    
+    return vectorizer, classifier
+
+# Find the saved models under a directory, preferring a bundle over the separate joblib files
+def find_saved_models(models_dir):
+    """
+    Return (name, model_dir, load) tuples, where load() returns the vectorizer and classifier.
+    
+    models_dir:
+        Directory that is searched recursively for '<name>_bundle.joblib' files and pairs of
+        '<name>_vectorizer.joblib' and '<name>_classifier.joblib' files
+    """
+    models = {}
+    for classifier_path in sorted(Path(models_dir).rglob('*_classifier.joblib')):
+        name = classifier_path.name[:-len('_classifier.joblib')]
+        vectorizer_path = classifier_path.with_name(f"{name}_vectorizer.joblib")
+        if not vectorizer_path.exists():
+            print(f"Skipping {name}: no vectorizer found")
+            continue
+        models[(name, classifier_path.parent)] = (
+            lambda vectorizer_path=vectorizer_path, classifier_path=classifier_path:
+                (joblib.load(vectorizer_path), joblib.load(classifier_path)))
+    # A bundle saved from the joblib files replaces them, as when the models are loaded for prediction
+    for bundle_path in sorted(Path(models_dir).rglob('*_bundle.joblib')):
+        name = bundle_path.name[:-len('_bundle.joblib')]
+        models[(name, bundle_path.parent)] = lambda bundle_path=bundle_path: load_bundle_weights(bundle_path)
+    
+    return [(name, model_dir, load) for (name, model_dir), load in sorted(models.items())]
+
+# Write the top features of every saved model to one CSV file
+def feature_importance_report(models_dir, output_path, k=20):
+    """
+    Find every saved model under a directory, i.e. '<name>_bundle.joblib' files and pairs of
+    '<name>_vectorizer.joblib' and '<name>_classifier.joblib' files, and write their top-k features
+    per class to one CSV file. Models without per-feature weights, e.g. 'MLPClassifier', are skipped
+    as not supported.
+    
+    models_dir:
+        Directory that is searched recursively for saved models
+    output_path:
+        Path of the CSV report
+    k:
+        Number of features per class and direction, defaults to 20
+    """
+    reports = []
+    for name, model_dir, load in find_saved_models(models_dir):
+        try:
+            vectorizer, classifier = load()
+            report = top_features(vectorizer, classifier, k)
+        except ValueError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        reports.append(report.assign(model=name, model_dir=str(model_dir)))
+    if not reports:
+        raise ValueError(f"No saved models with per-feature weights found in {models_dir}")
+    out = pd.concat(reports, ignore_index=True)
+    out = out[['model', 'model_dir', 'class', 'direction', 'rank', 'feature', 'weight']]
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    out.to_csv(output_path, index=False)
     
     return out
 
 # Show the most informative features
 def show_features(vectorizer, training_labels, classifier, n=20):
     """
-    Return the most informative features from a classifier, i.e. the 'strongest' predictors.
+    Print the most informative features from a binary classifier, i.e. the 'strongest' predictors.
     
     vectorizer:
         A vectorizer defined by the user, e.g. 'CountVectorizer'
@@ -36,18 +258,16 @@ def show_features(vectorizer, training_labels, classifier, n=20):
         Number of features to display, defaults to 20
         
     """
-    # Get feature names and coefficients
-    feature_names = vectorizer.get_feature_names_out()
-    coefs_with_fns = sorted(zip(classifier.coef_[0], feature_names))
+    features = top_features(vectorizer, classifier, k=n)
     # Get ordered labels
     labels = sorted(set(training_labels))
-    # Select top n results, where n is function argument
-    top = zip(coefs_with_fns[:n], coefs_with_fns[:-(n + 1):-1])
+    negative = features[features['direction'] == 'negative']
+    positive = features[features['direction'] == 'positive']
     # Pretty print columns showing most informative features
     print(f"{labels[0]}\t\t\t\t{labels[1]}\n")
-    for (coef_1, fn_1), (coef_2, fn_2) in top:
-        for (coef_1, fn_1), (coef_2, fn_2) in top:
-            print("%.4f\t%-15s\t\t%.4f\t%-15s" % (coef_1, fn_1, coef_2, fn_2))
+    for coef_1, fn_1, coef_2, fn_2 in zip(negative['weight'], negative['feature'],
+                                          positive['weight'], positive['feature']):
+        print("%.4f\t%-15s\t\t%.4f\t%-15s" % (coef_1, fn_1, coef_2, fn_2))
 
     return None
 
@@ -77,27 +297,218 @@ def plot_ROC(fpr, tpr, AUC):
 
     return None
 
+# Accumulate a confusion matrix over chunks of predictions
+class ConfusionMatrixAccumulator:
+    """
+    Confusion matrix that is updated chunk by chunk, e.g. from batch predictions, so only the
+    matrix is kept in memory rather than all labels and predictions.
+    
+    labels:
+        All possible labels, defaults to None (labels are added as they are seen)
+    """
+    def __init__(self, labels=None):
+        self.fixed_labels = labels is not None
+        self.labels = pd.Index([] if labels is None else list(labels))
+        if not self.labels.is_unique:
+            raise ValueError("labels must be unique")
+        self.counts = np.zeros((len(self.labels), len(self.labels)), dtype=np.int64)
+
+    def update(self, y_true, y_pred):
+        """
+        Add a chunk of true labels and predictions to the matrix.
+        """
+        y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+        if len(y_true) != len(y_pred):
+            raise ValueError(f"y_true has {len(y_true)} rows but y_pred has {len(y_pred)}")
+        if not self.fixed_labels:
+            new_labels = pd.Index(pd.unique(np.concatenate([y_true, y_pred]))).difference(self.labels, sort=False)
+            if len(new_labels):
+                self.labels = self.labels.append(new_labels)
+                self.counts = np.pad(self.counts, (0, len(new_labels)))
+        # Label-encode both arrays, then count every (true, predicted) pair in one bincount
+        true_codes = self.labels.get_indexer(y_true)
+        pred_codes = self.labels.get_indexer(y_pred)
+        if (true_codes < 0).any() or (pred_codes < 0).any():
+            raise ValueError("y_true or y_pred contains labels that are not in labels")
+        num_labels = len(self.labels)
+        self.counts += np.bincount(true_codes * num_labels + pred_codes,
+                                   minlength=num_labels ** 2).reshape(num_labels, num_labels)
+        
+        return self
+
+    def to_frame(self, normalize=None):
+        """
+        Return the matrix as a dataframe with 'Actual' rows and 'Predicted' columns, labels in sorted order.
+        
+        normalize:
+            None for counts, 'true' to divide each row by the number of true labels,
+            'pred' to divide each column by the number of predictions, or 'all' to divide by the total,
+            defaults to None
+        """
+        counts = self.counts.astype(float) if normalize else self.counts
+        if normalize == 'true':
+            counts = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+        elif normalize == 'pred':
+            counts = counts / np.maximum(counts.sum(axis=0, keepdims=True), 1)
+        elif normalize == 'all':
+            counts = counts / max(counts.sum(), 1)
+        elif normalize is not None:
+            raise ValueError(f"normalize must be None, 'true', 'pred' or 'all', got {normalize}")
+        cm = pd.DataFrame(counts, index=pd.Index(self.labels, name='Actual'),
+                          columns=pd.Index(self.labels, name='Predicted'))
+        order = np.argsort(self.labels)
+        
+        return cm.iloc[order, order]
+
+# Create heatmap visualisation from a confusion matrix dataframe
+def plot_confusion_matrix(cm):
+    """
+    Plot a confusion matrix dataframe, e.g. from ConfusionMatrixAccumulator.to_frame, as a heatmap
+    """
+    integer_counts = pd.api.types.is_integer_dtype(cm.to_numpy().dtype)
+    p = plt.figure(figsize=(10,10));
+    p = sns.heatmap(cm, annot=True, fmt="d" if integer_counts else ".2f", cbar=False)
+
+    return None
+
 # Create heatmap visualisation
 def plot_cm(y_test, y_pred, normalized:bool):
     """
     Plot confusion matrix
     """
-    if normalized == False:
-        cm = pd.crosstab(y_test, y_pred, 
-                            rownames=['Actual'], colnames=['Predicted'])
-        p = plt.figure(figsize=(10,10));
-        p = sns.heatmap(cm, annot=True, fmt="d", cbar=False)
-    elif normalized == True:
-        cm = pd.crosstab(y_test, y_pred, 
-                               rownames=['Actual'], colnames=['Predicted'], normalize='index')
-        p = plt.figure(figsize=(10,10));
-        p = sns.heatmap(cm, annot=True, fmt=".2f", cbar=False)
+    accumulator = ConfusionMatrixAccumulator().update(y_test, y_pred)
+    plot_confusion_matrix(accumulator.to_frame(normalize='true' if normalized else None))
+
+    return None
+    
+# Compute a learning curve in parallel and optionally cache the results on disk
+def compute_learning_curve(estimator, X, y, cv=None, n_jobs=-1, scoring="accuracy",
+                           train_sizes=np.linspace(.1, 1.0, 5), cache_dir=None):
+    """
+    Compute the training and cross-validation scores and fit times of a learning curve,
+    or load them from the cache if caching is enabled and they were computed before with the same inputs.
+    
+    estimator:
+        An estimator instance implementing `fit` and `predict`, cloned for each fit
+    X, y:
+        Training vectors and targets
+    cv, scoring, train_sizes:
+        As in sklearn.model_selection.learning_curve. cv is expanded to its list of splits first,
+        so generators and iterators are consumed once and hash the same way on every call
+    n_jobs:
+        Number of processes fitting in parallel, defaults to -1 (all processors)
+    cache_dir:
+        Directory where results are saved as 'learning_curve_<hash>.npz', defaults to None (no caching).
+        The hash covers the estimator parameters, X, y, the cv splits, scoring and train_sizes,
+        so changing any of them recomputes
+        
+    Returns a dict of arrays: train_sizes, train_scores, test_scores, fit_times and score_times.
+    """
+    # Materialize the splits, so the cache key is stable and the same splits are used for fitting
+    cv = list(check_cv(cv, y, classifier=is_classifier(estimator)).split(X, y))
+    
+    if cache_dir is not None:
+        key = joblib.hash((clone(estimator), X, y, cv, scoring, np.asarray(train_sizes)))
+        cache_path = Path(cache_dir) / f"learning_curve_{key}.npz"
+        if cache_path.exists():
+            print(f"Loading cached learning curve from {cache_path}")
+            with np.load(cache_path) as cached:
+                return {name: cached[name] for name in cached.files}
+    
+    # Dump the inputs once and memory-map them, so the workers share them instead of each receiving a copy
+    with TemporaryDirectory() as temp_dir:
+        joblib.dump((X, y), Path(temp_dir) / 'inputs.joblib')
+        X_mmap, y_mmap = joblib.load(Path(temp_dir) / 'inputs.joblib', mmap_mode='r')
+        train_sizes, train_scores, test_scores, fit_times, score_times = \
+            learning_curve(estimator, X_mmap, y_mmap, cv=cv, n_jobs=n_jobs,
+                           scoring=scoring,
+                           train_sizes=train_sizes,
+                           return_times=True)
+        del X_mmap, y_mmap
+    
+    results = {'train_sizes': train_sizes, 'train_scores': train_scores, 'test_scores': test_scores,
+               'fit_times': fit_times, 'score_times': score_times}
+    if cache_dir is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(cache_path, **results)
+    
+    return results
+
+# Draw a learning curve from computed or cached results
+def render_learning_curve(results, title, axes=None, ylim=None):
+    """
+    Generate 3 plots from the results of compute_learning_curve: the test and training learning curve,
+    the training samples vs fit times curve, the fit times vs score curve. No model is fitted,
+    so plots can be restyled without recomputing.
+    
+    results:
+        Dict returned by compute_learning_curve
+    title:
+        Title for the chart
+    axes:
+        Array-like of 3 axes to use for plotting the curves, defaults to None (a new figure)
+    ylim:
+        Minimum and maximum y-values plotted, e.g. (ymin, ymax), defaults to None
+        
+    Returns the axes.
+    """
+    if axes is None:
+        _, axes = plt.subplots(1, 3, figsize=(20, 5))
+
+    axes[0].set_title(title)
+    if ylim is not None:
+        axes[0].set_ylim(*ylim)
+    axes[0].set_xlabel("Training examples")
+    axes[0].set_ylabel("Score")
+
+    train_sizes = results['train_sizes']
+    train_scores, test_scores = results['train_scores'], results['test_scores']
+    fit_times = results['fit_times']
+    train_scores_mean = np.mean(train_scores, axis=1)
+    train_scores_std = np.std(train_scores, axis=1)
+    test_scores_mean = np.mean(test_scores, axis=1)
+    test_scores_std = np.std(test_scores, axis=1)
+    fit_times_mean = np.mean(fit_times, axis=1)
+    fit_times_std = np.std(fit_times, axis=1)
+
+    # Plot learning curve
+    axes[0].grid()
+    axes[0].fill_between(train_sizes, train_scores_mean - train_scores_std,
+                         train_scores_mean + train_scores_std, alpha=0.1,
+                         color="r")
+    axes[0].fill_between(train_sizes, test_scores_mean - test_scores_std,
+                         test_scores_mean + test_scores_std, alpha=0.1,
+                         color="g")
+    axes[0].plot(train_sizes, train_scores_mean, 'o-', color="r",
+                 label="Training score")
+    axes[0].plot(train_sizes, test_scores_mean, 'o-', color="g",
+                 label="Cross-validation score")
+    axes[0].legend(loc="best")
+
+    # Plot n_samples vs fit_times
+    axes[1].grid()
+    axes[1].plot(train_sizes, fit_times_mean, 'o-')
+    axes[1].fill_between(train_sizes, fit_times_mean - fit_times_std,
+                         fit_times_mean + fit_times_std, alpha=0.1)
+    axes[1].set_xlabel("Training examples")
+    axes[1].set_ylabel("fit_times")
+    axes[1].set_title("Scalability of the model")
 
-        return None
+    # Plot fit_time vs score
+    axes[2].grid()
+    axes[2].plot(train_sizes, test_scores_mean, 'o-')
+    axes[2].fill_between(train_sizes, test_scores_mean - test_scores_std,
+                         test_scores_mean + test_scores_std, alpha=0.1)
+    axes[2].set_xlabel("Training examples")
+    axes[2].set_ylabel("Score")
+    axes[2].set_title("Performance of the model")
+
+    return axes
     
 # Plot learning-validation curve
 def plot_learning_curve(estimator, title, X, y, axes=None, ylim=None, cv=None,
-                        n_jobs=None, scoring="accuracy", train_sizes=np.linspace(.1, 1.0, 5)):
+                        n_jobs=-1, scoring="accuracy", train_sizes=np.linspace(.1, 1.0, 5),
+                        cache_dir=None):
     """
     Function taken from sklearn documentation
     
@@ -143,7 +554,7 @@ def plot_learning_curve(estimator, title, X, y, axes=None, ylim=None, cv=None,
         Refer :ref:`User Guide <cross_validation>` for the various
         cross-validators that can be used here.
 
-    n_jobs : int or None, default=None
+    n_jobs : int or None, default=-1
         Number of jobs to run in parallel.
         ``None`` means 1 unless in a :obj:`joblib.parallel_backend` context.
         ``-1`` means using all processors. See :term:`Glossary <n_jobs>`
@@ -158,59 +569,15 @@ def plot_learning_curve(estimator, title, X, y, axes=None, ylim=None, cv=None,
         sets. Note that for classification the number of samples usually have
         to be big enough to contain at least one sample from each class.
         (default: np.linspace(0.1, 1.0, 5))
-    """
-    if axes is None:
-        _, axes = plt.subplots(1, 3, figsize=(20, 5))
 
-    axes[0].set_title(title)
-    if ylim is not None:
-        axes[0].set_ylim(*ylim)
-    axes[0].set_xlabel("Training examples")
-    axes[0].set_ylabel("Score")
-
-    train_sizes, train_scores, test_scores, fit_times, _ = \
-        learning_curve(estimator, X, y, cv=cv, n_jobs=n_jobs,
-                       scoring=scoring,
-                       train_sizes=train_sizes,
-                       return_times=True)
-    train_scores_mean = np.mean(train_scores, axis=1)
-    train_scores_std = np.std(train_scores, axis=1)
-    test_scores_mean = np.mean(test_scores, axis=1)
-    test_scores_std = np.std(test_scores, axis=1)
-    fit_times_mean = np.mean(fit_times, axis=1)
-    fit_times_std = np.std(fit_times, axis=1)
-
-    # Plot learning curve
-    axes[0].grid()
-    axes[0].fill_between(train_sizes, train_scores_mean - train_scores_std,
-                         train_scores_mean + train_scores_std, alpha=0.1,
-                         color="r")
-    axes[0].fill_between(train_sizes, test_scores_mean - test_scores_std,
-                         test_scores_mean + test_scores_std, alpha=0.1,
-                         color="g")
-    axes[0].plot(train_sizes, train_scores_mean, 'o-', color="r",
-                 label="Training score")
-    axes[0].plot(train_sizes, test_scores_mean, 'o-', color="g",
-                 label="Cross-validation score")
-    axes[0].legend(loc="best")
-
-    # Plot n_samples vs fit_times
-    axes[1].grid()
-    axes[1].plot(train_sizes, fit_times_mean, 'o-')
-    axes[1].fill_between(train_sizes, fit_times_mean - fit_times_std,
-                         fit_times_mean + fit_times_std, alpha=0.1)
-    axes[1].set_xlabel("Training examples")
-    axes[1].set_ylabel("fit_times")
-    axes[1].set_title("Scalability of the model")
-
-    # Plot fit_time vs score
-    axes[2].grid()
-    axes[2].plot(train_sizes, test_scores_mean, 'o-')
-    axes[2].fill_between(train_sizes, test_scores_mean - test_scores_std,
-                         test_scores_mean + test_scores_std, alpha=0.1)
-    axes[2].set_xlabel("Training examples")
-    axes[2].set_ylabel("Score")
-    axes[2].set_title("Performance of the model")
+    cache_dir : str or Path, default=None
+        Directory where the computed curve is cached by compute_learning_curve,
+        so calling this again with the same inputs only redraws the plots.
+        None disables caching.
+    """
+    results = compute_learning_curve(estimator, X, y, cv=cv, n_jobs=n_jobs, scoring=scoring,
+                                     train_sizes=train_sizes, cache_dir=cache_dir)
+    render_learning_curve(results, title, axes=axes, ylim=ylim)
 
     plt.show()
     